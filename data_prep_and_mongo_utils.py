@@ -1,3 +1,39 @@
+from datetime import datetime
+
+
+# Small market_data fixture used by example #2 (insert_many).
+sample_docs = [
+    {"symbol": "AAPL", "sector": "Tech", "date": datetime(2025, 1, 2), "price": 185.6, "volume": 1250000,
+     "VaR": 0.031, "return": 0.012, "sentiment_score": 0.64, "default_flag": 0},
+    {"symbol": "MSFT", "sector": "Tech", "date": datetime(2025, 1, 2), "price": 372.4, "volume": 980000,
+     "VaR": 0.027, "return": 0.008, "sentiment_score": 0.58, "default_flag": 0},
+    {"symbol": "TSLA", "sector": "Auto", "date": datetime(2025, 1, 2), "price": 248.1, "volume": 2100000,
+     "VaR": 0.061, "return": -0.021, "sentiment_score": -0.12, "default_flag": 0},
+    {"symbol": "F", "sector": "Auto", "date": datetime(2025, 1, 2), "price": 10.4, "volume": 3400000,
+     "VaR": 0.048, "return": 0.004, "sentiment_score": 0.05, "default_flag": 1},
+    {"symbol": "XOM", "sector": "Energy", "date": datetime(2025, 1, 2), "price": 106.9, "volume": 1500000,
+     "VaR": 0.036, "return": -0.006, "sentiment_score": 0.21, "default_flag": 0},
+    {"symbol": "JPM", "sector": "Finance", "date": datetime(2025, 1, 2), "price": 171.2, "volume": 870000,
+     "VaR": 0.029, "return": 0.003, "sentiment_score": 0.33, "default_flag": 0},
+    {"symbol": "AAPL", "sector": "Tech", "date": datetime(2025, 2, 3), "price": 188.3, "volume": 1310000,
+     "VaR": 0.034, "return": 0.015, "sentiment_score": 0.71, "default_flag": 0},
+    {"symbol": "MSFT", "sector": "Tech", "date": datetime(2025, 2, 3), "price": 366.0, "volume": 1020000,
+     "VaR": 0.025, "return": -0.017, "sentiment_score": 0.44, "default_flag": 0},
+    {"symbol": "TSLA", "sector": "Auto", "date": datetime(2025, 2, 3), "price": 231.5, "volume": 2450000,
+     "VaR": 0.066, "return": -0.067, "sentiment_score": -0.35, "default_flag": 1},
+    {"symbol": "F", "sector": "Auto", "date": datetime(2025, 2, 3), "price": 10.9, "volume": 3150000,
+     "VaR": 0.052, "return": 0.048, "sentiment_score": 0.18, "default_flag": 0},
+    {"symbol": "XOM", "sector": "Energy", "date": datetime(2025, 2, 3), "price": 110.2, "volume": 1420000,
+     "VaR": 0.039, "return": 0.031, "sentiment_score": 0.27, "default_flag": 0},
+    {"symbol": "JPM", "sector": "Finance", "date": datetime(2025, 2, 3), "price": 175.8, "volume": 910000,
+     "VaR": 0.022, "return": 0.027, "sentiment_score": 0.49, "default_flag": 0},
+]
+
+
+# 1-based numbers of the examples below that modify market_data (insert / update / delete).
+WRITE_EXAMPLES = {1, 2, 12, 13, 14, 15}
+
+
 def mongo_query_examples(db):
     """
     75 curated MongoDB queries across:
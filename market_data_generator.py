@@ -0,0 +1,192 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow not installed — the Parquet sink is unavailable, the rest still works
+    pa = pq = None
+
+
+# ============================================================
+# 🏭 REPRODUCIBLE SYNTHETIC MARKET_DATA AT ANY SCALE
+# ============================================================
+#
+# One seeded generator for the market_data schema (symbol, sector, date, price,
+# volume, VaR, return, sentiment_score, default_flag), shared by every
+# benchmark.  Rows come out in fixed-size chunks, so 100M rows need no more
+# memory than one chunk, and each chunk can go straight to a sink:
+#
+#     for frame in generate_market_data(100_000_000, seed=7, chunk=1_000_000): ...
+#     write_mongo(db["market_data"], generate_market_data(1_000_000))
+#     write_parquet("market_data.parquet", generate_market_data(10_000_000))
+#     frame = market_data_frame(50_000, seed=7)        # everything as one DataFrame
+#
+# Every symbol follows its own daily price path (fat-tailed returns scaled by
+# its sector's volatility), fixed by the seed and shared by all chunks; a row
+# is a snapshot of one symbol on one day, priced around that day's close.
+# VaR is the 1-day 95% parametric VaR of the symbol's volatility, volume grows
+# on big moves, sentiment leans with the day's return, and defaults are rare
+# and likelier for risky, badly-sentimented names.  Chunk i draws from its own
+# stream of the seed, so the same (n, seed, chunk) always gives the same rows.
+
+SECTORS = {
+    "Tech": ["AAPL", "MSFT", "GOOG", "NVDA", "META", "ORCL", "CRM", "ADBE"],
+    "Auto": ["TSLA", "F", "GM", "TM", "HMC", "RIVN"],
+    "Energy": ["XOM", "CVX", "BP", "SHEL", "COP"],
+    "Finance": ["JPM", "BAC", "GS", "MS", "C", "WFC"],
+    "Health": ["JNJ", "PFE", "MRK", "ABBV", "UNH"],
+}
+
+SECTOR_VOLATILITY = {"Tech": 0.021, "Auto": 0.026, "Energy": 0.018, "Finance": 0.017, "Health": 0.014}  # daily σ
+
+START = pd.Timestamp("2025-01-01")
+DAYS = 365
+DEFAULT_CHUNK = 50_000
+MAX_VAR = 0.0699  # the examples bucket VaR below 0.07
+
+
+class MarketUniverse:
+    """Per-symbol state fixed by the seed: sector, volatility, activity and the daily close / return paths."""
+
+    def __init__(self, seed=0, start=START, days=DAYS):
+        rng = np.random.default_rng([seed, 0xFEED])
+        self.start = pd.Timestamp(start)
+        self.days = days
+        self.symbols = np.array([s for names in SECTORS.values() for s in names], dtype=object)
+        self.sectors = np.array([sector for sector, names in SECTORS.items() for _ in names], dtype=object)
+        n = len(self.symbols)
+        sector_vol = np.array([SECTOR_VOLATILITY[s] for s in self.sectors])
+        self.volatility = sector_vol * rng.lognormal(0, 0.2, n)
+        self.weights = rng.zipf(1.6, n).clip(max=20) + 4.0  # some names trade (and get quoted) far more
+        self.weights /= self.weights.sum()
+        self.base_volume = rng.lognormal(np.log(1_000_000), 0.7, n)
+        shocks = rng.standard_t(5, size=(n, days)) * np.sqrt(3 / 5)  # unit variance, fat tails
+        self.returns = 0.0003 + shocks * self.volatility[:, None]
+        first_close = rng.lognormal(np.log(150), 0.8, n)
+        self.closes = first_close[:, None] * np.exp(np.cumsum(self.returns, axis=1))
+
+    def chunk(self, n, rng):
+        """n snapshot rows drawn with `rng`."""
+        sym = rng.choice(len(self.symbols), size=n, p=self.weights)
+        day = rng.integers(0, self.days, size=n)
+        vol = self.volatility[sym]
+        ret = self.returns[sym, day]
+        z = ret / vol  # the day's move in standard deviations
+        price = self.closes[sym, day] * np.exp(rng.normal(0, 0.15, n) * vol)
+        value_at_risk = np.clip(1.645 * vol * rng.lognormal(0, 0.15, n), 0.005, MAX_VAR)
+        volume = self.base_volume[sym] * (1 + 0.5 * np.abs(z)) * rng.lognormal(0, 0.35, n)
+        sentiment = np.tanh(0.6 * z + rng.normal(0, 0.5, n))
+        default_odds = -5.2 + 40 * value_at_risk - 1.2 * sentiment
+        default = rng.random(n) < 1 / (1 + np.exp(-default_odds))
+        return pd.DataFrame({
+            "symbol": self.symbols[sym],
+            "sector": self.sectors[sym],
+            "date": self.start + pd.to_timedelta(day, unit="D"),
+            "price": np.round(price, 2),
+            "volume": np.maximum(volume, 100).astype(np.int64),
+            "VaR": np.round(value_at_risk, 4),
+            "return": np.round(ret, 5),
+            "sentiment_score": np.round(sentiment, 3),
+            "default_flag": default.astype(np.int64),
+        })
+
+
+def generate_market_data(n, seed=0, chunk=DEFAULT_CHUNK, start=START, days=DAYS):
+    """Yield n market_data rows as DataFrames of at most `chunk` rows (constant memory)."""
+    universe = MarketUniverse(seed, start, days)
+    for i, offset in enumerate(range(0, n, chunk)):
+        yield universe.chunk(min(chunk, n - offset), np.random.default_rng([seed, i]))
+
+
+def market_data_frame(n, seed=0, chunk=DEFAULT_CHUNK):
+    """All n rows as one DataFrame — the same rows the chunked sinks receive for the same (seed, chunk)."""
+    frames = list(generate_market_data(n, seed, chunk))
+    return pd.concat(frames, ignore_index=True) if frames else next(generate_market_data(1, seed)).iloc[:0]
+
+
+# ============================================================
+# 🚰 SINKS
+# ============================================================
+
+def write_mongo(collection, chunks):
+    """Insert every chunk (insert_columns on the columnar engine, unordered insert_many elsewhere); returns rows."""
+    rows = 0
+    columnar = callable(getattr(type(collection), "insert_columns", None))
+    for frame in chunks:
+        if columnar:
+            collection.insert_columns(frame)
+        else:
+            collection.insert_many(frame.to_dict(orient="records"), ordered=False)
+        rows += len(frame)
+    return rows
+
+
+def write_parquet(path, chunks, compression="zstd"):
+    """Stream chunks into one Parquet file, one row group per chunk; returns rows."""
+    if pq is None:
+        raise ImportError("pyarrow is required for write_parquet")
+    rows, writer = 0, None
+    try:
+        for frame in chunks:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression)
+            writer.write_table(table)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def describe(frame):
+    """The distribution checks printed by the demo."""
+    daily = frame.groupby(["symbol", "date"])["return"].first()
+    return {
+        "rows": len(frame),
+        "symbols": frame["symbol"].nunique(),
+        "price_median": round(float(frame["price"].median()), 2),
+        "return_std": round(float(daily.std()), 4),
+        "return_kurtosis": round(float(daily.kurt()), 2),
+        "VaR_range": (float(frame["VaR"].min()), float(frame["VaR"].max())),
+        "default_rate": round(float(frame["default_flag"].mean()), 4),
+        "sentiment_return_corr": round(float(frame["sentiment_score"].corr(frame["return"])), 2),
+    }
+
+
+# ============================================================
+# 🧪 DEMO: THROUGHPUT AND CONSTANT MEMORY
+# ============================================================
+
+def main(argv=None):
+    from mongo_frame_bridge import measure_peak
+
+    parser = argparse.ArgumentParser(description="Generate synthetic market_data in constant memory")
+    parser.add_argument("--rows", type=int, nargs="*", default=[1_000_000, 10_000_000])
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--parquet", help="also stream the largest size into this Parquet file")
+    args = parser.parse_args(argv)
+
+    print(f"📊 {describe(market_data_frame(200_000, args.seed))}")
+    again = market_data_frame(1_000, args.seed).equals(market_data_frame(1_000, args.seed))
+    print("✅ same seed, same rows" if again else "❌ the generator is not reproducible")
+
+    for n in args.rows:
+        rows, peak, seconds = measure_peak(
+            lambda: sum(len(frame) for frame in generate_market_data(n, args.seed, args.chunk)))
+        print(f"🏭 {rows:,} rows in {seconds:.1f}s ({rows / seconds:,.0f} rows/s), "
+              f"peak {peak / 1e6:.0f} MB with {args.chunk:,}-row chunks")
+
+    if args.parquet:
+        start = time.perf_counter()
+        rows = write_parquet(args.parquet, generate_market_data(max(args.rows), args.seed, args.chunk))
+        print(f"🪵 {rows:,} rows → {args.parquet} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
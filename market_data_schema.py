@@ -0,0 +1,298 @@
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow not installed — the string dtype keeps Python objects
+    pyarrow = None
+
+
+# ============================================================
+# 🗜️ COMPACT TYPED SCHEMA FOR MARKET_DATA FRAMES
+# ============================================================
+#
+# A market_data DataFrame straight from documents holds object strings for
+# symbol / sector and 8 bytes for every number.  The schema below stores the
+# strings in the Arrow-backed string dtype, the small floats as float32, the
+# flag as int8 and volume in the smallest integer that fits:
+#
+#     compact = compact_frame(df)                                  # an existing frame
+#     compact = load_market_data(db["market_data"], {"sector": "Tech"})   # chunked from Mongo
+#     memory_report(df, compact)       # per-column MB before / after and the ratio
+#     compare_examples(df, compact)    # pandas_query_examples results within tolerance?
+#
+# The result is a drop-in replacement for every example.  categorical=True
+# stores the strings as categoricals instead (another ~10x on those columns)
+# but df.replace({"Tech": "Technology"}) (#33) and symbol + "_" + sector
+# (#57) raise TypeError on categoricals, so it is opt-in for code that only
+# filters and groups.
+#
+# float32 keeps ~7 significant digits, so a column is only narrowed when every
+# value survives the round trip at the decimals the data carries (FLOAT_DECIMALS);
+# otherwise it stays float64.  Integers are only narrowed when their range fits.
+# Columns the schema doesn't know (e.g. _id) are left as they are.
+
+MARKET_DATA_SCHEMA = {
+    "symbol": "string",          # STRING_DTYPE, or category with categorical=True
+    "sector": "string",
+    "date": "datetime64[ns]",
+    "price": "float64",          # money: sums over millions of rows need the full mantissa
+    "volume": "integer",         # smallest signed integer that holds the column
+    "VaR": "float32",
+    "return": "float32",
+    "sentiment_score": "float32",
+    "default_flag": "int8",
+}
+
+FLOAT_DECIMALS = {"price": 2, "VaR": 4, "return": 5, "sentiment_score": 3}
+
+STRING_DTYPE = "string[pyarrow]" if pyarrow is not None else "string"
+
+EXPECTED_DIFFERENCES = {"Data types"}  # examples that report the dtypes themselves
+
+
+def _fits_float32(values, decimals):
+    if decimals is None:
+        return False
+    narrowed = values.astype(np.float32).astype(np.float64)
+    return np.array_equal(np.round(narrowed, decimals), np.round(values, decimals), equal_nan=True)
+
+
+def _smallest_int(values):
+    if len(values) == 0:
+        return np.int8
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def compact_dtypes(frame, schema=MARKET_DATA_SCHEMA, decimals=FLOAT_DECIMALS, categorical=False):
+    """
+    {column: dtype} the schema gives this frame, after the float32 precision and integer range checks:
+    - categorical: "string" columns become category instead of STRING_DTYPE (not a drop-in replacement)
+    """
+    dtypes = {}
+    for column, target in schema.items():
+        if column not in frame:
+            continue
+        series = frame[column]
+        if target == "string":
+            dtypes[column] = "category" if categorical else STRING_DTYPE
+        elif target == "float32":
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            dtypes[column] = "float32" if _fits_float32(values, decimals.get(column)) else "float64"
+        elif target == "integer" or target.startswith("int"):
+            if series.isna().any():
+                continue  # missing values keep the column float
+            smallest = np.dtype(_smallest_int(series.to_numpy()))
+            if target != "integer" and np.dtype(target).itemsize >= smallest.itemsize:
+                smallest = np.dtype(target)  # the declared width, unless the data needs more
+            dtypes[column] = smallest.name
+        else:
+            dtypes[column] = target
+    return dtypes
+
+
+def compact_frame(frame, schema=MARKET_DATA_SCHEMA, decimals=FLOAT_DECIMALS, categorical=False):
+    """A copy of `frame` with the compact dtypes applied (categorical: see compact_dtypes)."""
+    dtypes = compact_dtypes(frame, schema, decimals, categorical)
+    converted = {}
+    for column, dtype in dtypes.items():
+        if dtype.startswith("datetime64"):
+            converted[column] = pd.to_datetime(frame[column], errors="coerce").astype(dtype)
+        else:
+            converted[column] = frame[column].astype(dtype)
+    return frame.assign(**converted)
+
+
+def concat_compact(frames):
+    """Concatenate compact chunks, unioning categories so categorical columns stay categorical."""
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame()
+    for column in frames[0].columns:
+        if all(isinstance(f[column].dtype, pd.CategoricalDtype) for f in frames if column in f):
+            categories = pd.api.types.union_categoricals(
+                [f[column] for f in frames if column in f], sort_categories=True).categories
+            for f in frames:
+                if column in f:
+                    f[column] = f[column].cat.set_categories(categories)
+    combined = pd.concat(frames, ignore_index=True)
+    for column in combined.columns:  # a chunk narrowed differently upcasts the whole column; narrow again
+        if combined[column].dtype == np.float64 and MARKET_DATA_SCHEMA.get(column) == "float32":
+            combined[column] = compact_frame(combined[[column]])[column]
+    return combined
+
+
+def load_market_data(collection, filter=None, projection=None, batch_size=None, schema=MARKET_DATA_SCHEMA,
+                     categorical=False):
+    """find() straight into a compact frame: each batch is narrowed before the next one is read."""
+    from mongo_frame_bridge import DEFAULT_BATCH_SIZE, find_frames
+
+    chunks = find_frames(collection, filter, projection, batch_size=batch_size or DEFAULT_BATCH_SIZE)
+    return concat_compact(compact_frame(chunk, schema, categorical=categorical) for chunk in chunks)
+
+
+# ============================================================
+# 📏 MEMORY REPORT AND TOLERANCE CHECKS
+# ============================================================
+
+def memory_report(before, after):
+    """Per-column deep memory (MB) and dtype before / after, with a total row."""
+    mb_before = before.memory_usage(deep=True, index=False) / 1e6
+    mb_after = after.memory_usage(deep=True, index=False) / 1e6
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "MB_before": mb_before.round(2),
+        "MB_after": mb_after.round(2),
+    })
+    report.loc["total"] = ["", "", round(mb_before.sum(), 2), round(mb_after.sum(), 2)]
+    report["ratio"] = (report["MB_before"] / report["MB_after"]).round(1)
+    return report
+
+
+def column_errors(before, after):
+    """Largest absolute change per numeric column introduced by the narrowing."""
+    errors = {}
+    for column in before.columns:
+        if pd.api.types.is_numeric_dtype(before[column]) and column in after:
+            diff = np.abs(before[column].to_numpy(np.float64) - after[column].to_numpy(np.float64))
+            errors[column] = float(np.nanmax(diff)) if len(diff) else 0.0
+    return errors
+
+
+def _plain(values):
+    # categoricals → their values, float32 / Arrow / nullable numbers → float64, Arrow strings → objects
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return np.asarray(values, dtype=object)
+    if dtype == np.float32:
+        return np.asarray(values, dtype=np.float64)
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        kind = getattr(dtype, "kind", "O")
+        if kind in "iuf":
+            return values.to_numpy(dtype=np.float64, na_value=np.nan)
+        if kind == "M":
+            return values.to_numpy(dtype="datetime64[ns]", na_value=np.datetime64("NaT"))
+        return values.to_numpy(dtype=object, na_value=np.nan)
+    return np.asarray(values)
+
+
+def _comparable(result):
+    # results from differently typed frames compare on content
+    if isinstance(result, pd.DataFrame):
+        return pd.DataFrame({i: _plain(result.iloc[:, i]) for i in range(result.shape[1])},
+                            index=_comparable(result.index)).set_axis(_comparable(result.columns), axis=1)
+    if isinstance(result, pd.Series):
+        return pd.Series(_plain(result), index=_comparable(result.index), name=result.name)
+    if isinstance(result, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays([_comparable(result.get_level_values(i)) for i in range(result.nlevels)],
+                                         names=result.names)
+    if isinstance(result, pd.Index):
+        return pd.Index(_plain(result), name=result.name)
+    if isinstance(result, pd.api.extensions.ExtensionArray):
+        return _plain(result)
+    if isinstance(result, list) and result and all(isinstance(r, dict) for r in result):
+        return _comparable(pd.DataFrame(result))
+    return result
+
+
+def results_match(a, b, rtol=1e-5, atol=1e-6):
+    """True when two example results are equal up to dtype and float tolerance."""
+    a, b = _comparable(a), _comparable(b)
+    try:
+        if isinstance(a, pd.DataFrame):
+            pd.testing.assert_frame_equal(a, b, check_dtype=False, check_index_type=False,
+                                          check_column_type=False, check_freq=False, check_exact=False, rtol=rtol, atol=atol)
+        elif isinstance(a, pd.Series):
+            pd.testing.assert_series_equal(a, b, check_dtype=False, check_index_type=False, check_freq=False,
+                                           check_exact=False, rtol=rtol, atol=atol)
+        elif isinstance(a, pd.Index):
+            pd.testing.assert_index_equal(a, b, exact=False, check_exact=False, rtol=rtol, atol=atol)
+        elif isinstance(a, np.ndarray):
+            return len(a) == len(b) and all(results_match(x, y, rtol, atol) for x, y in zip(a, b))
+        elif isinstance(a, (float, np.floating)) and isinstance(b, (float, np.floating)):
+            return math.isclose(a, b, rel_tol=rtol, abs_tol=atol) or (math.isnan(a) and math.isnan(b))
+        else:
+            return a == b
+    except (AssertionError, TypeError, ValueError):
+        return False
+    return True
+
+
+def _outcome(example):
+    try:
+        return example.result, None
+    except Exception as exc:  # some examples don't apply to every frame (e.g. pivot with duplicate keys)
+        return None, f"{type(exc).__name__}: {exc}"
+    finally:
+        example.forget()
+
+
+def compare_examples(before, after, rtol=1e-5, atol=1e-6, numbers=None, examples=None):
+    """
+    Run the pandas examples one at a time on the original and the compact frame:
+    - returns one row per example: example / name / match / error (an example matches when both frames raise the same error)
+    """
+    if examples is None:
+        from pandas_utils import pandas_query_examples as examples
+
+    expected, actual = examples(before), examples(after)
+    rows = []
+    for number in numbers or range(1, len(expected) + 1):
+        (result, error), (other, other_error) = _outcome(expected[number]), _outcome(actual[number])
+        name = expected[number].name
+        if error or other_error:
+            match = (error or "").split(":")[0] == (other_error or "").split(":")[0]
+        else:
+            match = name in EXPECTED_DIFFERENCES or results_match(result, other, rtol, atol)
+        rows.append({"example": number, "name": name, "match": match, "error": error or other_error})
+    return rows
+
+
+# ============================================================
+# 🧪 DEMO: 10M-ROW FOOTPRINT
+# ============================================================
+
+def main(argv=None):
+    from market_data_generator import market_data_frame
+
+    parser = argparse.ArgumentParser(description="Compact dtypes for market_data frames")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--check-rows", type=int, default=2_000, help="frame size for the example comparison")
+    parser.add_argument("--backend", choices=["columnar", "mongomock", "mongod"],
+                        help="also load a seeded collection through load_market_data")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    args = parser.parse_args(argv)
+
+    frame = market_data_frame(args.rows).astype({"symbol": object, "sector": object})  # as documents arrive
+    compact = compact_frame(frame)
+    print(memory_report(frame, compact).to_string())
+    print(f"📐 largest change per column: {column_errors(frame, compact)}")
+    categorical = compact_frame(frame, categorical=True).memory_usage(deep=True, index=False).sum() / 1e6
+    print(f"🏷️  categorical=True: {categorical:.2f} MB (not a drop-in replacement: #33 and #57 raise TypeError)")
+
+    if args.backend:
+        from mongo_benchmark import connect, seed_market_data
+
+        collection = seed_market_data(connect(args.backend, args.uri), min(args.rows, 200_000))
+        loaded = load_market_data(collection, projection={"_id": 0})
+        print(f"🗄️  load_market_data: {len(loaded):,} rows, "
+              f"{loaded.memory_usage(deep=True).sum() / 1e6:.1f} MB, dtypes {dict(loaded.dtypes.astype(str))}")
+
+    small = market_data_frame(args.check_rows).astype({"symbol": object, "sector": object})
+    rows = compare_examples(small, compact_frame(small))
+    different = [(r["example"], r["name"]) for r in rows if not r["match"]]
+    raising = [r["example"] for r in rows if r["error"] and r["match"]]
+    print(f"🔍 pandas_query_examples: {len(rows) - len(different)}/{len(rows)} within tolerance"
+          + (f" ({raising} raise the same error on both frames)" if raising else "")
+          + (f"; differ: {different}" if different else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import argparse
+import json
+import os
+import re
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 🧷 MEMORY-MAPPED COLUMNAR STORE FOR MARKET_DATA AND DF_TIME
+# ============================================================
+#
+# Parquet and Mongo both decode every value into a fresh DataFrame on every
+# load, so each process that wants market_data pays the full read and holds
+# its own copy.  This store keeps one raw .npy file per column plus a small
+# schema.json; strings are dictionary-encoded (int8/16/32 codes on disk, the
+# dictionary in the schema).  Opening maps the files and wraps them, without
+# reading or copying a single value:
+#
+#     write_store("market_data.store", generate_market_data(100_000_000, chunk=1_000_000))
+#     write_store("sales.store", df_time)                      # one frame works too
+#     frame = open_store("market_data.store")                  # ms, whatever the size
+#     frame = open_store("market_data.store", columns=["sector", "price"])
+#     frame.groupby("sector", observed=True)["price"].mean()   # pages fault in as they are touched
+#
+# Numbers and dates come back as np.memmap-backed columns and strings as
+# categoricals over memmapped codes, so every process that opens the same
+# store shares one copy of the data in the OS page cache.  The frame is
+# read-only: operations return new frames as usual, but writing into it in
+# place raises — copy() the columns you want to modify.
+#
+# Chunks are appended as they arrive, so writing needs one chunk of memory.
+# A column's dtype is fixed by the first chunk (or by `dtypes=`); later chunks
+# must cast to it safely.  Nullable / Arrow numbers are stored as their NumPy
+# dtype (float64 when they hold missing values); tz-aware dates aren't supported.
+
+SCHEMA_FILE = "schema.json"
+FORMAT = "mmap-column-store"
+VERSION = 1
+HEADER_BYTES = 128  # fixed .npy header, rewritten with the final row count on close
+COPY_BLOCK = 1 << 22
+
+
+def _npy_header(dtype, rows):
+    # a version 1.0 .npy header padded to HEADER_BYTES, so the row count can change without moving the data
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": (rows,)})
+    header = header.ljust(HEADER_BYTES - 10 - 1) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+def _file_name(position, name):
+    return f"{position:03d}_{re.sub(r'[^0-9A-Za-z]+', '_', str(name)).strip('_')}.npy"
+
+
+def _is_dictionary(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.DatetimeTZDtype) or (isinstance(dtype, pd.ArrowDtype) and getattr(dtype.pyarrow_dtype, "tz", None)):
+        raise TypeError(f"column {series.name!r}: tz-aware dates aren't supported; convert to naive UTC first")
+    if isinstance(dtype, pd.CategoricalDtype):
+        return True
+    return not (pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+                or pd.api.types.is_datetime64_dtype(dtype) or pd.api.types.is_timedelta64_dtype(dtype))
+
+
+def _numpy_values(series):
+    # the column as a plain NumPy array; nullable / Arrow numbers give up their mask for NaN / NaT
+    dtype = series.dtype
+    if not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return series.to_numpy()
+    numpy_dtype = np.dtype(getattr(dtype, "numpy_dtype", object))
+    if numpy_dtype.kind in "mM":
+        return series.to_numpy(dtype=numpy_dtype, na_value=np.datetime64("NaT"))
+    if series.isna().any():
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series.to_numpy(dtype=numpy_dtype)
+
+
+def _smallest_code(count):
+    for dtype in (np.int8, np.int16, np.int32):
+        if count - 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"{count:,} distinct values is too many for a dictionary column")
+
+
+class _ValueColumn:
+    """A numeric / boolean / datetime column: the values, raw, after the .npy header."""
+
+    def __init__(self, path, dtype, pinned):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.pinned = pinned
+        self.rows = 0
+        self.fh = open(path, "wb")
+        self.fh.write(_npy_header(self.dtype, 0))
+
+    def append(self, series):
+        values = _numpy_values(series)
+        if values.dtype != self.dtype:
+            if not self.pinned and not np.can_cast(values.dtype, self.dtype, "safe"):
+                raise TypeError(f"column {series.name!r}: a chunk of {values.dtype} doesn't fit the stored "
+                                f"{self.dtype}; pass dtypes={{{series.name!r}: ...}} to fix the column's dtype")
+            values = values.astype(self.dtype)
+        values = np.ascontiguousarray(values)
+        self.fh.write(values.view(np.uint8).data)
+        self.rows += len(values)
+
+    def close(self):
+        self.fh.seek(0)
+        self.fh.write(_npy_header(self.dtype, self.rows))
+        self.fh.close()
+        return {"kind": "values", "dtype": self.dtype.str}
+
+
+class _DictionaryColumn:
+    """A string / categorical column: int32 codes while writing, narrowed to the dictionary's size on close."""
+
+    def __init__(self, path, series):
+        self.path = path
+        self.staging = path + ".codes"
+        self.rows = 0
+        self.lookup = {}
+        self.ordered = False
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            self.ordered = bool(series.dtype.ordered)
+            self._codes_for(series.cat.categories)  # declared order first
+        self.fh = open(self.staging, "wb")
+
+    def _codes_for(self, values):
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            value = value.item() if isinstance(value, np.generic) else value
+            codes[i] = self.lookup.setdefault(value, len(self.lookup))
+        return codes
+
+    def append(self, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        mapping = self._codes_for(np.asarray(uniques, dtype=object))
+        stored = np.where(codes >= 0, mapping[np.maximum(codes, 0)] if len(mapping) else -1, -1).astype(np.int32)
+        self.fh.write(stored.view(np.uint8).data)
+        self.rows += len(stored)
+
+    def close(self):
+        self.fh.close()
+        dtype = _smallest_code(max(len(self.lookup), 1))
+        with open(self.path, "wb") as out:
+            out.write(_npy_header(dtype, self.rows))
+            if self.rows:
+                staged = np.memmap(self.staging, dtype=np.int32, mode="r")
+                for offset in range(0, self.rows, COPY_BLOCK):
+                    out.write(np.ascontiguousarray(staged[offset:offset + COPY_BLOCK], dtype=dtype).view(np.uint8).data)
+                del staged
+        os.remove(self.staging)
+        categories = list(self.lookup)
+        try:
+            json.dumps(categories)
+        except TypeError as exc:
+            raise TypeError(f"dictionary values must be strings / numbers / booleans: {exc}") from None
+        return {"kind": "dictionary", "dtype": dtype.str, "categories": categories, "ordered": self.ordered}
+
+
+class ColumnStoreWriter:
+    """
+    Append DataFrame chunks to a store directory:
+    - every chunk must have the first chunk's columns
+    - close() (or leaving the with block) finalizes the headers and writes schema.json
+    """
+
+    def __init__(self, root, dtypes=None, overwrite=False):
+        self.root = root
+        self.dtypes = dict(dtypes or {})
+        self.columns = None
+        self.rows = 0
+        if os.path.exists(os.path.join(root, SCHEMA_FILE)):
+            if not overwrite:
+                raise FileExistsError(f"{root} already holds a store (pass overwrite=True to replace it)")
+            for column in read_schema(root)["columns"]:
+                os.remove(os.path.join(root, column["file"]))
+            os.remove(os.path.join(root, SCHEMA_FILE))
+        os.makedirs(root, exist_ok=True)
+
+    def _sink(self, position, name, series):
+        path = os.path.join(self.root, _file_name(position, name))
+        if name in self.dtypes:
+            if self.dtypes[name] == "category":
+                return _DictionaryColumn(path, series)
+            return _ValueColumn(path, self.dtypes[name], pinned=True)
+        if _is_dictionary(series):
+            return _DictionaryColumn(path, series)
+        return _ValueColumn(path, _numpy_values(series).dtype, pinned=False)
+
+    def append(self, frame):
+        if self.columns is None:
+            if not frame.columns.is_unique:
+                raise ValueError("column names must be unique")
+            self.columns = {name: self._sink(i, name, frame[name]) for i, name in enumerate(frame.columns)}
+        elif list(frame.columns) != list(self.columns):
+            raise ValueError(f"chunk columns {list(frame.columns)} differ from the store's {list(self.columns)}")
+        for name, sink in self.columns.items():
+            sink.append(frame[name])
+        self.rows += len(frame)
+
+    def close(self):
+        """Finalize every column file and write schema.json; returns the schema."""
+        columns = []
+        for name, sink in (self.columns or {}).items():
+            columns.append({"name": name, "file": os.path.basename(sink.path), **sink.close()})
+        schema = {"format": FORMAT, "version": VERSION, "rows": self.rows, "columns": columns}
+        staging = os.path.join(self.root, SCHEMA_FILE + ".tmp")
+        with open(staging, "w") as fh:
+            json.dump(schema, fh, indent=1)
+        os.replace(staging, os.path.join(self.root, SCHEMA_FILE))  # a store is complete once its schema exists
+        return schema
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def write_store(root, chunks, dtypes=None, overwrite=False):
+    """Write a DataFrame, or an iterable of DataFrame chunks, as a store; returns the schema."""
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    with ColumnStoreWriter(root, dtypes, overwrite) as writer:
+        for frame in chunks:
+            writer.append(frame)
+    return read_schema(root)
+
+
+def read_schema(root):
+    """The store's schema.json: rows and, per column, file / kind / dtype (and the dictionary)."""
+    with open(os.path.join(root, SCHEMA_FILE)) as fh:
+        schema = json.load(fh)
+    if schema.get("format") != FORMAT or schema.get("version") != VERSION:
+        raise ValueError(f"{root} is not a version {VERSION} {FORMAT}")
+    return schema
+
+
+def open_store(root, columns=None):
+    """
+    Map the store's columns into a read-only DataFrame:
+    - nothing is read or copied; pages load on first touch and are shared between processes
+    - `columns` picks (and orders) a subset
+    """
+    schema = read_schema(root)
+    by_name = {column["name"]: column for column in schema["columns"]}
+    missing = [name for name in columns or [] if name not in by_name]
+    if missing:
+        raise KeyError(f"columns not in the store: {missing}")
+    data = {}
+    for name in columns if columns is not None else list(by_name):
+        column = by_name[name]
+        values = np.load(os.path.join(root, column["file"]), mmap_mode="r")
+        if len(values) != schema["rows"]:
+            raise ValueError(f"{column['file']} holds {len(values):,} rows, the schema says {schema['rows']:,}")
+        if column["kind"] == "dictionary":
+            dtype = pd.CategoricalDtype(pd.Index(column["categories"]), ordered=column["ordered"])
+            values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)  # codes were checked on write
+        data[name] = values
+    return pd.DataFrame(data, index=pd.RangeIndex(schema["rows"]), copy=False)
+
+
+def _mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def mapped_columns(frame):
+    """{column: True} for every column still backed by the store's files (False once pandas copied it)."""
+    mapped = {}
+    for name in frame.columns:
+        values = frame[name].array
+        mapped[name] = _mapped(values.codes if isinstance(values, pd.Categorical) else values.to_numpy())
+    return mapped
+
+
+def store_bytes(root):
+    """Size of the store on disk."""
+    return sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+
+
+# ============================================================
+# 🧪 DEMO: OPEN TIME, ZERO COPY AND SHARED PAGES
+# ============================================================
+
+def _memory_mb():
+    # (RSS, PSS) in MB; PSS splits shared pages between the processes mapping them (Linux only)
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return None, None
+    return values.get("Rss"), values.get("Pss")
+
+
+def _worker(root, barrier, queue):
+    start = time.perf_counter()
+    frame = open_store(root)
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    frame.groupby("sector", observed=True)[["price", "return", "VaR"]].mean()
+    frame["volume"].sum()
+    frame["date"].max()
+    computed = time.perf_counter() - start
+    barrier.wait()  # every worker has the store mapped and touched before memory is read
+    rss, pss = _memory_mb()
+    queue.put({"pid": os.getpid(), "first_open_ms": opened * 1000, "query_s": computed, "rss_MB": rss, "pss_MB": pss})
+    barrier.wait()
+
+
+def shared_readers(root, workers=4):
+    """Open and aggregate the same market_data store from several processes at once; one row per worker."""
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    barrier, queue = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=_worker, args=(root, barrier, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return pd.DataFrame(rows)
+
+
+def _best_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(argv=None):
+    import tempfile
+
+    from market_data_generator import generate_market_data, write_parquet
+    from market_data_schema import results_match
+    from mongo_frame_bridge import measure_peak
+    from pandas_fast_paths import sales_frame
+
+    parser = argparse.ArgumentParser(description="Memory-mapped columnar store for market_data and df_time")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--sales-rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--root", help="store directory (default: a temporary one)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        small = pd.concat(generate_market_data(20_000, chunk=7_000), ignore_index=True)
+        write_store(os.path.join(scratch, "check"), generate_market_data(20_000, chunk=7_000))
+        sales = sales_frame(20_000)
+        write_store(os.path.join(scratch, "sales_check"), sales)
+        same = (results_match(small, open_store(os.path.join(scratch, "check")), 0, 0)
+                and results_match(sales, open_store(os.path.join(scratch, "sales_check")), 0, 0))
+        print("✅ round trip: market_data and df_time come back unchanged" if same else "❌ round trip differs")
+
+        root = args.root or os.path.join(scratch, "market_data.store")
+        start = time.perf_counter()
+        write_store(root, generate_market_data(args.rows, chunk=1_000_000), overwrite=True)
+        print(f"🧷 {args.rows:,} rows → {root}: {store_bytes(root) / 1e9:.2f} GB in {time.perf_counter() - start:.1f}s")
+
+        frame, peak, _ = measure_peak(lambda: open_store(root))
+        mapped = mapped_columns(frame)
+        print(f"⏱️  open_store: {_best_ms(lambda: open_store(root)):.2f} ms, {peak / 1e6:.2f} MB allocated, "
+              f"zero-copy columns {sum(mapped.values())}/{len(mapped)}")
+        try:
+            parquet = os.path.join(scratch, "market_data.parquet")
+            write_parquet(parquet, generate_market_data(args.rows, chunk=1_000_000))
+            print(f"🪵 read_parquet of the same rows: {_best_ms(lambda: pd.read_parquet(parquet), 1):,.0f} ms")
+        except ImportError:
+            print("🪵 pyarrow not installed — no Parquet comparison")
+
+        sales_root = os.path.join(scratch, "sales.store")
+        write_store(sales_root, sales_frame(args.sales_rows))
+        daily = open_store(sales_root).groupby("Date")["Revenue"].sum()
+        print(f"🧾 df_time store: {args.sales_rows:,} rows, {store_bytes(sales_root) / 1e6:.0f} MB, opened in "
+              f"{_best_ms(lambda: open_store(sales_root)):.2f} ms, {len(daily)} daily revenue totals")
+
+        if args.workers:
+            readers = shared_readers(root, args.workers)
+            with pd.option_context("display.width", 200):
+                print(readers.round(2).to_string(index=False))
+            if readers["pss_MB"].notna().all():
+                print(f"🤝 {args.workers} processes: RSS {readers['rss_MB'].sum():,.0f} MB summed, "
+                      f"PSS {readers['pss_MB'].sum():,.0f} MB — the mapped pages are counted once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_prep_and_mongo_utils import WRITE_EXAMPLES, mongo_query_examples
+
+
+# ============================================================
+# ⚡ ASYNC CONCURRENT RUNNER FOR THE MONGO EXAMPLES
+# ============================================================
+#
+# Run one at a time, the 75 examples cost the sum of their round trips.  The
+# read-only ones are independent, so run_concurrently() fans them out on an
+# asyncio loop through a bounded thread pool (the examples are plain pymongo
+# lambdas, so each one runs on a pool thread while the loop only schedules),
+# then runs the write examples one by one, in order, after every read is done:
+#
+#     rows, wall_s = run(db, concurrency=8)              # asyncio.run under the hood
+#     rows, wall_s = await run_concurrently(db, 8)       # from inside a running loop
+#     rows, wall_s = run_sequentially(db)                # the one-at-a-time baseline
+#
+# In-process stand-ins (columnar / mongomock) answer without a network hop,
+# so LatencyDatabase adds a simulated round trip per call (time.sleep releases
+# the GIL just like a socket wait does) to model a remote server locally.  The
+# stand-ins' own query work still holds the GIL, so the speed-up they show is
+# bounded by how much of each call is waiting; against mongod the server-side
+# work runs in parallel too.
+
+DEFAULT_CONCURRENCY = 8
+
+
+class _LatencyCollection:
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class LatencyDatabase:
+    """db wrapper that sleeps latency_ms before every collection call, like a round trip to a remote server."""
+
+    def __init__(self, database, latency_ms=2.0):
+        self._database = database
+        self.latency_ms = latency_ms
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        return _LatencyCollection(self._database[name], self.latency_ms / 1000)
+
+    def get_collection(self, name):
+        return self[name]
+
+
+def split_examples(count, examples=None, include_writes=True):
+    """(read example numbers, write example numbers), writes in their original order."""
+    wanted = sorted(set(examples) if examples else range(1, count + 1))
+    reads = [n for n in wanted if n not in WRITE_EXAMPLES]
+    writes = [n for n in wanted if n in WRITE_EXAMPLES] if include_writes else []
+    return reads, writes
+
+
+def _timed(number, example):
+    start = time.perf_counter()
+    try:
+        result, error = example(), None
+    except Exception as exc:  # stand-ins lack some operators; record and move on
+        result, error = None, f"{type(exc).__name__}: {exc}"
+    return {"example": number, "ms": (time.perf_counter() - start) * 1000, "error": error, "result": result}
+
+
+async def run_concurrently(db, concurrency=DEFAULT_CONCURRENCY, examples=None, include_writes=True):
+    """
+    Reads concurrently (at most `concurrency` in flight), then writes sequentially:
+    - returns (rows in example order, wall seconds); each row has example / ms / error / result
+    """
+    lambdas = mongo_query_examples(db)
+    reads, writes = split_examples(len(lambdas), examples, include_writes)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="mongo-example") as pool:
+        rows = list(await asyncio.gather(*(loop.run_in_executor(pool, _timed, n, lambdas[n - 1]) for n in reads)))
+        for number in writes:  # ordered, and only once every read has finished
+            rows.append(await loop.run_in_executor(pool, _timed, number, lambdas[number - 1]))
+    return rows, time.perf_counter() - start
+
+
+def run(db, concurrency=DEFAULT_CONCURRENCY, examples=None, include_writes=True):
+    """Blocking entry point for run_concurrently()."""
+    return asyncio.run(run_concurrently(db, concurrency, examples, include_writes))
+
+
+def run_sequentially(db, examples=None, include_writes=True):
+    """The baseline: same examples and order, one at a time."""
+    lambdas = mongo_query_examples(db)
+    reads, writes = split_examples(len(lambdas), examples, include_writes)
+    start = time.perf_counter()
+    rows = [_timed(n, lambdas[n - 1]) for n in reads + writes]
+    return rows, time.perf_counter() - start
+
+
+def nondeterministic_examples():
+    """Examples whose result legitimately changes between runs ($sample)."""
+    from mongo_query_capture import capture_examples
+
+    return {call.example for call in capture_examples()
+            if call.pipeline and any("$sample" in stage for stage in call.pipeline)}
+
+
+def _plain(value):
+    counts = {k: getattr(value, k) for k in ("matched_count", "modified_count", "deleted_count") if hasattr(value, k)}
+    if counts or hasattr(value, "acknowledged"):  # write results: compare counts, not generated ids
+        return {type(value).__name__: counts}
+    return str(value)
+
+
+def _fingerprint(result):
+    # _ids generated while seeding differ between databases; everything else must match
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if not (k == "_id" and not isinstance(v, (str, dict)))}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    return json.dumps(strip(result), default=_plain, sort_keys=True)
+
+
+def mismatched(rows, baseline):
+    """Example numbers whose result or error differs from the baseline run."""
+    skip = nondeterministic_examples()
+    expected = {r["example"]: r for r in baseline}
+    return [r["example"] for r in rows if r["example"] not in skip and (
+        r["error"] != expected[r["example"]]["error"] or
+        _fingerprint(r["result"]) != _fingerprint(expected[r["example"]]["result"]))]
+
+
+def main(argv=None):
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Run the Mongo examples concurrently vs one at a time")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency-ms", type=float, default=10.0,
+                        help="simulated round trip per call for the in-process backends (0 = none)")
+    parser.add_argument("--examples", type=int, nargs="*")
+    parser.add_argument("--reads-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    def fresh(name):
+        db = connect(args.backend, args.uri, name)
+        seed_market_data(db, args.size)
+        db["market_data"].count_documents({})  # settle lazily built state before threads share it
+        return LatencyDatabase(db, args.latency_ms) if args.latency_ms and args.backend != "mongod" else db
+
+    include_writes = not args.reads_only
+    baseline, sequential_s = run_sequentially(fresh("async_sequential"), args.examples, include_writes)
+    rows, concurrent_s = run(fresh("async_concurrent"), args.concurrency, args.examples, include_writes)
+
+    errors = sum(r["error"] is not None for r in rows)
+    busy_s = sum(r["ms"] for r in rows) / 1000
+    print(f"🧵 {len(rows)} examples ({sum(r['example'] in WRITE_EXAMPLES for r in rows)} writes last, in order), "
+          f"concurrency {args.concurrency}, {args.latency_ms:g} ms simulated latency, {errors} errors")
+    print(f"   sequential {sequential_s:.2f}s   concurrent {concurrent_s:.2f}s   "
+          f"({sequential_s / concurrent_s:.1f}x; {busy_s:.2f}s of summed example time)")
+    different = mismatched(rows, baseline)
+    print("✅ same results as the sequential run" if not different else f"❌ results differ for {different}")
+
+
+if __name__ == "__main__":
+    main()
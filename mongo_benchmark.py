@@ -0,0 +1,221 @@
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from data_prep_and_mongo_utils import WRITE_EXAMPLES, mongo_query_examples
+from market_data_generator import generate_market_data, write_mongo
+
+try:
+    import bson
+except ImportError:  # pymongo not installed — fall back to JSON size estimates
+    bson = None
+
+
+# ============================================================
+# ⏱️ SCALED BENCHMARK HARNESS FOR THE 75 MONGO EXAMPLES
+# ============================================================
+#
+#   python mongo_benchmark.py run --size 10k --backend mongomock --repeat 5 --out before.json
+#   (create an index / change the schema)
+#   python mongo_benchmark.py run --size 10k --backend mongomock --repeat 5 --out after.json
+#   python mongo_benchmark.py diff before.json after.json
+#
+# Backends: "columnar" (mongo_columnar_engine), "mongomock", or "mongod" (a local
+# server reached through --uri).  Write examples (#1, #2, #12–#15) mutate the
+# seeded data, so they are skipped unless --include-writes is given, in which
+# case they run once each after all reads.
+
+SIZES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+SEED_CHUNK = 50_000
+
+
+def parse_size(size):
+    """'10k' / '1M' / '10M' / '25000' → number of documents."""
+    if isinstance(size, int):
+        return size
+    if size in SIZES:
+        return SIZES[size]
+    suffix = size[-1].lower()
+    if suffix in "km":
+        return int(float(size[:-1]) * (1_000 if suffix == "k" else 1_000_000))
+    return int(size)
+
+
+def connect(backend, uri="mongodb://localhost:27017", db_name="benchmark"):
+    """Return a database handle for the chosen stand-in."""
+    if backend == "columnar":
+        from mongo_columnar_engine import ColumnarDatabase
+        return ColumnarDatabase(db_name)
+    if backend == "mongomock":
+        import mongomock
+        return mongomock.MongoClient()[db_name]
+    if backend == "mongod":
+        from mongo_client_manager import get_database
+        return get_database(db_name, uri)  # shared pooled client, not one per call
+    raise ValueError(f"unknown backend {backend!r} (expected columnar / mongomock / mongod)")
+
+
+def seed_market_data(db, n, seed=0, chunk=SEED_CHUNK):
+    """Drop and refill db["market_data"] with n generated documents, chunk by chunk."""
+    collection = db["market_data"]
+    collection.drop()
+    write_mongo(collection, generate_market_data(n, seed, chunk))
+    return collection
+
+
+def _encoded_size(document):
+    if bson is not None:
+        return len(bson.encode(document))
+    return len(json.dumps(document, default=str))
+
+
+def _result_size(result):
+    """(documents returned, bytes transferred) for one example's return value."""
+    if isinstance(result, dict):
+        return 1, _encoded_size(result)
+    if isinstance(result, list):
+        docs = [d for d in result if isinstance(d, dict)]
+        if len(docs) == len(result):
+            return len(result), sum(_encoded_size(d) for d in docs)
+        return len(result), _encoded_size({"values": result})  # e.g. distinct()
+    if isinstance(result, (int, float)):
+        return 1, _encoded_size({"n": result})
+    return 0, 0  # write acknowledgements
+
+
+def run_benchmark(db, repeat=5, examples=None, include_writes=False):
+    """
+    Time each example `repeat` times on an already seeded db:
+    - examples: optional iterable of 1-based example numbers to run
+    - returns one dict per example with p50/p95/p99 latency (ms), docs and bytes
+    """
+    lambdas = mongo_query_examples(db)
+    wanted = set(examples) if examples else set(range(1, len(lambdas) + 1))
+    reads = [i for i in sorted(wanted) if i not in WRITE_EXAMPLES]
+    writes = [i for i in sorted(wanted) if i in WRITE_EXAMPLES] if include_writes else []
+
+    rows = []
+    for number in reads + writes:
+        example = lambdas[number - 1]
+        runs = 1 if number in WRITE_EXAMPLES else repeat
+        latencies, result, error = [], None, None
+        for _ in range(runs):
+            start = time.perf_counter()
+            try:
+                result = example()
+            except Exception as exc:  # stand-ins lack some operators; record and move on
+                error = f"{type(exc).__name__}: {exc}"
+                break
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        row = {"example": number, "runs": len(latencies), "error": error}
+        if latencies:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            docs, size = _result_size(result)
+            row.update(p50_ms=round(p50, 3), p95_ms=round(p95, 3), p99_ms=round(p99, 3), docs=docs, bytes=size)
+        rows.append(row)
+    return rows
+
+
+def save_run(rows, path, **meta):
+    with open(path, "w") as fh:
+        json.dump({"created": datetime.now().isoformat(timespec="seconds"), **meta, "results": rows}, fh, indent=2)
+
+
+def load_run(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def diff_runs(before, after, threshold=1.25, floor_ms=0.5):
+    """
+    Compare two saved runs example by example:
+    - regressed when p50 grows by more than `threshold`× and by more than floor_ms
+    - improved when it shrinks by the same margins
+    """
+    old = {r["example"]: r for r in before["results"]}
+    new = {r["example"]: r for r in after["results"]}
+    rows = []
+    for number in sorted(old.keys() & new.keys()):
+        a, b = old[number], new[number]
+        if "p50_ms" not in a or "p50_ms" not in b:
+            status = "error" if (a.get("error") or b.get("error")) else "n/a"
+            rows.append({"example": number, "status": status, "before": a.get("error"), "after": b.get("error")})
+            continue
+        ratio = b["p50_ms"] / a["p50_ms"] if a["p50_ms"] else float("inf")
+        delta = b["p50_ms"] - a["p50_ms"]
+        status = "same"
+        if ratio > threshold and delta > floor_ms:
+            status = "regressed"
+        elif ratio < 1 / threshold and -delta > floor_ms:
+            status = "improved"
+        rows.append({"example": number, "status": status, "p50_before": a["p50_ms"], "p50_after": b["p50_ms"],
+                     "ratio": round(ratio, 2), "docs_changed": a["docs"] != b["docs"]})
+    return rows
+
+
+def print_run(rows):
+    print(f"{'#':>3} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'docs':>10} {'bytes':>12}")
+    for r in rows:
+        if r.get("error"):
+            print(f"{r['example']:>3}  ⚠️  {r['error'][:90]}")
+            continue
+        print(f"{r['example']:>3} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+              f"{r['docs']:>10} {r['bytes']:>12}")
+
+
+def print_diff(rows):
+    flags = {"regressed": "🔴", "improved": "🟢", "same": "  ", "error": "⚠️", "n/a": "  "}
+    for r in rows:
+        if "ratio" not in r:
+            print(f"{flags[r['status']]} #{r['example']:>2} {r['status']}  "
+                  f"before={str(r['before'])[:60]}  after={str(r['after'])[:60]}")
+            continue
+        note = "  (result size changed)" if r["docs_changed"] else ""
+        print(f"{flags[r['status']]} #{r['example']:>2} {r['p50_before']:>10.3f} → {r['p50_after']:>10.3f} ms "
+              f"x{r['ratio']:<8} {r['status']}{note}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mongo_query_examples workload")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="seed market_data and time every example")
+    run.add_argument("--size", default="10k", help="10k / 1M / 10M or a plain number")
+    run.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    run.add_argument("--uri", default="mongodb://localhost:27017")
+    run.add_argument("--repeat", type=int, default=5)
+    run.add_argument("--examples", type=int, nargs="*", help="subset of example numbers")
+    run.add_argument("--include-writes", action="store_true")
+    run.add_argument("--no-seed", action="store_true", help="reuse the existing market_data collection")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--out", help="save results as JSON for a later diff")
+
+    diff = sub.add_parser("diff", help="compare two saved runs")
+    diff.add_argument("before")
+    diff.add_argument("after")
+    diff.add_argument("--threshold", type=float, default=1.25)
+    diff.add_argument("--floor-ms", type=float, default=0.5)
+
+    args = parser.parse_args(argv)
+    if args.command == "diff":
+        print_diff(diff_runs(load_run(args.before), load_run(args.after), args.threshold, args.floor_ms))
+        return
+
+    db = connect(args.backend, args.uri)
+    n = parse_size(args.size)
+    if not args.no_seed:
+        start = time.perf_counter()
+        seed_market_data(db, n, seed=args.seed)
+        print(f"🌱 seeded {n:,} documents into {args.backend} in {time.perf_counter() - start:.1f}s")
+    rows = run_benchmark(db, repeat=args.repeat, examples=args.examples, include_writes=args.include_writes)
+    print_run(rows)
+    if args.out:
+        save_run(rows, args.out, backend=args.backend, size=n, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+try:
+    import bson
+except ImportError:  # pymongo not installed — batches are sized by the JSON encoding instead
+    bson = None
+
+try:
+    from pymongo import DeleteMany, DeleteOne, InsertOne, UpdateMany, UpdateOne
+    from pymongo.errors import BulkWriteError
+except ImportError:  # pymongo not installed — BulkWriter can't build requests
+    DeleteMany = DeleteOne = InsertOne = UpdateMany = UpdateOne = None
+
+    class BulkWriteError(Exception):
+        details = {}
+
+
+# ============================================================
+# 📦 BATCHED BULK WRITES FOR THE UPDATE EXAMPLES
+# ============================================================
+#
+# Examples #12–#15 issue one delete_one / update_one / update_many per call,
+# and applying thousands of per-symbol price corrections that way pays one
+# round trip per correction.  BulkWriter queues the same operations and sends
+# them as unordered bulk_write batches, flushed at max_ops operations or
+# max_bytes of encoded requests (whichever comes first):
+#
+#     with BulkWriter(db["market_data"], max_ops=1000) as writer:
+#         for symbol, date, price in corrections:
+#             writer.update_one({"symbol": symbol, "date": date}, {"$set": {"price": price}})
+#         writer.delete_one({"symbol": "TSLA"})
+#         writer.write("update_many", {}, {"$set": {"currency": "USD"}})   # same, by method name
+#     writer.result()   # → {"matched": ..., "modified": ..., "deleted": ..., "batches": ..., "failed": ...}
+#
+# Batching must not change the result of the per-call sequence:
+# - a write that can touch any queued document ($rename, update_many,
+#   delete_many) flushes the queue and is sent on its own, so nothing queued
+#   before it lands after it and nothing queued after it lands before it
+# - a batch holding two writes that may hit the same document (their equality
+#   filters agree on every shared field), or a write whose filter reads a
+#   field another queued update writes, is sent ordered=True
+#
+# When a batch comes back with a BulkWriteError, the operations that failed
+# with a transient code (write conflicts, failovers, timeouts) are re-sent
+# with exponential backoff, up to `retries` times, before the next batch goes
+# out; an ordered batch re-sends from its first failure on, in order.
+# Everything else (duplicate keys, validation) is recorded in `errors`
+# without failing the whole batch.  Whole-batch network errors are left to
+# the driver's retryWrites.
+
+DEFAULT_MAX_OPS = 1_000
+DEFAULT_MAX_BYTES = 8 << 20   # well below the server's 48 MB message limit
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.05        # seconds, doubled on every retry
+
+TRANSIENT_CODES = {
+    6, 7, 89, 91, 189, 262, 9001,  # host unreachable / not found, network timeout, shutdown, stepdown, exceeded time limit
+    112,                           # WriteConflict
+    10107, 11600, 11602,           # not primary, interrupted at shutdown / due to repl state change
+    13435, 13436,                  # not primary (no secondaryOk), not primary or secondary
+}
+
+COUNTS = {"inserted": "nInserted", "matched": "nMatched", "modified": "nModified",
+          "deleted": "nRemoved", "upserted": "nUpserted"}  # our name → bulk_api_result field
+
+
+WRITE_METHODS = ("insert_one", "update_one", "update_many", "delete_one", "delete_many")
+
+
+def _encoded_size(document):
+    if bson is not None:
+        return len(bson.encode(document))
+    return len(json.dumps(document, default=str))
+
+
+def write_size(args):
+    """Encoded bytes one write adds to a batch (its filter / document / update plus framing)."""
+    size = 16
+    for part in args:
+        if isinstance(part, dict):
+            size += _encoded_size(part)
+        elif isinstance(part, list):  # pipeline-style update
+            size += _encoded_size({"u": part})
+    return size
+
+
+def _request(method, args):
+    request = {"insert_one": InsertOne, "update_one": UpdateOne, "update_many": UpdateMany,
+               "delete_one": DeleteOne, "delete_many": DeleteMany}[method]
+    return request(*args)
+
+
+def _is_barrier(method, args):
+    """Writes that can touch any queued document: every multi-document write, and $rename."""
+    if method in ("update_many", "delete_many"):
+        return True
+    return method == "update_one" and isinstance(args[1], dict) and "$rename" in args[1]
+
+
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, default=str, sort_keys=True)
+
+
+def _root(path):
+    return path.split(".", 1)[0]
+
+
+def _filter_fields(query):
+    """Top-level fields a filter reads; None when it can read any ($expr, $where, $text)."""
+    fields = set()
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            for clause in value:
+                inner = _filter_fields(clause)
+                if inner is None:
+                    return None
+                fields |= inner
+        elif key.startswith("$"):
+            return None
+        else:
+            fields.add(_root(key))
+    return fields
+
+
+def _read_fields(method, args):
+    return set() if method == "insert_one" else _filter_fields(args[0])
+
+
+def _written_fields(method, args):
+    """Top-level fields an update writes; None for a pipeline update (it may write any)."""
+    if not method.startswith("update"):
+        return set()
+    if not isinstance(args[1], dict):
+        return None
+    return {_root(f) for fields in args[1].values() if isinstance(fields, dict) for f in fields}
+
+
+def _meets(fields, queued):
+    # fields / queued: sets of top-level fields, None = any field
+    if fields is None or queued is None:
+        return bool(fields is None or fields) and bool(queued is None or queued)
+    return bool(fields & queued)
+
+
+def _target(method, args):
+    """
+    The document a single-document write aims at, as (fields, values) of its equality conditions:
+    - the inserted document for insert_one, the filter otherwise
+    - None when the filter uses operators (it may match anything)
+    """
+    conditions = args[0]
+    if any(k.startswith("$") or (isinstance(v, dict) and any(str(o).startswith("$") for o in v))
+           for k, v in conditions.items()):
+        return None
+    fields = tuple(sorted(conditions))
+    return fields, tuple(_hashable(conditions[f]) for f in fields)
+
+
+class BulkWriter:
+    """
+    Queue insert_one / update_one / update_many / delete_one / delete_many and send them in batches:
+    - flushes when a batch reaches max_ops or max_bytes, and on flush() / leaving the `with` block
+    - $rename and multi-document writes go out alone; batches with overlapping targets go out ordered
+    - transient per-operation failures are retried; the rest are kept in `errors`
+    """
+
+    def __init__(self, collection, max_ops=DEFAULT_MAX_OPS, max_bytes=DEFAULT_MAX_BYTES,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, ordered=False):
+        if UpdateOne is None:
+            raise ImportError("pymongo is required for BulkWriter")
+        self.collection = collection
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.ordered = ordered
+        self._batch = []
+        self._batch_bytes = 0
+        self._targets = {}       # fields → set of value tuples queued in this batch
+        self._read = set()       # fields the queued filters read (None = any)
+        self._written = set()    # fields the queued updates write (None = any)
+        self._dependent = False  # some queued writes may hit the same document
+        self.counts = dict.fromkeys(COUNTS, 0)
+        self.batches = self.retried = 0
+        self.errors = []
+
+    # ---------- queueing ----------
+
+    def _overlaps(self, target):
+        if target is None:
+            return bool(self._batch)
+        fields, values = target
+        for queued_fields, queued in self._targets.items():
+            if queued_fields == fields:
+                if values in queued:
+                    return True
+                continue
+            shared = [i for i, f in enumerate(queued_fields) if f in fields]
+            if not shared:
+                return True  # no field in common: both may match the same document
+            probe = tuple(values[fields.index(queued_fields[i])] for i in shared)
+            if any(tuple(v[i] for i in shared) == probe for v in queued):
+                return True
+        return False
+
+    def write(self, method, *args):
+        """Queue one write, given as the pymongo Collection method name and its arguments."""
+        if method not in WRITE_METHODS:
+            raise ValueError(f"unsupported write {method!r}; expected one of {WRITE_METHODS}")
+        barrier = _is_barrier(method, args)
+        if barrier:
+            self.flush()
+        size = write_size(args)
+        if self._batch and (len(self._batch) >= self.max_ops or self._batch_bytes + size > self.max_bytes):
+            self.flush()
+        if not barrier:
+            target = _target(method, args)
+            read, written = _read_fields(method, args), _written_fields(method, args)
+            # an update moving a document into (or out of) another queued write's filter depends on its order
+            self._dependent = (self._dependent or self._overlaps(target)
+                               or _meets(read, self._written) or _meets(written, self._read))
+            if target is not None:
+                self._targets.setdefault(target[0], set()).add(target[1])
+            self._read = None if read is None or self._read is None else self._read | read
+            self._written = None if written is None or self._written is None else self._written | written
+        self._batch.append((method, args))
+        self._batch_bytes += size
+        if barrier:
+            self.flush()
+        return self
+
+    def insert_one(self, document):
+        return self.write("insert_one", document)
+
+    def update_one(self, filter, update, upsert=False):
+        return self.write("update_one", filter, update, upsert)
+
+    def update_many(self, filter, update, upsert=False):
+        return self.write("update_many", filter, update, upsert)
+
+    def delete_one(self, filter):
+        return self.write("delete_one", filter)
+
+    def delete_many(self, filter):
+        return self.write("delete_many", filter)
+
+    def __len__(self):
+        return len(self._batch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    # ---------- sending ----------
+
+    def _count(self, reply):
+        for name, field in COUNTS.items():
+            self.counts[name] += reply.get(field, 0)
+
+    def flush(self):
+        """Send the queued operations; returns the number that were sent."""
+        writes, self._batch, self._batch_bytes = self._batch, [], 0
+        ordered = self.ordered or self._dependent
+        self._targets, self._read, self._written, self._dependent = {}, set(), set(), False
+        if writes:
+            self._send(writes, ordered)
+        return len(writes)
+
+    def _requests(self, writes):
+        # the columnar stand-in takes the (method, args) pairs as they are; pymongo needs request objects
+        # (`is True`: pymongo / mongomock collections answer any attribute with a sub-collection)
+        if getattr(self.collection, "bulk_write_pairs", False) is True:
+            return writes
+        return [_request(method, args) for method, args in writes]
+
+    def _send(self, writes, ordered):
+        """Send (method, args) writes as one bulk_write; failed ones are retried or recorded as pairs."""
+        for attempt in range(self.retries + 1):
+            self.batches += 1
+            try:
+                reply = self.collection.bulk_write(self._requests(writes), ordered=ordered).bulk_api_result
+            except BulkWriteError as exc:
+                reply = exc.details
+            self._count(reply)
+            write_errors = reply.get("writeErrors", [])
+            if not write_errors:
+                return
+            retry = []
+            for error in write_errors:
+                write = writes[error["index"]]
+                if error.get("code") in TRANSIENT_CODES and attempt < self.retries:
+                    retry.append(write)
+                else:
+                    self.errors.append({"code": error.get("code"), "errmsg": error.get("errmsg"), "write": write})
+            if ordered:  # an ordered batch stops at its first error: the rest were never attempted
+                skipped = writes[write_errors[0]["index"] + 1:]
+                if attempt < self.retries:
+                    retry.extend(skipped)
+                else:
+                    self.errors.extend({"code": None, "errmsg": "not attempted", "write": w} for w in skipped)
+            if not retry:
+                return
+            self.retried += len(retry)
+            writes = retry
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def result(self):
+        """Aggregated counts over every batch sent so far."""
+        return {**self.counts, "batches": self.batches, "retried": self.retried, "failed": len(self.errors)}
+
+
+def bulk_apply(collection, writes, **options):
+    """Send (method, args) writes through a BulkWriter; returns its aggregated counts."""
+    with BulkWriter(collection, **options) as writer:
+        for method, args in writes:
+            writer.write(method, *args)
+    return writer.result()
+
+
+def price_corrections(n, seed=0, symbols=None, dates=None):
+    """n (symbol, date, price) corrections drawn from the seeded market_data symbols and dates."""
+    from market_data_generator import market_data_frame
+
+    if symbols is None or dates is None:
+        frame = market_data_frame(2_000, seed)
+        symbols = frame["symbol"].unique() if symbols is None else symbols
+        dates = frame["date"].unique() if dates is None else dates
+    rng = np.random.default_rng(seed)
+    picked_symbols = rng.choice(np.asarray(symbols, dtype=object), n)
+    picked_dates = rng.choice(np.asarray(dates), n)
+    prices = np.round(rng.uniform(5, 500, n), 2)
+    return [(str(s), _to_datetime(d), float(p)) for s, d, p in zip(picked_symbols, picked_dates, prices)]
+
+
+def _to_datetime(value):
+    import pandas as pd
+
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def correction_writes(corrections):
+    """One update_one per correction, plus the #12–#15 writes at the end, as (method, args) pairs."""
+    writes = [("update_one", ({"symbol": s, "date": d}, {"$set": {"price": p}})) for s, d, p in corrections]
+    writes += [
+        ("delete_one", ({"symbol": "TSLA"},)),                                 # 12
+        ("update_one", ({"symbol": "AAPL"}, {"$set": {"price": 200}})),        # 13
+        ("update_many", ({}, {"$rename": {"price": "last_price"}})),           # 14
+        ("update_many", ({}, {"$set": {"currency": "USD"}})),                  # 15
+    ]
+    return writes
+
+
+def apply_per_call(collection, writes):
+    """The baseline: one delete_one / update_one / update_many / insert_one call per write."""
+    counts = dict.fromkeys(COUNTS, 0)
+    for method, args in writes:
+        result = getattr(collection, method)(*args)
+        if method == "insert_one":
+            counts["inserted"] += 1
+        elif method.startswith("update"):
+            counts["matched"] += result.matched_count
+            counts["modified"] += result.modified_count
+            counts["upserted"] += result.upserted_id is not None
+        else:
+            counts["deleted"] += result.deleted_count
+    return counts
+
+
+# ============================================================
+# 🧪 BENCHMARK: PER-CALL VS BATCHED
+# ============================================================
+
+def _state(collection):
+    docs = collection.find({}, {"_id": 0}).sort([("symbol", 1), ("date", 1)])
+    return [json.dumps(d, default=str, sort_keys=True) for d in docs]
+
+
+def main(argv=None):
+    from mongo_async_runner import LatencyDatabase
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Per-call updates vs batched bulk_write")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=5_000, help="market_data documents seeded")
+    parser.add_argument("--ops", type=int, nargs="*", default=[10_000, 100_000])
+    parser.add_argument("--max-ops", type=int, default=DEFAULT_MAX_OPS)
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="simulated round trip per call for the in-process backends (0 = none)")
+    args = parser.parse_args(argv)
+
+    def fresh(name):
+        db = connect(args.backend, args.uri, name)
+        seed_market_data(db, args.size)
+        if args.latency_ms and args.backend != "mongod":
+            db = LatencyDatabase(db, args.latency_ms)
+        return db["market_data"]
+
+    for ops in args.ops:
+        writes = correction_writes(price_corrections(ops - 4))
+
+        per_call = fresh("bulk_per_call")
+        start = time.perf_counter()
+        expected = apply_per_call(per_call, writes)
+        per_call_s = time.perf_counter() - start
+
+        batched = fresh("bulk_batched")
+        start = time.perf_counter()
+        counts = bulk_apply(batched, writes, max_ops=args.max_ops)
+        batched_s = time.perf_counter() - start
+
+        print(f"📦 {ops:,} ops: per-call {per_call_s:.2f}s ({ops / per_call_s:,.0f} ops/s, {ops:,} round trips)   "
+              f"batched {batched_s:.2f}s ({ops / batched_s:,.0f} ops/s, {counts['batches']} round trips)   "
+              f"{per_call_s / batched_s:.1f}x")
+        print(f"   counts {counts}")
+        same = all(expected[k] == counts[k] for k in COUNTS) and _state(per_call) == _state(batched)
+        print("✅ same counts and final documents as the per-call run" if same else f"❌ per-call counts {expected}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    from pymongo import MongoClient, monitoring
+except ImportError:  # pymongo not installed — the manager can't connect, the metrics class still imports
+    MongoClient = monitoring = None
+
+
+# ============================================================
+# 🏊 SHARED POOLED CLIENT FOR THE WHOLE PROCESS
+# ============================================================
+#
+# mongo_query_examples(db) leaves building `db` to the caller, and a script
+# that creates a MongoClient per job pays TCP + TLS + auth every time and opens
+# an unbounded number of connections.  Every script asks this module instead:
+#
+#     db = get_database("benchmark")                   # one pooled client per URI per process
+#     collection = get_collection("market_data")
+#     pool_metrics()       # → {"checkouts": ..., "wait_p95_ms": ..., "in_use": ..., "open": ...}
+#
+# configure() changes the pool options (closing existing clients), and the
+# MONGO_URI / MONGO_DB environment variables set the defaults.  After fork()
+# the child forgets the parent's clients — pymongo clients are not fork-safe,
+# and closing the inherited copy would talk over the parent's sockets — so each
+# worker process lazily builds its own pool on first use.
+
+DEFAULT_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DEFAULT_DB = os.environ.get("MONGO_DB", "benchmark")
+
+POOL_OPTIONS = {
+    "maxPoolSize": 32,             # hard cap of sockets per server; bounds what one process can open
+    "minPoolSize": 4,              # kept warm so a burst doesn't pay connection setup
+    "maxIdleTimeMS": 300_000,      # recycle sockets idle for 5 minutes (below typical LB / firewall timeouts)
+    "maxConnecting": 4,            # concurrent handshakes while the pool grows
+    "waitQueueTimeoutMS": 10_000,  # an exhausted pool fails a checkout instead of queueing forever
+    "connectTimeoutMS": 5_000,
+    "serverSelectionTimeoutMS": 5_000,
+    "retryReads": True,
+    "retryWrites": True,
+}
+
+WAIT_WINDOW = 10_000  # checkout waits kept for the percentiles
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener if monitoring is not None else object):
+    """Connection-pool listener: checkout wait times, sockets in use / open, failures and pool clears."""
+
+    def __init__(self, window=WAIT_WINDOW):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = self.failures = self.clears = 0
+        self.waiting = self.in_use = self.peak_in_use = self.open = 0
+
+    def _checked_out(self, event, failed):
+        with self._lock:
+            self.waiting -= 1
+            self._waits.append(event.duration * 1000)
+            if failed:
+                self.failures += 1
+            else:
+                self.checkouts += 1
+                self.in_use += 1
+                self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        self._checked_out(event, failed=False)
+
+    def connection_check_out_failed(self, event):
+        self._checked_out(event, failed=True)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def snapshot(self):
+        with self._lock:
+            waits = np.array(self._waits)
+            row = {"checkouts": self.checkouts, "failures": self.failures, "waiting": self.waiting,
+                   "in_use": self.in_use, "peak_in_use": self.peak_in_use, "open": self.open, "clears": self.clears}
+        if len(waits):
+            p50, p95, p99 = np.percentile(waits, [50, 95, 99])
+            row.update(wait_p50_ms=round(float(p50), 3), wait_p95_ms=round(float(p95), 3),
+                       wait_p99_ms=round(float(p99), 3), wait_max_ms=round(float(waits.max()), 3))
+        return row
+
+
+_lock = threading.Lock()
+_clients = {}
+_options = dict(POOL_OPTIONS)
+_metrics = PoolMetrics()
+_pid = os.getpid()
+
+
+def _forget_inherited():
+    # runs in a freshly forked child: drop the parent's clients without closing them
+    global _lock, _clients, _metrics, _pid
+    _lock = threading.Lock()
+    _clients = {}
+    _metrics = PoolMetrics()
+    _pid = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited)
+
+
+def configure(**options):
+    """Override POOL_OPTIONS for clients created from now on; existing clients are closed."""
+    global _options
+    close_client()
+    _options = {**POOL_OPTIONS, **options}
+
+
+def get_client(uri=None):
+    """The process-wide pooled MongoClient for `uri` (created on first use)."""
+    if MongoClient is None:
+        raise ImportError("pymongo is required for mongo_client_manager")
+    uri = uri or DEFAULT_URI
+    if os.getpid() != _pid:  # forked without register_at_fork (or by a C extension)
+        _forget_inherited()
+    client = _clients.get(uri)
+    if client is None:
+        with _lock:
+            client = _clients.get(uri)
+            if client is None:
+                client = _clients[uri] = MongoClient(uri, event_listeners=[_metrics], **_options)
+    return client
+
+
+def get_database(name=None, uri=None):
+    """Database handle on the shared client."""
+    return get_client(uri)[name or DEFAULT_DB]
+
+
+def get_collection(name, db_name=None, uri=None):
+    """Collection handle on the shared client."""
+    return get_database(db_name, uri)[name]
+
+
+def pool_metrics():
+    """Snapshot of this process's pool counters and checkout wait percentiles."""
+    return _metrics.snapshot()
+
+
+def close_client():
+    """Close every client this process created (the pools reopen on the next get_client)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_client)
+
+
+# ============================================================
+# 🧪 DEMO: THREAD BURST + FORKED WORKERS
+# ============================================================
+
+def _burst(threads, calls, uri, db_name):
+    def work():
+        db = get_database(db_name, uri)
+        for _ in range(calls):
+            db["market_data"].count_documents({"sector": "Tech"})
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def _worker_report(queue, uri, parent_client_id):
+    client = get_client(uri)
+    queue.put((os.getpid(), id(client) != parent_client_id, len(_clients)))
+
+
+def main(argv=None):
+    import multiprocessing
+
+    from pymongo.errors import PyMongoError
+
+    parser = argparse.ArgumentParser(description="Shared pooled client: checkout metrics and fork safety")
+    parser.add_argument("--uri", default=DEFAULT_URI)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--max-pool-size", type=int, default=POOL_OPTIONS["maxPoolSize"])
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    configure(maxPoolSize=args.max_pool_size, serverSelectionTimeoutMS=2_000)
+    print(f"⚙️  pool options: {_options}")
+    try:
+        get_client(args.uri).admin.command("ping")
+        seconds = _burst(args.threads, args.calls, args.uri, args.db)
+        print(f"🧵 {args.threads} threads × {args.calls} calls in {seconds:.2f}s over one pool")
+        print(f"📈 {pool_metrics()}")
+    except PyMongoError as exc:
+        print(f"⚠️  no server at {args.uri} ({type(exc).__name__}); skipping the thread burst")
+
+    parent = get_client(args.uri)
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=_worker_report, args=(queue, args.uri, id(parent)))
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        pid, fresh, clients = queue.get()
+        print(f"🍴 worker {pid}: {'own' if fresh else 'INHERITED'} client ({clients} in its process)")
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
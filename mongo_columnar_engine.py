@@ -0,0 +1,1669 @@
+import math
+import re
+import itertools
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    from bson import ObjectId
+except ImportError:  # pymongo not installed — fall back to sequential integer ids
+    ObjectId = None
+
+try:
+    from pymongo.errors import OperationFailure
+except ImportError:
+    class OperationFailure(Exception):
+        """Stand-in for pymongo.errors.OperationFailure when pymongo is absent."""
+
+
+# ============================================================
+# 🧮 IN-PROCESS COLUMNAR ENGINE FOR THE MONGO EXAMPLES
+# ============================================================
+#
+# A small pymongo look-alike that keeps every collection as NumPy column
+# arrays instead of a list of dicts.  Filters become boolean masks, $group
+# keys are factorized into integer codes and reduced with bincount/reduceat,
+# so the 75 lambdas in data_prep_and_mongo_utils.mongo_query_examples run
+# unchanged — no server, no round trips:
+#
+#     db = ColumnarDatabase("interview")
+#     examples = mongo_query_examples(db)
+#     examples[20]()     # → [{"_id": "Tech", "avg_price": ...}, ...]
+#
+# Each column is a pair (values, present): `values` is a typed array
+# (bool / int64 / float64 / datetime64[ms] / object) and `present` is a
+# bool mask marking which documents actually hold the field.
+
+_MISSING = object()
+_id_counter = itertools.count(1)
+
+# BSON comparison order: null < numbers < strings < objects < arrays < ObjectId < bool < dates
+_BRACKET_NULL, _BRACKET_NUMBER, _BRACKET_STRING = 1, 2, 3
+_BRACKET_OBJECT, _BRACKET_ARRAY, _BRACKET_OTHER = 4, 5, 7
+_BRACKET_BOOL, _BRACKET_DATE = 8, 9
+
+
+def _new_id():
+    return ObjectId() if ObjectId is not None else next(_id_counter)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def _type_bracket(value):
+    if value is None:
+        return _BRACKET_NULL
+    if isinstance(value, (bool, np.bool_)):
+        return _BRACKET_BOOL
+    if _is_number(value):
+        return _BRACKET_NUMBER
+    if isinstance(value, str):
+        return _BRACKET_STRING
+    if isinstance(value, dict):
+        return _BRACKET_OBJECT
+    if isinstance(value, (list, tuple)):
+        return _BRACKET_ARRAY
+    if isinstance(value, datetime):
+        return _BRACKET_DATE
+    return _BRACKET_OTHER
+
+
+def _mongo_key(value):
+    """Sort key that orders mixed Python values the way the server orders BSON."""
+    bracket = _type_bracket(value)
+    if bracket == _BRACKET_NUMBER:
+        return bracket, float(value)
+    if bracket in (_BRACKET_STRING, _BRACKET_DATE, _BRACKET_BOOL):
+        return bracket, value
+    if bracket == _BRACKET_NULL:
+        return bracket, 0
+    return bracket, str(value)
+
+
+def _naive_utc(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+# ============================================================
+# 🟢 COLUMN HELPERS
+# ============================================================
+
+def _column_from_values(values):
+    """Build a typed (values, present) column from Python values (_MISSING = absent)."""
+    n = len(values)
+    present = np.fromiter((v is not _MISSING for v in values), bool, n)
+    kinds = {type(v) for v in values if v is not _MISSING}
+
+    if kinds and all(issubclass(k, (bool, np.bool_)) for k in kinds):
+        return np.array([v is not _MISSING and bool(v) for v in values], dtype=bool), present
+    numeric = all(issubclass(k, (int, float, np.integer, np.floating)) and not issubclass(k, (bool, np.bool_))
+                  for k in kinds)
+    if kinds and numeric:
+        if all(issubclass(k, (int, np.integer)) for k in kinds):
+            try:
+                return np.array([v if v is not _MISSING else 0 for v in values], dtype=np.int64), present
+            except OverflowError:
+                pass
+        return np.array([v if v is not _MISSING else 0.0 for v in values], dtype=np.float64), present
+    if kinds and all(issubclass(k, datetime) for k in kinds):
+        filled = [_naive_utc(v) if v is not _MISSING else datetime(1970, 1, 1) for v in values]
+        return np.array(filled, dtype="datetime64[ms]"), present
+
+    out = np.empty(n, dtype=object)
+    for i, v in enumerate(values):
+        out[i] = None if v is _MISSING else v
+    return out, present
+
+
+def _column_from_array(values):
+    """Adopt an array-like (NumPy / pandas / list) as a column without per-row dicts."""
+    if isinstance(values, (pd.Series, pd.Index)):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        values = values.to_numpy()
+    values = np.asarray(values)
+    n = len(values)
+    kind = values.dtype.kind
+    if kind == "M":
+        present = ~np.isnat(values)
+        return values.astype("datetime64[ms]"), present
+    if kind in "iu":
+        return values.astype(np.int64, copy=False), np.ones(n, bool)
+    if kind == "f":
+        return values.astype(np.float64, copy=False), np.ones(n, bool)
+    if kind == "b":
+        return values, np.ones(n, bool)
+    if kind in "US":
+        return values.astype(object), np.ones(n, bool)
+    if pd.api.types.infer_dtype(values, skipna=True) == "string":
+        return values, ~pd.isna(values)
+    return _column_from_values([_MISSING if v is None else v for v in values.tolist()])
+
+
+def _literal(value, n):
+    if isinstance(value, (bool, np.bool_)):
+        return np.full(n, bool(value)), np.ones(n, bool)
+    if isinstance(value, (int, np.integer)) and -2 ** 63 <= value < 2 ** 63:
+        return np.full(n, value, dtype=np.int64), np.ones(n, bool)
+    if isinstance(value, (float, np.floating)):
+        return np.full(n, value, dtype=np.float64), np.ones(n, bool)
+    if isinstance(value, datetime):
+        return np.full(n, np.datetime64(_naive_utc(value), "ms")), np.ones(n, bool)
+    out = np.empty(n, dtype=object)
+    out.fill(value)
+    return out, np.ones(n, bool)
+
+
+def _placeholder(dtype, n):
+    if dtype == object:
+        return np.full(n, None, dtype=object)
+    return np.zeros(n, dtype=dtype)
+
+
+def _pylist(values):
+    """Convert a column to a list of plain Python values (datetime, float, int, str...)."""
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ms]").tolist()
+    return values.tolist()
+
+
+def _objects(values):
+    if values.dtype == object:
+        return values
+    out = np.empty(len(values), dtype=object)
+    out[:] = _pylist(values)
+    return out
+
+
+def _with_nulls(values, ok):
+    """Rows where ok is False become explicit nulls (as the server returns them)."""
+    if ok.all():
+        return values, np.ones(len(values), bool)
+    out = _objects(values).copy()
+    out[~ok] = None
+    return out, np.ones(len(values), bool)
+
+
+def _common(a, b):
+    """Coerce two arrays to a dtype both fit in (int+float → float, anything else → object)."""
+    if a.dtype == b.dtype:
+        return a, b
+    if a.dtype.kind in "iuf" and b.dtype.kind in "iuf":
+        return a.astype(np.float64), b.astype(np.float64)
+    return _objects(a), _objects(b)
+
+
+def _null_mask(values, present):
+    """Rows that are missing or hold an explicit null."""
+    if values.dtype == object:
+        return ~present | np.equal(values, None)
+    return ~present
+
+
+# ============================================================
+# 🟢 FRAME — a batch of documents stored column by column
+# ============================================================
+
+class _Frame:
+    def __init__(self, columns=None, n=0):
+        self.columns = columns if columns is not None else {}
+        self.n = n
+
+    @classmethod
+    def from_documents(cls, documents):
+        fields = {}
+        for doc in documents:
+            for key in doc:
+                fields.setdefault(key, None)
+        columns = {key: _column_from_values([doc.get(key, _MISSING) for doc in documents]) for key in fields}
+        return cls(columns, len(documents))
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        columns = {name: _column_from_array(values) for name, values in arrays.items()}
+        n = len(next(iter(columns.values()))[0]) if columns else 0
+        if any(len(v) != n for v, _ in columns.values()):
+            raise ValueError("all columns must have the same length")
+        return cls(columns, n)
+
+    @staticmethod
+    def concat(frames):
+        frames = [f for f in frames if f.n]
+        if not frames:
+            return _Frame()
+        if len(frames) == 1:
+            return frames[0]
+        names = {}
+        for f in frames:
+            for name in f.columns:
+                names.setdefault(name, None)
+        columns = {}
+        for name in names:
+            parts_v, parts_p = [], []
+            dtype = None
+            for f in frames:
+                if name in f.columns:
+                    dtype = f.columns[name][0].dtype if dtype is None else dtype
+            for f in frames:
+                if name in f.columns:
+                    v, p = f.columns[name]
+                else:
+                    v, p = _placeholder(dtype, f.n), np.zeros(f.n, bool)
+                parts_v.append(v)
+                parts_p.append(p)
+            merged = parts_v[0]
+            for v in parts_v[1:]:
+                merged, v = _common(merged, v)
+                merged = np.concatenate([merged, v])
+            columns[name] = merged, np.concatenate(parts_p)
+        return _Frame(columns, sum(f.n for f in frames))
+
+    def get(self, name):
+        if name in self.columns:
+            return self.columns[name]
+        if "." in name:
+            root, rest = name.split(".", 1)
+            if root in self.columns and self.columns[root][0].dtype == object:
+                values, present = self.columns[root]
+                child = [v.get(rest, _MISSING) if p and isinstance(v, dict) else _MISSING
+                         for v, p in zip(values, present)]
+                return _column_from_values(child)
+        return np.full(self.n, None, dtype=object), np.zeros(self.n, bool)
+
+    def set(self, name, values, present=None):
+        if present is None:
+            present = np.ones(self.n, bool)
+        if "." in name:
+            root, rest = name.split(".", 1)
+            root_values, root_present = self.get(root)
+            out = np.empty(self.n, dtype=object)
+            for i, (doc, p, v, vp) in enumerate(zip(root_values, root_present, _pylist(values), present)):
+                doc = dict(doc) if p and isinstance(doc, dict) else {}
+                if vp:
+                    doc[rest] = v
+                out[i] = doc
+            self.columns[root] = out, np.ones(self.n, bool)
+            return
+        self.columns[name] = values, present
+
+    def drop(self, name):
+        self.columns.pop(name, None)
+
+    def take(self, idx):
+        idx = np.asarray(idx)
+        n = int(idx.sum()) if idx.dtype == bool else len(idx)
+        return _Frame({k: (v[idx], p[idx]) for k, (v, p) in self.columns.items()}, n)
+
+    def copy(self):
+        return _Frame(dict(self.columns), self.n)
+
+    def to_documents(self):
+        docs = [{} for _ in range(self.n)]
+        for name, (values, present) in self.columns.items():
+            items = _pylist(values)
+            if present.all():
+                for doc, v in zip(docs, items):
+                    doc[name] = v
+            else:
+                for i in np.flatnonzero(present):
+                    docs[i][name] = items[i]
+        return docs
+
+
+# ============================================================
+# 🟡 QUERY FILTERS → BOOLEAN MASKS
+# ============================================================
+
+def _equals(values, present, operand):
+    n = len(values)
+    kind = values.dtype.kind
+    if operand is None:
+        return _null_mask(values, present)
+    if isinstance(operand, re.Pattern):
+        return _regex_mask(values, present, operand)
+    if kind in "iuf" and _is_number(operand):
+        return present & (values == operand)
+    if kind == "b" and isinstance(operand, (bool, np.bool_)):
+        return present & (values == operand)
+    if kind == "M" and isinstance(operand, datetime):
+        return present & (values == np.datetime64(_naive_utc(operand), "ms"))
+    if kind == "O" and isinstance(operand, str) and pd.api.types.infer_dtype(values, skipna=True) == "string":
+        return present & (values == operand)
+    if kind == "O":
+        bracket = _type_bracket(operand)
+
+        def eq(v):
+            if isinstance(v, list) and bracket != _BRACKET_ARRAY:
+                return any(_type_bracket(x) == bracket and x == operand for x in v)
+            return _type_bracket(v) == bracket and v == operand
+
+        return present & np.fromiter((eq(v) for v in values), bool, n)
+    return np.zeros(n, bool)
+
+
+def _in_mask(values, present, items):
+    """$in; long lists of plain scalars (e.g. pinned _ids) use one hashed pass instead of one scan per item."""
+    kind = values.dtype.kind
+    if len(items) > 8 and kind in "iuf" and all(_is_number(i) for i in items):
+        return present & np.isin(values, items)
+    scalar = (str, int, float, datetime, ObjectId) if ObjectId is not None else (str, int, float, datetime)
+    if len(items) <= 8 or kind != "O" or not all(isinstance(i, scalar) for i in items):
+        hit = np.zeros(len(values), bool)
+        for item in items:
+            hit |= _equals(values, present, item)
+        return hit
+    wanted = {(_type_bracket(i), i) for i in items}
+
+    def hit(v):
+        if isinstance(v, list):
+            return any(not isinstance(x, (dict, list)) and (_type_bracket(x), x) in wanted for x in v)
+        return not isinstance(v, dict) and (_type_bracket(v), v) in wanted
+
+    return present & np.fromiter((hit(v) for v in values), bool, len(values))
+
+
+_COMPARATORS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def _compare(values, present, op, operand):
+    n = len(values)
+    kind = values.dtype.kind
+    ufunc = _COMPARATORS[op]
+    if operand is None:
+        return _null_mask(values, present) if op in ("$gte", "$lte") else np.zeros(n, bool)
+    if kind in "iuf" and _is_number(operand):
+        return present & ufunc(values, operand)
+    if kind == "M" and isinstance(operand, datetime):
+        return present & ufunc(values, np.datetime64(_naive_utc(operand), "ms"))
+    if kind == "O":
+        bracket = _type_bracket(operand)
+        key = _mongo_key(operand)
+        return present & np.fromiter(
+            (_type_bracket(v) == bracket and ufunc(_mongo_key(v), key) for v in values), bool, n)
+    return np.zeros(n, bool)
+
+
+def _regex_mask(values, present, pattern, options=""):
+    if not isinstance(pattern, re.Pattern):
+        flags = 0
+        for flag in options:
+            flags |= {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}.get(flag, 0)
+        pattern = re.compile(pattern, flags)
+    if values.dtype != object:
+        return np.zeros(len(values), bool)
+    return present & np.fromiter(
+        (isinstance(v, str) and pattern.search(v) is not None for v in values), bool, len(values))
+
+
+def _field_mask(values, present, cond):
+    if not (isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond)):
+        return _equals(values, present, cond)
+
+    mask = np.ones(len(values), bool)
+    for op, operand in cond.items():
+        if op == "$eq":
+            mask &= _equals(values, present, operand)
+        elif op == "$ne":
+            mask &= ~_equals(values, present, operand)
+        elif op in _COMPARATORS:
+            mask &= _compare(values, present, op, operand)
+        elif op == "$in":
+            mask &= _in_mask(values, present, list(operand))
+        elif op == "$nin":
+            for item in operand:
+                mask &= ~_equals(values, present, item)
+        elif op == "$exists":
+            mask &= present if operand else ~present
+        elif op == "$regex":
+            mask &= _regex_mask(values, present, operand, cond.get("$options", ""))
+        elif op == "$options":
+            continue
+        elif op == "$not":
+            mask &= ~_field_mask(values, present, operand)
+        else:
+            raise NotImplementedError(f"query operator {op} is not supported by the columnar engine")
+    return mask
+
+
+def _match_mask(frame, query):
+    mask = np.ones(frame.n, bool)
+    for key, cond in (query or {}).items():
+        if key == "$or":
+            hit = np.zeros(frame.n, bool)
+            for sub in cond:
+                hit |= _match_mask(frame, sub)
+            mask &= hit
+        elif key == "$and":
+            for sub in cond:
+                mask &= _match_mask(frame, sub)
+        elif key == "$nor":
+            for sub in cond:
+                mask &= ~_match_mask(frame, sub)
+        elif key == "$expr":
+            mask &= _truthy(*_eval(cond, frame))
+        else:
+            mask &= _field_mask(*frame.get(key), cond)
+    return mask
+
+
+# ============================================================
+# 🟡 AGGREGATION EXPRESSIONS
+# ============================================================
+
+def _as_numeric(values, present, op=None):
+    """Return (numbers, ok).  With `op` given, non-numeric values raise like the server does."""
+    kind = values.dtype.kind
+    if kind in "iuf":
+        return values, present.copy()
+    n = len(values)
+    if kind == "O":
+        ok = present & np.fromiter((_is_number(v) for v in values), bool, n)
+        bad = present & ~ok & ~np.equal(values, None)
+    else:
+        ok = np.zeros(n, bool)
+        bad = present.copy()
+    if op is not None and bad.any():
+        raise OperationFailure(f"{op} only supports numeric types")
+    numbers = np.zeros(n, dtype=np.float64)
+    if ok.any():
+        picked = values[ok]
+        if kind == "O" and all(isinstance(v, (int, np.integer)) for v in picked):
+            numbers = np.zeros(n, dtype=np.int64)
+        numbers[ok] = picked
+    return numbers, ok
+
+
+def _truthy(values, present):
+    kind = values.dtype.kind
+    if kind == "b":
+        return present & values
+    if kind in "iuf":
+        return present & (values != 0)
+    if kind == "M":
+        return present.copy()
+    return present & np.fromiter(
+        (v is not None and v is not False and not (_is_number(v) and v == 0) for v in values), bool, len(values))
+
+
+def _where(cond, a, b):
+    (av, ap), (bv, bp) = a, b
+    av, bv = _common(av, bv)
+    return np.where(cond, av, bv), np.where(cond, ap, bp)
+
+
+def _arith(op, args):
+    result, ok = None, None
+    for values, present in args:
+        if values.dtype.kind == "M":
+            raise NotImplementedError(f"date arithmetic in {op} is not supported by the columnar engine")
+        numbers, good = _as_numeric(values, present, op)
+        if result is None:
+            result, ok = numbers, good
+            continue
+        ok = ok & good
+        if op == "$add":
+            result = result + numbers
+        elif op == "$subtract":
+            result = result - numbers
+        elif op == "$multiply":
+            result = result * numbers
+        elif op == "$divide":
+            zero = ok & (numbers == 0)
+            if zero.any():
+                raise OperationFailure("can't $divide by zero")
+            result = result / np.where(numbers == 0, 1, numbers)
+        elif op == "$mod":
+            zero = ok & (numbers == 0)
+            if zero.any():
+                raise OperationFailure("can't $mod by 0")
+            result = np.fmod(result, np.where(numbers == 0, 1, numbers))
+    return _with_nulls(result, ok)
+
+
+_DATE_PARTS = {
+    "$year": lambda idx: idx.year,
+    "$month": lambda idx: idx.month,
+    "$dayOfMonth": lambda idx: idx.day,
+    "$dayOfYear": lambda idx: idx.dayofyear,
+    "$dayOfWeek": lambda idx: (idx.dayofweek + 1) % 7 + 1,
+    "$hour": lambda idx: idx.hour,
+    "$minute": lambda idx: idx.minute,
+    "$second": lambda idx: idx.second,
+}
+
+
+def _date_part(op, values, present):
+    ok = present.copy()
+    if values.dtype.kind != "M":
+        if values.dtype != object:
+            raise OperationFailure(f"{op} requires a date")
+        ok = present & np.fromiter((isinstance(v, datetime) for v in values), bool, len(values))
+        if (present & ~ok & ~np.equal(values, None)).any():
+            raise OperationFailure(f"{op} requires a date")
+        filled = [_naive_utc(v) if good else datetime(1970, 1, 1) for v, good in zip(values, ok)]
+        values = np.array(filled, dtype="datetime64[ms]")
+    part = np.asarray(_DATE_PARTS[op](pd.DatetimeIndex(values)), dtype=np.int64)
+    return _with_nulls(part, ok)
+
+
+def _cmp_expr(op, a, b):
+    (av, ap), (bv, bp) = a, b
+    n = len(av)
+    if op in ("$eq", "$ne") or op in _COMPARATORS:
+        if av.dtype.kind in "iuf" and bv.dtype.kind in "iuf" and ap.all() and bp.all():
+            ufunc = _COMPARATORS.get(op) or (np.equal if op == "$eq" else np.not_equal)
+            return ufunc(av, bv), np.ones(n, bool)
+    la = [v if p else None for v, p in zip(_pylist(av), ap)]
+    lb = [v if p else None for v, p in zip(_pylist(bv), bp)]
+    keys_a = [_mongo_key(v) for v in la]
+    keys_b = [_mongo_key(v) for v in lb]
+    ops = {"$eq": lambda x, y: x == y, "$ne": lambda x, y: x != y, "$gt": lambda x, y: x > y,
+           "$gte": lambda x, y: x >= y, "$lt": lambda x, y: x < y, "$lte": lambda x, y: x <= y}
+    fn = ops[op]
+    return np.fromiter((fn(x, y) for x, y in zip(keys_a, keys_b)), bool, n), np.ones(n, bool)
+
+
+def _elementwise(fn, *args):
+    """Fallback for expressions without a vectorized form: apply fn to Python values per row."""
+    n = len(args[0][0])
+    lists = [[v if p else None for v, p in zip(_pylist(values), present)] for values, present in args]
+    out = np.empty(n, dtype=object)
+    for i, row in enumerate(zip(*lists)):
+        out[i] = fn(*row)
+    return out, np.ones(n, bool)
+
+
+def _slice(array, *spec):
+    if array is None:
+        return None
+    if len(spec) == 1:
+        count = spec[0]
+        return list(array[:count]) if count >= 0 else list(array[count:])
+    position, count = spec
+    return list(array[position:position + count])
+
+
+def _concat(*parts):
+    if any(p is None for p in parts):
+        return None
+    return "".join(parts)
+
+
+def _to_string(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+    return str(value)
+
+
+def _eval(expr, frame):
+    """Evaluate an aggregation expression to a (values, present) column."""
+    n = frame.n
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr.startswith("$$"):
+            raise NotImplementedError(f"variable {expr} is not supported by the columnar engine")
+        return frame.get(expr[1:])
+    if isinstance(expr, list):
+        parts = [_eval(e, frame) for e in expr]
+        return _elementwise(lambda *row: list(row), *parts) if parts else _literal([], n)
+    if not isinstance(expr, dict):
+        return _literal(expr, n)
+    if len(expr) != 1 or not next(iter(expr)).startswith("$"):
+        parts = {k: _eval(v, frame) for k, v in expr.items()}
+        names = list(parts)
+        return _elementwise(lambda *row: dict(zip(names, row)), *parts.values())
+
+    (op, arg), = expr.items()
+    if op == "$literal":
+        return _literal(arg, n)
+    args = arg if isinstance(arg, list) else [arg]
+
+    if op in ("$add", "$subtract", "$multiply", "$divide", "$mod"):
+        return _arith(op, [_eval(a, frame) for a in args])
+    if op == "$abs":
+        numbers, ok = _as_numeric(*_eval(args[0], frame), op)
+        return _with_nulls(np.abs(numbers), ok)
+    if op in _DATE_PARTS:
+        target = arg["date"] if isinstance(arg, dict) and "date" in arg else args[0]
+        return _date_part(op, *_eval(target, frame))
+    if op in _COMPARATORS or op in ("$eq", "$ne"):
+        return _cmp_expr(op, _eval(args[0], frame), _eval(args[1], frame))
+    if op == "$and":
+        mask = np.ones(n, bool)
+        for a in args:
+            mask &= _truthy(*_eval(a, frame))
+        return mask, np.ones(n, bool)
+    if op == "$or":
+        mask = np.zeros(n, bool)
+        for a in args:
+            mask |= _truthy(*_eval(a, frame))
+        return mask, np.ones(n, bool)
+    if op == "$not":
+        return ~_truthy(*_eval(args[0], frame)), np.ones(n, bool)
+    if op == "$cond":
+        if isinstance(arg, dict):
+            cond, then, other = arg["if"], arg["then"], arg["else"]
+        else:
+            cond, then, other = arg
+        return _where(_truthy(*_eval(cond, frame)), _eval(then, frame), _eval(other, frame))
+    if op == "$ifNull":
+        first, fallback = _eval(args[0], frame), _eval(args[-1], frame)
+        return _where(_null_mask(*first), fallback, first)
+    if op == "$in":
+        return _elementwise(lambda v, arr: v in (arr or []), _eval(args[0], frame), _eval(args[1], frame))
+    if op == "$size":
+        return _elementwise(lambda v: len(v) if v is not None else None, _eval(args[0], frame))
+    if op == "$slice":
+        return _elementwise(lambda v: _slice(v, *args[1:]), _eval(args[0], frame))
+    if op == "$arrayElemAt":
+        return _elementwise(lambda v: v[args[1]] if v is not None and -len(v) <= args[1] < len(v) else None,
+                            _eval(args[0], frame))
+    if op == "$concat":
+        return _elementwise(_concat, *[_eval(a, frame) for a in args])
+    if op == "$toString":
+        return _elementwise(_to_string, _eval(args[0], frame))
+    if op == "$toLower":
+        return _elementwise(lambda v: v.lower() if v is not None else "", _eval(args[0], frame))
+    if op == "$toUpper":
+        return _elementwise(lambda v: v.upper() if v is not None else "", _eval(args[0], frame))
+    if op in ("$toDouble", "$toInt"):
+        numbers, ok = _as_numeric(*_eval(args[0], frame), op)
+        cast = np.float64 if op == "$toDouble" else np.int64
+        return _with_nulls(numbers.astype(cast), ok)
+    raise NotImplementedError(f"expression operator {op} is not supported by the columnar engine")
+
+
+# ============================================================
+# 🔵 FACTORIZED GROUP KEYS + SORT KEYS
+# ============================================================
+
+def _factorize(values, present):
+    """Integer codes per row plus the Python key for each code; missing/null share one code."""
+    n = len(values)
+    nulls = _null_mask(values, present)
+    codes = np.empty(n, dtype=np.intp)
+    sub = values if not nulls.any() else values[~nulls]
+    if sub.dtype == object:
+        try:
+            sub_codes, uniques = pd.factorize(sub)
+            uniques = list(uniques)
+        except TypeError:  # unhashable keys (documents / arrays)
+            seen, sub_codes, uniques = {}, np.empty(len(sub), dtype=np.intp), []
+            for i, v in enumerate(sub):
+                key = _hashable(v)
+                if key not in seen:
+                    seen[key] = len(uniques)
+                    uniques.append(v)
+                sub_codes[i] = seen[key]
+    else:
+        sub_codes, uniques = pd.factorize(sub, use_na_sentinel=False)
+        uniques = _pylist(np.asarray(uniques))
+    if nulls.any():
+        codes[~nulls] = sub_codes
+        codes[nulls] = len(uniques)
+        uniques.append(None)
+    else:
+        codes[:] = sub_codes
+    return codes, uniques
+
+
+def _sort_keys(values, present, direction):
+    """Lexsort keys (major first) ordering one column by BSON order in the given direction."""
+    kind = values.dtype.kind
+    sign = -1 if direction < 0 else 1
+    if kind in "iufbM":
+        bracket = {"b": _BRACKET_BOOL, "M": _BRACKET_DATE}.get(kind, _BRACKET_NUMBER)
+        raw = values.view(np.int64) if kind == "M" else values.astype(np.float64 if kind == "f" else np.int64)
+        brackets = np.where(present, bracket, _BRACKET_NULL)
+        return [sign * brackets, sign * np.where(present, raw, 0)]
+    keys = [_mongo_key(v) if p else (_BRACKET_NULL, 0) for v, p in zip(values, present)]
+    try:
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+    except TypeError:
+        keys = [(k[0], str(k[1])) for k in keys]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+    rank = np.empty(len(keys), dtype=np.int64)
+    current, previous = -1, object()
+    for i in order:
+        if keys[i] != previous:
+            current += 1
+            previous = keys[i]
+        rank[i] = current
+    return [sign * rank]
+
+
+def _sort_order(frame, spec, leading=()):
+    """
+    Stable row order for a {field: ±1} sort spec, after any leading (values, present) keys.
+    Returns (order, keys) where keys are the spec's own lexsort keys (leading ones excluded).
+    """
+    head, keys = [], []
+    for values, present in leading:
+        head.extend(_sort_keys(values, present, 1))
+    for field, direction in (spec or {}).items():
+        if isinstance(direction, dict):
+            raise NotImplementedError("$meta sorts are not supported by the columnar engine")
+        keys.extend(_sort_keys(*frame.get(field), direction))
+    everything = head + keys
+    if not everything:
+        return np.arange(frame.n), keys
+    return np.lexsort(everything[::-1]), keys
+
+
+def _changed(keys, order):
+    """Flag rows (in `order`) whose key tuple differs from the previous row's."""
+    changed = np.zeros(len(order), bool)
+    if len(order):
+        changed[0] = True
+    for key in keys:
+        ordered = key[order]
+        changed[1:] |= ordered[1:] != ordered[:-1]
+    return changed
+
+
+def _segments(codes):
+    """Sort rows by group code; return (order, sorted codes, segment starts)."""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(codes) else np.array([], int)
+    return order, sorted_codes, starts
+
+
+def _segment_extreme(op, values, ok, codes, k):
+    """Per-group $max/$min ignoring missing/null values."""
+    has = np.zeros(k, bool)
+    if values.dtype.kind in "iufM":
+        valid_codes, valid_values = codes[ok], values[ok]
+        out = _placeholder(values.dtype, k)
+        if len(valid_codes):
+            order, sorted_codes, starts = _segments(valid_codes)
+            ufunc = np.maximum if op == "$max" else np.minimum
+            out[sorted_codes[starts]] = ufunc.reduceat(valid_values[order], starts)
+            has[sorted_codes[starts]] = True
+        return _with_nulls(out, has)
+    out = np.full(k, None, dtype=object)
+    best = [None] * k
+    for code, v in zip(codes[ok], values[ok]):
+        key = _mongo_key(v)
+        if not has[code] or (key > best[code] if op == "$max" else key < best[code]):
+            out[code], best[code], has[code] = v, key, True
+    return out, np.ones(k, bool)
+
+
+def _split_by_group(values, ok, codes, k):
+    """Python lists of the valid values of each group, in input order."""
+    valid_codes = codes[ok]
+    items = _pylist(values[ok])
+    groups = [[] for _ in range(k)]
+    for code, v in zip(valid_codes, items):
+        groups[code].append(v)
+    return groups
+
+
+def _group_percentiles(op, arg, frame, codes, k):
+    """$median / $percentile per group: sort (code, value) once, index each segment."""
+    numbers, ok = _as_numeric(*_eval(arg["input"], frame))
+    valid_codes, valid = codes[ok], numbers[ok].astype(np.float64)
+    sorted_values = valid[np.lexsort((valid, valid_codes))]
+    counts = np.bincount(valid_codes, minlength=k)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    has = counts > 0
+    ps = [0.5] if op == "$median" else arg["p"]
+    picked = []
+    for p in ps:
+        rank = np.maximum(np.ceil(p * counts).astype(np.int64) - 1, 0)  # same rule as $percentile windows
+        column = np.full(k, np.nan)
+        column[has] = sorted_values[(starts + rank)[has]]
+        picked.append(column)
+    if op == "$median":
+        return _with_nulls(picked[0], has)
+    out = np.empty(k, dtype=object)
+    for i in range(k):
+        out[i] = [float(column[i]) for column in picked] if counts[i] else [None] * len(ps)
+    return out, np.ones(k, bool)
+
+
+def _group_top(op, arg, frame, codes, k):
+    """$top / $bottom / $topN / $bottomN: order rows by (group, sortBy) and take each segment's ends."""
+    order, _ = _sort_order(frame, arg["sortBy"], [(codes, np.ones(frame.n, bool))])
+    sorted_codes = codes[order]
+    starts = np.searchsorted(sorted_codes, np.arange(k), side="left")
+    ends = np.searchsorted(sorted_codes, np.arange(k), side="right")
+    values, present = _eval(arg["output"], frame)
+    items = [v if p else None for v, p in zip(_pylist(values[order]), present[order])]
+    single = op in ("$top", "$bottom")
+    n = 1 if single else int(arg["n"])
+    out = np.empty(k, dtype=object)
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        chosen = items[s:min(e, s + n)] if op in ("$top", "$topN") else items[max(s, e - n):e]
+        out[i] = (chosen[0] if chosen else None) if single else chosen
+    return out, np.ones(k, bool)
+
+
+def _accumulate(op, arg, frame, codes, k):
+    n = frame.n
+    if op == "$count":
+        return np.bincount(codes, minlength=k).astype(np.int64), np.ones(k, bool)
+    if op == "$sum" and _is_number(arg):
+        counts = np.bincount(codes, minlength=k)
+        if isinstance(arg, (int, np.integer)):
+            return (counts * int(arg)).astype(np.int64), np.ones(k, bool)
+        return counts * float(arg), np.ones(k, bool)
+    if op in ("$median", "$percentile"):
+        return _group_percentiles(op, arg, frame, codes, k)
+    if op in ("$top", "$bottom", "$topN", "$bottomN"):
+        return _group_top(op, arg, frame, codes, k)
+
+    values, present = _eval(arg, frame)
+
+    if op in ("$sum", "$avg", "$stdDevPop", "$stdDevSamp"):
+        numbers, ok = _as_numeric(values, present)
+        counts = np.bincount(codes[ok], minlength=k)
+        if numbers.dtype.kind in "iu" and op == "$sum":
+            totals = np.zeros(k, dtype=np.int64)
+            np.add.at(totals, codes[ok], numbers[ok])
+            return totals, np.ones(k, bool)
+        totals = np.bincount(codes[ok], weights=numbers[ok].astype(np.float64), minlength=k)
+        if op == "$sum":
+            return totals, np.ones(k, bool)
+        means = totals / np.maximum(counts, 1)
+        if op == "$avg":
+            return _with_nulls(means, counts > 0)
+        deviations = numbers[ok] - means[codes[ok]]
+        squares = np.bincount(codes[ok], weights=deviations * deviations, minlength=k)
+        if op == "$stdDevPop":
+            return _with_nulls(np.sqrt(squares / np.maximum(counts, 1)), counts > 0)
+        return _with_nulls(np.sqrt(squares / np.maximum(counts - 1, 1)), counts > 1)
+
+    if op in ("$max", "$min"):
+        return _segment_extreme(op, values, present & ~_null_mask(values, present), codes, k)
+
+    if op in ("$first", "$last"):
+        rows = np.arange(n)
+        picked = np.full(k, n if op == "$first" else -1, dtype=np.int64)
+        (np.minimum if op == "$first" else np.maximum).at(picked, codes, rows)
+        ok = present[picked]
+        return _with_nulls(values[picked], ok)
+
+    if op in ("$push", "$addToSet"):
+        groups = _split_by_group(values, present, codes, k)
+        if op == "$addToSet":
+            groups = [list({_hashable(v): v for v in g}.values()) for g in groups]
+        out = np.empty(k, dtype=object)
+        for i, g in enumerate(groups):
+            out[i] = g
+        return out, np.ones(k, bool)
+
+    raise NotImplementedError(f"accumulator {op} is not supported by the columnar engine")
+
+
+def _group_frame(frame, codes, keys, outputs):
+    """Reduce `frame` by integer group codes into one row per key (empty groups dropped)."""
+    k = len(keys)
+    id_column = np.empty(k, dtype=object)
+    for i, key in enumerate(keys):
+        id_column[i] = key
+    out = _Frame({"_id": (id_column, np.ones(k, bool))}, k)
+    for name, acc in outputs.items():
+        (op, arg), = acc.items()
+        out.set(name, *_accumulate(op, arg, frame, codes, k))
+    counts = np.bincount(codes, minlength=k)
+    return out.take(np.flatnonzero(counts > 0)) if (counts == 0).any() else out
+
+
+def _group_codes(frame, id_expr):
+    if isinstance(id_expr, dict) and not (len(id_expr) == 1 and next(iter(id_expr)).startswith("$")):
+        # Compound _id: combine per-field codes; a missing field is left out of the key document.
+        names = list(id_expr)
+        columns = [_eval(id_expr[name], frame) for name in names]
+        parts = [_factorize(values, present) for values, present in columns]
+        combined = np.zeros(frame.n, dtype=np.int64)
+        for (codes, uniques), (_, present) in zip(parts, columns):
+            combined = (combined * len(uniques) + codes) * 2 + present
+        codes, first = pd.factorize(combined)
+        rows = np.full(len(first), frame.n, dtype=np.int64)
+        np.minimum.at(rows, codes, np.arange(frame.n))
+        keys = [{name: parts[j][1][parts[j][0][row]] for j, name in enumerate(names) if columns[j][1][row]}
+                for row in rows]
+        return codes, keys
+    if isinstance(id_expr, (str, dict)) and (not isinstance(id_expr, str) or id_expr.startswith("$")):
+        return _factorize(*_eval(id_expr, frame))
+    return np.zeros(frame.n, dtype=np.intp), [id_expr]
+
+
+# ============================================================
+# 🔵 PIPELINE STAGES
+# ============================================================
+
+def _projection_flag(value):
+    if isinstance(value, (bool, np.bool_, int, float)) and not isinstance(value, str):
+        return bool(value)
+    return None
+
+
+def _stage_project(frame, spec, keep_computed=True):
+    flags = {k: _projection_flag(v) for k, v in spec.items()}
+    excluded = [k for k, f in flags.items() if f is False and k != "_id"]
+    included = [k for k, f in flags.items() if f is not False and k != "_id"]
+    if excluded and included:
+        raise OperationFailure("Invalid $project :: Cannot do exclusion on field in inclusion projection")
+
+    if excluded or (not included and flags.get("_id") is False):
+        out = frame.copy()
+        for name in excluded + (["_id"] if flags.get("_id") is False else []):
+            out.drop(name)
+        return out
+
+    out = _Frame(n=frame.n)
+    if flags.get("_id") is not False and "_id" in frame.columns:
+        out.set("_id", *frame.get("_id"))
+    for name in included:
+        if flags[name] is True:
+            if name in frame.columns or "." in name:
+                values, present = frame.get(name)
+                if present.any():
+                    out.set(name, values, present)
+        elif keep_computed:
+            out.set(name, *_eval(spec[name], frame))
+    if "_id" in spec and flags["_id"] is None:
+        out.set("_id", *_eval(spec["_id"], frame))
+    return out
+
+
+def _stage_add_fields(frame, spec):
+    out = frame.copy()
+    for name, expr in spec.items():
+        out.set(name, *_eval(expr, frame))
+    return out
+
+
+def _stage_group(frame, spec):
+    if not frame.n:
+        return _Frame()
+    codes, keys = _group_codes(frame, spec["_id"])
+    outputs = {k: v for k, v in spec.items() if k != "_id"}
+    return _group_frame(frame, codes, keys, outputs)
+
+
+def _stage_bucket(frame, spec):
+    if not frame.n:
+        return _Frame()
+    boundaries = spec["boundaries"]
+    values, present = _eval(spec["groupBy"], frame)
+    if isinstance(boundaries[0], datetime):
+        bounds = np.array([_naive_utc(b) for b in boundaries], dtype="datetime64[ms]").view(np.int64)
+        ok = present & (values.dtype.kind == "M")
+        numbers = values.view(np.int64) if values.dtype.kind == "M" else np.zeros(frame.n, np.int64)
+    else:
+        bounds = np.asarray(boundaries, dtype=np.float64)
+        numbers, ok = _as_numeric(values, present)
+    position = np.searchsorted(bounds, numbers, side="right") - 1
+    inside = ok & (position >= 0) & (position < len(bounds) - 1)
+    if not inside.all() and "default" not in spec:
+        raise OperationFailure("$bucket could not find a matching branch for an input, and no default was specified.")
+    codes = np.where(inside, position, len(bounds) - 1)
+    keys = list(boundaries[:-1]) + [spec.get("default")]
+    return _group_frame(frame, codes, keys, spec.get("output", {"count": {"$sum": 1}}))
+
+
+def _stage_bucket_auto(frame, spec):
+    if not frame.n:
+        return _Frame()
+    if "granularity" in spec:
+        raise NotImplementedError("$bucketAuto granularity is not supported by the columnar engine")
+    values, present = _eval(spec["groupBy"], frame)
+    order, keys = _sort_order(_Frame({"v": (values, present)}, frame.n), {"v": 1})
+    rank = np.cumsum(_changed(keys, order))
+    items = [v if p else None for v, p in zip(_pylist(values[order]), present[order])]
+    n, buckets = frame.n, spec["buckets"]
+    size = max(1, int(math.floor(n / buckets + 0.5)))
+
+    codes_sorted = np.empty(n, dtype=np.intp)
+    bucket_keys, start = [], 0
+    while start < n:
+        if len(bucket_keys) == buckets - 1:
+            end = n
+        else:
+            end = min(n, start + size)
+            end = int(np.searchsorted(rank, rank[end - 1], side="right"))
+        codes_sorted[start:end] = len(bucket_keys)
+        bucket_keys.append({"min": items[start], "max": items[end] if end < n else items[n - 1]})
+        start = end
+    codes = np.empty(n, dtype=np.intp)
+    codes[order] = codes_sorted
+    return _group_frame(frame, codes, bucket_keys, spec.get("output", {"count": {"$sum": 1}}))
+
+
+def _window_bounds(window, starts, ends, n):
+    """Inclusive [lo, hi] row bounds per row for a documents window inside its partition."""
+    rows = np.arange(n)
+    if window is None:
+        return starts, ends
+    if "range" in window:
+        raise NotImplementedError("range windows are not supported by the columnar engine")
+    lo_spec, hi_spec = window["documents"]
+
+    def resolve(spec, unbounded):
+        if spec == "unbounded":
+            return unbounded
+        offset = 0 if spec == "current" else int(spec)
+        return np.clip(rows + offset, starts, ends)
+
+    return resolve(lo_spec, starts), resolve(hi_spec, ends)
+
+
+def _percentile_values(sorted_values, ps):
+    count = len(sorted_values)
+    if not count:
+        return [None] * len(ps)
+    return [sorted_values[min(count - 1, max(0, int(math.ceil(p * count)) - 1))] for p in ps]
+
+
+def _stage_set_window_fields(frame, spec):
+    if not frame.n:
+        return _Frame()
+    n = frame.n
+    leading = []
+    if spec.get("partitionBy") is not None:
+        leading.append(_eval(spec["partitionBy"], frame))
+    order, keys = _sort_order(frame, spec.get("sortBy"), leading)
+    frame = frame.take(order)
+
+    rows = np.arange(n)
+    if leading:
+        part_codes, _ = _factorize(*(a[order] for a in leading[0]))
+        new_part = np.r_[True, part_codes[1:] != part_codes[:-1]]
+    else:
+        new_part = np.r_[True, np.zeros(n - 1, bool)]
+    part_id = np.cumsum(new_part) - 1
+    part_starts = rows[new_part]
+    part_ends = np.r_[part_starts[1:] - 1, n - 1]
+    starts, ends = part_starts[part_id], part_ends[part_id]
+    changed = new_part | _changed(keys, order)
+
+    out = frame.copy()
+    for name, out_spec in spec["output"].items():
+        window = out_spec.get("window")
+        (op, arg), = ((k, v) for k, v in out_spec.items() if k != "window")
+        if op == "$documentNumber":
+            out.set(name, rows - starts + 1)
+        elif op == "$rank":
+            out.set(name, np.maximum.accumulate(np.where(changed, rows, 0)) - starts + 1)
+        elif op == "$denseRank":
+            dense = np.cumsum(changed)
+            out.set(name, dense - dense[starts] + 1)
+        elif op in ("$sum", "$avg", "$count"):
+            if op == "$count":
+                numbers, ok = np.ones(n, dtype=np.int64), np.ones(n, bool)
+            else:
+                numbers, ok = _as_numeric(*_eval(arg, frame))
+            lo, hi = _window_bounds(window, starts, ends, n)
+            prefix = np.r_[0, np.cumsum(np.where(ok, numbers, 0))]
+            counts = np.r_[0, np.cumsum(ok)]
+            totals = prefix[hi + 1] - prefix[lo]
+            count = counts[hi + 1] - counts[lo]
+            if op == "$avg":
+                out.set(name, *_with_nulls(totals / np.maximum(count, 1), count > 0))
+            else:
+                out.set(name, totals)
+        elif op in ("$min", "$max"):
+            numbers, ok = _as_numeric(*_eval(arg, frame))
+            lo, hi = _window_bounds(window, starts, ends, n)
+            pick = np.max if op == "$max" else np.min
+            result = np.zeros(n, dtype=numbers.dtype)
+            has = np.zeros(n, bool)
+            for i in range(n):
+                sl = slice(lo[i], hi[i] + 1)
+                if ok[sl].any():
+                    result[i] = pick(numbers[sl][ok[sl]])
+                    has[i] = True
+            out.set(name, *_with_nulls(result, has))
+        elif op in ("$percentile", "$median"):
+            numbers, ok = _as_numeric(*_eval(arg["input"], frame))
+            ps = arg.get("p", [0.5])
+            result = np.empty(n, dtype=object)
+            for s, e in zip(part_starts, part_ends):
+                sl = slice(s, e + 1)
+                value = _percentile_values(np.sort(numbers[sl][ok[sl]]).tolist(), ps)
+                for i in range(s, e + 1):
+                    result[i] = value if op == "$percentile" else value[0]
+            out.set(name, result)
+        elif op == "$shift":
+            values, present = _eval(arg["output"], frame)
+            target = rows + arg["by"]
+            inside = (target >= starts) & (target <= ends)
+            shifted = np.where(inside, target, 0)
+            default = _literal(arg.get("default"), n)
+            out.set(name, *_where(inside, (values[shifted], present[shifted]), default))
+        else:
+            raise NotImplementedError(f"window operator {op} is not supported by the columnar engine")
+    return out
+
+
+def _stage_lookup(frame, spec, database):
+    if database is None:
+        raise NotImplementedError("$lookup needs the collection to belong to a ColumnarDatabase")
+    foreign = database[spec["from"]]
+    out = frame.copy()
+    if "pipeline" in spec:
+        if "let" in spec or "localField" in spec:
+            raise NotImplementedError("correlated $lookup pipelines are not supported by the columnar engine")
+        matches = list(foreign.aggregate(spec["pipeline"]))
+        column = np.empty(frame.n, dtype=object)
+        for i in range(frame.n):
+            column[i] = [dict(d) for d in matches]
+        out.set(spec["as"], column)
+        return out
+
+    # Hash join: factorize the foreign key once, then probe with the local column.
+    foreign_frame = foreign._data()
+    foreign_docs = foreign_frame.to_documents()
+    foreign_codes, foreign_keys = _factorize(*foreign_frame.get(spec["foreignField"]))
+    order, sorted_codes, starts = _segments(foreign_codes)
+    ends = np.r_[starts[1:], len(order)]
+    buckets = {}
+    for s, e in zip(starts, ends):
+        buckets[sorted_codes[s]] = order[s:e]
+    index = {_hashable(k): code for code, k in enumerate(foreign_keys)}
+
+    local_values, local_present = frame.get(spec["localField"])
+    local_items = [v if p else None for v, p in zip(_pylist(local_values), local_present)]
+    column = np.empty(frame.n, dtype=object)
+    for i, v in enumerate(local_items):
+        code = index.get(_hashable(v))
+        column[i] = [dict(foreign_docs[j]) for j in buckets.get(code, ())]
+    out.set(spec["as"], column)
+    return out
+
+
+def _stage_unwind(frame, spec):
+    if isinstance(spec, str):
+        spec = {"path": spec}
+    field = spec["path"][1:]
+    keep_empty = spec.get("preserveNullAndEmptyArrays", False)
+    index_field = spec.get("includeArrayIndex")
+    values, present = frame.get(field)
+    items = _pylist(values)
+
+    rows, flat, positions = [], [], []
+    for i, (v, p) in enumerate(zip(items, present)):
+        if p and isinstance(v, list) and v:
+            rows.extend([i] * len(v))
+            flat.extend(v)
+            positions.extend(range(len(v)))
+        elif p and v is not None and not isinstance(v, list):
+            rows.append(i)
+            flat.append(v)
+            positions.append(None)
+        elif keep_empty:
+            rows.append(i)
+            flat.append(_MISSING if not p or isinstance(v, list) else None)
+            positions.append(None)
+    out = frame.take(np.asarray(rows, dtype=np.intp))
+    out.set(field, *_column_from_values(flat))
+    if index_field:
+        out.set(index_field, *_column_from_values(positions))
+    return out
+
+
+def _stage_replace_root(frame, expr):
+    values, present = _eval(expr, frame)
+    documents = []
+    for v, p in zip(_pylist(values), present):
+        if not p or not isinstance(v, dict):
+            raise OperationFailure("'newRoot' expression must evaluate to an object")
+        documents.append(dict(v))
+    return _Frame.from_documents(documents)
+
+
+def _run_pipeline(frame, pipeline, database=None):
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            frame = frame.take(_match_mask(frame, spec))
+        elif name == "$project":
+            frame = _stage_project(frame, spec)
+        elif name in ("$addFields", "$set"):
+            frame = _stage_add_fields(frame, spec)
+        elif name == "$unset":
+            frame = _stage_project(frame, {f: 0 for f in ([spec] if isinstance(spec, str) else spec)})
+        elif name == "$group":
+            frame = _stage_group(frame, spec)
+        elif name == "$sort":
+            frame = frame.take(_sort_order(frame, spec)[0])
+        elif name == "$limit":
+            frame = frame.take(np.arange(min(int(spec), frame.n)))
+        elif name == "$skip":
+            frame = frame.take(np.arange(min(int(spec), frame.n), frame.n))
+        elif name == "$count":
+            frame = _Frame({spec: (np.array([frame.n], dtype=np.int64), np.ones(1, bool))}, 1) if frame.n else _Frame()
+        elif name == "$bucket":
+            frame = _stage_bucket(frame, spec)
+        elif name == "$bucketAuto":
+            frame = _stage_bucket_auto(frame, spec)
+        elif name == "$setWindowFields":
+            frame = _stage_set_window_fields(frame, spec)
+        elif name == "$lookup":
+            frame = _stage_lookup(frame, spec, database)
+        elif name == "$unwind":
+            frame = _stage_unwind(frame, spec)
+        elif name in ("$replaceRoot", "$replaceWith"):
+            frame = _stage_replace_root(frame, spec["newRoot"] if name == "$replaceRoot" else spec)
+        elif name == "$sample":
+            size = min(int(spec["size"]), frame.n)
+            frame = frame.take(np.random.default_rng().choice(frame.n, size=size, replace=False))
+        else:
+            raise NotImplementedError(f"stage {name} is not supported by the columnar engine")
+    return frame
+
+
+def run_pipeline(documents, pipeline):
+    """
+    Run an aggregation pipeline on in-memory data without a collection:
+    - documents: list of dicts, or a dict / DataFrame of column arrays
+    - returns the list of result documents
+    """
+    if isinstance(documents, pd.DataFrame):
+        frame = _Frame.from_arrays({c: documents[c] for c in documents.columns})
+    elif isinstance(documents, dict):
+        frame = _Frame.from_arrays(documents)
+    else:
+        frame = _Frame.from_documents(list(documents))
+    return _run_pipeline(frame, pipeline).to_documents()
+
+
+# ============================================================
+# 🟣 PYMONGO-SHAPED COLLECTION / CURSOR / DATABASE
+# ============================================================
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = self.matched_count = self.modified_count = self.deleted_count = 0
+        self.upserted_ids = {}
+        self.acknowledged = True
+
+    @property
+    def upserted_count(self):
+        return len(self.upserted_ids)
+
+    @property
+    def bulk_api_result(self):
+        return {"nInserted": self.inserted_count, "nMatched": self.matched_count, "nModified": self.modified_count,
+                "nRemoved": self.deleted_count, "nUpserted": self.upserted_count,
+                "upserted": [{"index": i, "_id": _id} for i, _id in self.upserted_ids.items()],
+                "writeErrors": [], "writeConcernErrors": []}
+
+
+def _normalize_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return {key_or_list: direction if direction is not None else 1}
+    if isinstance(key_or_list, dict):
+        return dict(key_or_list)
+    return {k: d for k, d in key_or_list}
+
+
+def _iter_documents(frame, batch_size=0):
+    """Turn columns back into dicts one batch at a time (0 = everything at once)."""
+    step = batch_size or max(frame.n, 1)
+    for start in range(0, frame.n, step):
+        yield from frame.take(np.arange(start, min(start + step, frame.n))).to_documents()
+
+
+class ColumnarCursor:
+    """Lazy find() cursor supporting sort / skip / limit chaining like pymongo's."""
+
+    def __init__(self, collection, filter=None, projection=None):
+        self._collection = collection
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, count):
+        self._batch_size = count
+        return self
+
+    def _frame(self):
+        frame = self._collection._data()
+        frame = frame.take(_match_mask(frame, self._filter))
+        if self._sort:
+            frame = frame.take(_sort_order(frame, self._sort)[0])
+        if self._skip or self._limit:
+            stop = frame.n if not self._limit else min(frame.n, self._skip + abs(self._limit))
+            frame = frame.take(np.arange(min(self._skip, frame.n), stop))
+        if self._projection:
+            projection = self._projection
+            if isinstance(projection, (list, tuple)):
+                projection = {f: 1 for f in projection}
+            frame = _stage_project(frame, projection, keep_computed=False)
+        return frame
+
+    def __iter__(self):
+        return _iter_documents(self._frame(), self._batch_size)
+
+
+def _pushed_items(value):
+    return list(value["$each"]) if isinstance(value, dict) and "$each" in value else [value]
+
+
+def _extreme(values, present, operand, op):
+    """$min / $max of a column against one operand → (new values, rows that changed)."""
+    operand_values, _ = _literal(operand, len(values))
+    values, operand_values = _common(values, operand_values)
+    if values.dtype != object:
+        picked = (np.minimum if op == "$min" else np.maximum)(values, operand_values)
+        picked = np.where(present, picked, operand_values)
+        return picked, ~present | (picked != values)
+    pick = min if op == "$min" else max
+    out = np.empty(len(values), dtype=object)
+    changed = np.zeros(len(values), bool)
+    for i, (old, ok) in enumerate(zip(values, present)):
+        out[i] = pick(old, operand) if ok and old is not None else operand
+        changed[i] = not ok or out[i] != old
+    return out, changed
+
+
+def _upserted_document(filter, update):
+    """The document an upsert inserts: the filter's equality fields with the update applied to them."""
+    document = {k: v for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+    for op, fields in update.items():
+        for name, value in fields.items():
+            if op in ("$set", "$setOnInsert", "$inc", "$min", "$max"):
+                document[name] = value
+            elif op == "$push":
+                document[name] = _pushed_items(value)
+    return document
+
+
+class ColumnarCollection:
+    """A market_data-style collection stored as NumPy columns (pymongo method names)."""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._frame = _Frame()
+        self._pending = []
+        self._next_bulk_id = 0
+
+    @property
+    def full_name(self):
+        return f"{self.database.name}.{self.name}" if self.database is not None else self.name
+
+    def _data(self):
+        if self._pending:
+            self._frame = _Frame.concat([self._frame, _Frame.from_documents(self._pending)])
+            self._pending = []
+        return self._frame
+
+    # ---------- writes ----------
+
+    def insert_one(self, document):
+        document.setdefault("_id", _new_id())
+        self._pending.append(dict(document))
+        return InsertOneResult(document["_id"])
+
+    def insert_many(self, documents, ordered=True):
+        ids = []
+        for document in documents:
+            document.setdefault("_id", _new_id())
+            self._pending.append(dict(document))
+            ids.append(document["_id"])
+        return InsertManyResult(ids)
+
+    def insert_columns(self, columns):
+        """
+        Bulk-append a dict / DataFrame of column arrays without building per-row dicts.
+        Rows without an _id column get sequential integer ids (ObjectId per row is the bottleneck).
+        """
+        if isinstance(columns, pd.DataFrame):
+            columns = {c: columns[c] for c in columns.columns}
+        frame = _Frame.from_arrays(columns)
+        if "_id" not in frame.columns:
+            ids = np.arange(self._next_bulk_id, self._next_bulk_id + frame.n, dtype=np.int64)
+            self._next_bulk_id += frame.n
+            frame.columns = {"_id": (ids, np.ones(frame.n, bool)), **frame.columns}
+        self._frame = _Frame.concat([self._data(), frame])
+        return InsertManyResult(frame.columns["_id"][0].tolist())
+
+    def _assign(self, name, rows, values, present):
+        frame = self._data()
+        if name in frame.columns:
+            current, current_present = frame.columns[name]
+        else:
+            current, current_present = _placeholder(values.dtype, frame.n), np.zeros(frame.n, bool)
+        current, values = _common(current, values)
+        current, current_present = current.copy(), current_present.copy()
+        current[rows] = values
+        current_present[rows] = present
+        frame.set(name, current, current_present)
+
+    def _update(self, filter, update, many, upsert):
+        if not isinstance(update, dict) or not all(k.startswith("$") for k in update):
+            raise NotImplementedError(
+                "only operator updates ($set, $unset, $inc, $min, $max, $push, $rename) are supported")
+        frame = self._data()
+        rows = np.flatnonzero(_match_mask(frame, filter))
+        if not many:
+            rows = rows[:1]
+        if not len(rows):
+            if upsert:
+                inserted = self.insert_one(_upserted_document(filter, update)).inserted_id
+                return UpdateResult(0, 0, inserted)
+            return UpdateResult(0, 0)
+
+        modified = np.zeros(len(rows), bool)
+        for op, fields in update.items():
+            for name, value in fields.items():
+                values, present = self._data().get(name)
+                old_values, old_present = values[rows], present[rows]
+                if op == "$set":
+                    modified |= ~(old_present & _equals(old_values, old_present, value))
+                    self._assign(name, rows, *_literal(value, len(rows)))
+                elif op == "$unset":
+                    modified |= old_present
+                    if name in self._frame.columns:
+                        self._assign(name, rows, old_values, np.zeros(len(rows), bool))
+                elif op == "$inc":
+                    numbers, ok = _as_numeric(old_values, old_present, "$inc")
+                    modified |= value != 0
+                    self._assign(name, rows, numbers + value, np.ones(len(rows), bool))
+                elif op in ("$min", "$max"):
+                    values, changed = _extreme(old_values, old_present, value, op)
+                    modified |= changed
+                    self._assign(name, rows, values, np.ones(len(rows), bool))
+                elif op == "$push":
+                    items = _pushed_items(value)
+                    values = np.empty(len(rows), dtype=object)
+                    for i, (old, present) in enumerate(zip(old_values, old_present)):
+                        if present and not isinstance(old, list):
+                            raise TypeError(f"$push to non-array field {name!r}")
+                        values[i] = (list(old) if present else []) + items
+                    modified |= bool(items)
+                    self._assign(name, rows, values, np.ones(len(rows), bool))
+                elif op == "$rename":
+                    modified |= old_present
+                    moved = rows[old_present]
+                    if len(moved):
+                        self._assign(value, moved, old_values[old_present], np.ones(len(moved), bool))
+                        self._assign(name, moved, old_values[old_present], np.zeros(len(moved), bool))
+                elif op == "$setOnInsert":
+                    continue
+                else:
+                    raise NotImplementedError(f"update operator {op} is not supported by the columnar engine")
+        for name in list(self._frame.columns):
+            if not self._frame.columns[name][1].any():
+                self._frame.drop(name)
+        return UpdateResult(len(rows), int(modified.sum()))
+
+    def update_one(self, filter, update, upsert=False):
+        return self._update(filter, update, many=False, upsert=upsert)
+
+    def update_many(self, filter, update, upsert=False):
+        return self._update(filter, update, many=True, upsert=upsert)
+
+    def _delete(self, filter, many):
+        frame = self._data()
+        rows = np.flatnonzero(_match_mask(frame, filter))
+        if not many:
+            rows = rows[:1]
+        keep = np.ones(frame.n, bool)
+        keep[rows] = False
+        self._frame = frame.take(keep)
+        return DeleteResult(len(rows))
+
+    def delete_one(self, filter):
+        return self._delete(filter, many=False)
+
+    def delete_many(self, filter):
+        return self._delete(filter, many=True)
+
+    bulk_write_pairs = True  # bulk_write takes mongo_bulk_writer's (method, args) pairs, not pymongo requests
+
+    def bulk_write(self, requests, ordered=True):
+        """Apply (method, args) writes in order, e.g. ("update_one", (filter, update, upsert)) as BulkWriter queues them."""
+        result = BulkWriteResult()
+        for index, (method, args) in enumerate(requests):
+            if method == "insert_one":
+                self.insert_one(*args)
+                result.inserted_count += 1
+            elif method in ("update_one", "update_many"):
+                updated = getattr(self, method)(*args)
+                result.matched_count += updated.matched_count
+                result.modified_count += updated.modified_count
+                if updated.upserted_id is not None:
+                    result.upserted_ids[index] = updated.upserted_id
+            elif method in ("delete_one", "delete_many"):
+                result.deleted_count += getattr(self, method)(*args).deleted_count
+            else:
+                raise NotImplementedError(f"{method} is not supported by the columnar engine's bulk_write")
+        return result
+
+    def drop(self):
+        self._frame = _Frame()
+        self._pending = []
+
+    # ---------- reads ----------
+
+    def find(self, filter=None, projection=None):
+        return ColumnarCursor(self, filter, projection)
+
+    def find_one(self, filter=None, projection=None):
+        return next(iter(self.find(filter, projection).limit(1)), None)
+
+    def count_documents(self, filter):
+        frame = self._data()
+        return int(_match_mask(frame, filter).sum())
+
+    def estimated_document_count(self):
+        return self._data().n
+
+    def distinct(self, key, filter=None):
+        frame = self._data()
+        frame = frame.take(_match_mask(frame, filter))
+        values, present = frame.get(key)
+        seen = {}
+        for v in _pylist(values[present]):
+            for item in (v if isinstance(v, list) else [v]):
+                seen.setdefault(_hashable(item), item)
+        return list(seen.values())
+
+    def aggregate(self, pipeline, **kwargs):
+        return _iter_documents(_run_pipeline(self._data(), pipeline, self.database), kwargs.get("batchSize", 0))
+
+    def to_frame(self):
+        """Snapshot the collection as a pandas DataFrame (missing fields → NaN/None)."""
+        frame = self._data()
+        data = {}
+        for name, (values, present) in frame.columns.items():
+            data[name] = values if present.all() else _with_nulls(values, present)[0]
+        return pd.DataFrame(data)
+
+
+class ColumnarDatabase:
+    """Dict-style database handle: db["market_data"] → ColumnarCollection."""
+
+    def __init__(self, name="test"):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = ColumnarCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def drop_collection(self, name):
+        self._collections.pop(name, None)
+
+
+if __name__ == "__main__":
+    from data_prep_and_mongo_utils import mongo_query_examples
+
+    db = ColumnarDatabase("interview")
+    for i, example in enumerate(mongo_query_examples(db), 1):
+        try:
+            result = example()
+        except OperationFailure as exc:  # same failure the server would report
+            print(f"{i:>2}. OperationFailure: {exc}")
+            continue
+        size = len(result) if isinstance(result, list) else result
+        print(f"{i:>2}. {type(result).__name__:<18} {size if isinstance(size, int) else ''}")
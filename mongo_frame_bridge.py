@@ -0,0 +1,301 @@
+import argparse
+import itertools
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 🌉 CHUNKED CURSOR → COLUMNAR DATAFRAME BRIDGE
+# ============================================================
+#
+# pd.DataFrame(list(collection.find(...))) keeps every document alive as a
+# Python dict until pandas has copied it.  The bridge reads the cursor
+# batch_size documents at a time and writes each field straight into
+# preallocated typed NumPy columns (float64 / int64 / bool / datetime64 /
+# object); only the current batch of dicts is ever alive:
+#
+#     df = find_frame(db["market_data"], {"sector": "Tech"}, {"symbol": 1, "price": 1})
+#     for chunk in find_frames(db["market_data"], batch_size=50_000):
+#         ...                                         # one DataFrame per batch
+#     df = aggregate_frame(db["market_data"], [{"$match": {...}}, ...])
+#
+# Column types come from `schema` ({"price": "float64", ...}) or from the
+# first values seen; a column widens (int → float → object) when later
+# batches need it.  Missing fields become NaN / NaT / None like pandas does.
+#
+# Measured peak (python mongo_frame_bridge.py): on the columnar stand-in with
+# 200,000 documents a full find() (#4 / #10 / #19 / #20) peaks at 50.7 MB
+# against 131.3 MB for list → DataFrame, #9 at 17.4 vs 61.4 MB; on mongomock
+# with 20,000 documents #4 is 10.9 vs 13.6 MB.  The saving shrinks as a
+# result nears one batch, and a 3-row sort (#18) peaks in the server-side
+# sort either way (17.4 MB both).  Time is about the same as the baseline.
+
+DEFAULT_BATCH_SIZE = 10_000
+
+_PLACEHOLDERS = {"b": False, "i": 0, "f": np.nan, "M": None, "O": None}
+
+
+def _kind_of(value):
+    if isinstance(value, (bool, np.bool_)):
+        return "b"
+    if isinstance(value, (int, np.integer)):
+        return "i"
+    if isinstance(value, (float, np.floating)):
+        return "f"
+    if isinstance(value, datetime):
+        return "M"
+    return "O"
+
+
+def _dtype(kind):
+    return {"b": np.bool_, "i": np.int64, "f": np.float64, "M": "datetime64[ms]", "O": object}[kind]
+
+
+class _Column:
+    """One typed column with a null mask; grows by doubling and widens on demand."""
+
+    def __init__(self, kind, capacity, filled=0):
+        self.kind = kind
+        self.values = np.empty(capacity, dtype=_dtype(kind))
+        self.nulls = np.zeros(capacity, bool)
+        self.nulls[:filled] = True  # field first seen after `filled` rows
+
+    def reserve(self, capacity):
+        if capacity > len(self.values):
+            grown = np.empty(capacity, dtype=self.values.dtype)
+            grown[:len(self.values)] = self.values
+            nulls = np.zeros(capacity, bool)
+            nulls[:len(self.nulls)] = self.nulls
+            self.values, self.nulls = grown, nulls
+
+    def widen(self, kind, filled):
+        if kind == self.kind:
+            return
+        if kind == "f" and self.kind == "i":
+            self.values = self.values.astype(np.float64)
+        else:
+            kind = "O"
+            out = np.empty(len(self.values), dtype=object)
+            out[:filled] = self.values[:filled].astype("datetime64[ms]").tolist() if self.kind == "M" \
+                else self.values[:filled].tolist()
+            self.values = out
+        self.kind = kind
+
+    def write(self, start, items):
+        n = len(items)
+        has_nulls = items.count(None) > 0
+        nulls = np.fromiter((v is None for v in items), bool, n) if has_nulls else np.zeros(n, bool)
+        self.nulls[start:start + n] = nulls
+        if self.kind == "O":
+            self.values[start:start + n] = np.fromiter(items, dtype=object, count=n)
+            return
+        if has_nulls:
+            fill = _PLACEHOLDERS[self.kind]
+            items = [fill if v is None else v for v in items]
+        try:
+            if self.kind == "M":
+                converted = pd.to_datetime(items).to_numpy().astype("datetime64[ms]")
+            else:
+                converted = np.asarray(items)
+                kind = converted.dtype.kind
+                if kind == "f" and self.kind == "i":
+                    self.widen("f", start)
+                elif kind != self.kind and not (kind in "iu" and self.kind == "f"):
+                    raise TypeError(f"{kind} values in a {self.kind} column")
+            self.values[start:start + n] = converted
+        except (TypeError, ValueError, OverflowError):
+            self.widen("O", start)
+            self.values[start:start + n] = np.fromiter(
+                (None if null else v for v, null in zip(items, nulls)), dtype=object, count=n)
+
+    def series(self, n):
+        values, nulls = self.values[:n], self.nulls[:n]
+        if not nulls.any():
+            return values if len(self.values) == n else values.copy()  # don't pin the spare capacity
+        if self.kind == "i":
+            values = values.astype(np.float64)
+        elif self.kind == "b":
+            values = values.astype(object)
+        else:
+            values = values.copy()
+        if values.dtype.kind == "M":
+            values[nulls] = np.datetime64("NaT")
+        else:
+            values[nulls] = np.nan if values.dtype.kind == "f" else None
+        return values
+
+
+class FrameBuilder:
+    """Accumulates document batches into typed columns; frame() hands them to pandas."""
+
+    def __init__(self, capacity=DEFAULT_BATCH_SIZE, schema=None):
+        self.capacity = max(1, capacity)
+        self.n = 0
+        self.columns = {}
+        for name, dtype in (schema or {}).items():
+            self.columns[name] = _Column(np.dtype(dtype).kind if dtype != "str" else "O", self.capacity)
+
+    def append(self, batch):
+        end = self.n + len(batch)
+        if end > self.capacity:
+            self.capacity = max(end, 2 * self.capacity)
+            for column in self.columns.values():
+                column.reserve(self.capacity)
+        new = [name for name in dict.fromkeys(itertools.chain.from_iterable(batch)) if name not in self.columns]
+        for name in new:  # first-seen order, like pd.DataFrame(list_of_dicts)
+            value = next((d[name] for d in batch if d.get(name) is not None), None)
+            self.columns[name] = _Column(_kind_of(value) if value is not None else "O", self.capacity, self.n)
+        for name, column in self.columns.items():
+            column.write(self.n, [doc.get(name) for doc in batch])
+        self.n = end
+
+    def frame(self):
+        """
+        Hand the columns to pandas (the builder is empty afterwards):
+        - each column's buffer is released as soon as its trimmed copy exists
+        - copy=False keeps pandas from consolidating them into a second, 2-D copy
+        """
+        data = {}
+        for name in list(self.columns):
+            data[name] = self.columns.pop(name).series(self.n)
+        return pd.DataFrame(data, index=pd.RangeIndex(self.n), copy=False)
+
+
+def _batches(documents, batch_size):
+    documents = iter(documents)
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            return
+        yield batch
+        del batch  # otherwise this batch stays alive while the next one is read
+
+
+def iter_frames(documents, batch_size=DEFAULT_BATCH_SIZE, schema=None):
+    """One DataFrame per batch_size documents from any cursor / iterable of dicts."""
+    for batch in _batches(documents, batch_size):
+        builder = FrameBuilder(len(batch), schema)
+        builder.append(batch)
+        del batch
+        yield builder.frame()
+
+
+def to_frame(documents, batch_size=DEFAULT_BATCH_SIZE, schema=None, expected_rows=None):
+    """All documents in one DataFrame; expected_rows preallocates the columns exactly."""
+    builder = FrameBuilder(expected_rows or 0, schema)  # otherwise sized by the first batch, then doubled
+    for batch in _batches(documents, batch_size):
+        builder.append(batch)
+        del batch
+    return builder.frame()
+
+
+def _find_cursor(collection, filter, projection, sort, limit, batch_size):
+    cursor = collection.find(filter or {}, projection)
+    if sort:
+        cursor = cursor.sort(list(sort.items()))
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor.batch_size(batch_size)
+
+
+def find_frames(collection, filter=None, projection=None, sort=None, limit=0,
+                batch_size=DEFAULT_BATCH_SIZE, schema=None):
+    """find() as a stream of chunk-sized DataFrames."""
+    cursor = _find_cursor(collection, filter, projection, sort, limit, batch_size)
+    return iter_frames(cursor, batch_size, schema)
+
+
+def find_frame(collection, filter=None, projection=None, sort=None, limit=0,
+               batch_size=DEFAULT_BATCH_SIZE, schema=None, count_first=False):
+    """
+    find() as one DataFrame (columns grow by doubling):
+    - count_first: size the columns with count_documents() first; costs a second scan of the collection
+    """
+    expected = None
+    if count_first:
+        expected = collection.count_documents(filter or {})
+        expected = min(expected, limit) if limit else expected
+    cursor = _find_cursor(collection, filter, projection, sort, limit, batch_size)
+    return to_frame(cursor, batch_size, schema, expected)
+
+
+def aggregate_frames(collection, pipeline, batch_size=DEFAULT_BATCH_SIZE, schema=None):
+    """aggregate() as a stream of chunk-sized DataFrames."""
+    return iter_frames(collection.aggregate(pipeline, batchSize=batch_size), batch_size, schema)
+
+
+def aggregate_frame(collection, pipeline, batch_size=DEFAULT_BATCH_SIZE, schema=None):
+    """aggregate() as one DataFrame (columns grow by doubling)."""
+    return to_frame(collection.aggregate(pipeline, batchSize=batch_size), batch_size, schema)
+
+
+# ============================================================
+# 📏 PEAK MEMORY VS pd.DataFrame(list(cursor))
+# ============================================================
+
+def measure_peak(fn):
+    """Run fn() under tracemalloc → (result, peak bytes, seconds)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak, seconds
+
+
+def compare_find_examples(collection, batch_size=DEFAULT_BATCH_SIZE, examples=None):
+    """
+    Baseline vs bridge for the find() examples (#4–#10, #16, #18–#20):
+    - returns one row per example with peak MB, seconds and whether the frames match
+    """
+    from mongo_query_capture import capture_examples
+
+    rows = []
+    for call in capture_examples():
+        if call.method != "find" or (examples and call.example not in examples):
+            continue
+        args = (call.filter, call.projection, call.sort, call.limit)
+
+        def baseline():
+            return pd.DataFrame(list(_find_cursor(collection, *args, batch_size)))
+
+        expected, base_peak, base_s = measure_peak(baseline)
+        got, peak, seconds = measure_peak(lambda: find_frame(collection, *args, batch_size=batch_size))
+        try:
+            pd.testing.assert_frame_equal(expected, got, check_dtype=False)
+            same = True
+        except AssertionError:
+            same = False
+        rows.append({"example": call.example, "rows": len(got), "baseline_mb": base_peak / 2 ** 20,
+                     "bridge_mb": peak / 2 ** 20, "baseline_s": base_s, "bridge_s": seconds, "same": same})
+    return rows
+
+
+def main(argv=None):
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Peak memory of find() → DataFrame, baseline vs bridge")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--examples", type=int, nargs="*")
+    args = parser.parse_args(argv)
+
+    db = connect(args.backend, args.uri)
+    collection = seed_market_data(db, args.size)
+    print(f"{'#':>3} {'rows':>9} {'list→DF MB':>11} {'bridge MB':>10} {'list→DF s':>10} {'bridge s':>9}  same")
+    for r in compare_find_examples(collection, args.batch_size, args.examples):
+        print(f"{r['example']:>3} {r['rows']:>9,} {r['baseline_mb']:>11.1f} {r['bridge_mb']:>10.1f} "
+              f"{r['baseline_s']:>10.3f} {r['bridge_s']:>9.3f}  {'✅' if r['same'] else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+try:
+    import bson
+except ImportError:  # pymongo not installed — fall back to JSON size estimates
+    bson = None
+
+
+# ============================================================
+# 🔗 CLIENT-SIDE HASH JOIN FOR $lookup SELF-JOINS
+# ============================================================
+#
+# Example #52 looks market_data up onto itself by symbol: every output
+# document embeds all documents sharing its symbol, so the result grows with
+# (docs per symbol)² and the server probes the foreign side once per input
+# document.  HashLookup pulls each side once as projected column batches,
+# hashes the foreign keys, and estimates the output size from key frequencies
+# before building anything:
+#
+#     join = HashLookup(db["market_data"], "symbol", "symbol", "joined_docs",
+#                       foreign_projection={"_id": 0, "date": 1, "price": 1})
+#     join.estimate             # → {"embedded_docs": ..., "est_bytes": ...}
+#     join.run()                # whole result, or JoinBudgetExceeded over budget
+#     for chunk in join.chunks():   # the same documents, each chunk under budget
+#         ...
+#
+# Matching follows $lookup: a missing or null local value matches foreign
+# documents whose field is missing or null.  Array values are compared as
+# whole values (no per-element matching).  The foreign key is always read,
+# even when foreign_projection leaves it out, and is dropped again from the
+# embedded documents, so the projection never changes which rows match.
+
+DEFAULT_BATCH_SIZE = 10_000
+DEFAULT_MEMORY_BUDGET = 256 << 20
+SIZE_SAMPLE = 256
+
+MISSING = object()
+
+
+class JoinBudgetExceeded(Exception):
+    """The estimated $lookup output does not fit in the memory budget."""
+
+    def __init__(self, estimate, budget):
+        super().__init__(f"estimated join output {estimate['est_bytes']:,} bytes "
+                         f"({estimate['embedded_docs']:,} embedded docs) exceeds budget {budget:,} bytes; "
+                         f"use chunks() to stream it")
+        self.estimate = estimate
+        self.budget = budget
+
+
+def _append_batch(parts, n, batch):
+    for name in {key for doc in batch for key in doc}:
+        if name not in parts:
+            parts[name] = [np.full(n, MISSING, dtype=object)] if n else []
+    for name, chunks in parts.items():
+        column = np.empty(len(batch), dtype=object)
+        column[:] = [doc.get(name, MISSING) for doc in batch]
+        chunks.append(column)
+    return n + len(batch)
+
+
+def pull_columns(source, projection=None, filter=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read a collection (or an iterable of documents) into {field: object array}, batch by batch:
+    - absent fields hold MISSING so documents round-trip exactly
+    - returns (columns, number of rows)
+    """
+    if hasattr(source, "find"):
+        documents = source.find(filter or {}, projection).batch_size(batch_size)
+    else:
+        documents = source
+    parts, n, batch = {}, 0, []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            n = _append_batch(parts, n, batch)
+            batch = []
+    if batch:
+        n = _append_batch(parts, n, batch)
+    return {name: np.concatenate(chunks) for name, chunks in parts.items()}, n
+
+
+def _row(columns, i, drop=None):
+    doc = {name: values[i] for name, values in columns.items() if values[i] is not MISSING}
+    if drop is not None:
+        head, _, rest = drop.partition(".")
+        if not rest:
+            doc.pop(head, None)
+        elif isinstance(doc.get(head), dict):
+            doc[head] = {k: v for k, v in doc[head].items() if k != rest}  # copy: the column keeps the original
+            if not doc[head]:
+                del doc[head]
+    return doc
+
+
+def _keeping(projection, field):
+    """
+    A projection that also returns `field`, plus the path to drop again from the embedded documents:
+    - the join key must be read even when the caller projects it away
+    - the path is None when the caller's projection already keeps the field
+    """
+    if not projection:
+        return projection, None
+    root = field.split(".", 1)[0]
+    covering = [p for p in projection if p == field or p == root or field.startswith(p + ".")]
+    if any(v for k, v in projection.items() if k != "_id"):  # inclusion projection
+        if any(projection[p] for p in covering):
+            return projection, None
+        kept = {k: v for k, v in projection.items() if k not in covering}
+        return {**kept, field: 1}, field
+    excluded = [p for p in covering if not projection[p]]
+    if not excluded:
+        return projection, None
+    return {k: v for k, v in projection.items() if k not in excluded}, min(excluded, key=len)
+
+
+def _key(value):
+    if value is MISSING or value is None:
+        return None
+    if isinstance(value, bool):
+        return ("__bool__", value)  # True must not match 1 the way Python hashing would
+    if isinstance(value, list):
+        return ("__array__",) + tuple(_key(v) for v in value)
+    if isinstance(value, dict):
+        return ("__doc__",) + tuple((k, _key(v)) for k, v in value.items())
+    return value
+
+
+def _keys(columns, field, n):
+    if field in columns:
+        return [_key(v) for v in columns[field]]
+    if "." in field:
+        root, rest = field.split(".", 1)
+        if root in columns:
+            return [_key(v.get(rest, MISSING) if isinstance(v, dict) else MISSING) for v in columns[root]]
+    return [None] * n
+
+
+def _average_size(columns, n, drop=None):
+    if not n:
+        return 0
+    sample = [_row(columns, i, drop) for i in range(min(n, SIZE_SAMPLE))]
+    if bson is not None:
+        return sum(len(bson.encode(doc)) for doc in sample) / len(sample)
+    return sum(len(json.dumps(doc, default=str)) for doc in sample) / len(sample)
+
+
+class HashLookup:
+    """
+    $lookup {from, localField, foreignField, as} evaluated client-side with a hash table:
+    - local: collection or iterable of documents (e.g. a $group result, as in pipeline2.txt)
+    - foreign: collection to join in; defaults to `local` (a self-join pulls the data once)
+    - memory_budget: bytes the materialized output may take before run() refuses
+    """
+
+    def __init__(self, local, local_field, foreign_field, as_field, foreign=None, filter=None,
+                 local_projection=None, foreign_projection=None, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.as_field = as_field
+        self.memory_budget = memory_budget
+
+        self.local, self.n_local = pull_columns(local, local_projection, filter, batch_size)
+        foreign_projection, self._hidden = _keeping(foreign_projection, foreign_field)
+        self_join = foreign is None or foreign is local
+        if self_join and filter is None and foreign_projection == local_projection:
+            self.foreign, self.n_foreign = self.local, self.n_local
+        else:
+            self.foreign, self.n_foreign = pull_columns(local if self_join else foreign, foreign_projection,
+                                                        None, batch_size)
+
+        # Build side: foreign rows grouped by key code (rows of code c are order[starts[c]:starts[c+1]])
+        index, foreign_codes = {}, np.empty(self.n_foreign, dtype=np.int64)
+        for i, key in enumerate(_keys(self.foreign, foreign_field, self.n_foreign)):
+            foreign_codes[i] = index.setdefault(key, len(index))
+        self._order = np.argsort(foreign_codes, kind="stable")
+        counts = np.bincount(foreign_codes, minlength=len(index))
+        self._starts = np.r_[0, np.cumsum(counts)]
+
+        # Probe side: local key → foreign code (-1 = no match) and per-row match counts
+        self._local_codes = np.fromiter((index.get(k, -1) for k in _keys(self.local, local_field, self.n_local)),
+                                        dtype=np.int64, count=self.n_local)
+        self._matches = np.where(self._local_codes >= 0, counts[np.maximum(self._local_codes, 0)], 0) \
+            if len(counts) else np.zeros(self.n_local, dtype=np.int64)
+
+        local_size = _average_size(self.local, self.n_local)
+        foreign_size = _average_size(self.foreign, self.n_foreign, self._hidden)
+        self._row_bytes = local_size + len(as_field) + 8 + self._matches * foreign_size
+        self.estimate = {
+            "local_rows": self.n_local,
+            "foreign_rows": self.n_foreign,
+            "distinct_keys": len(index),
+            "embedded_docs": int(self._matches.sum()),
+            "max_matches": int(self._matches.max()) if self.n_local else 0,
+            "est_bytes": int(self._row_bytes.sum()),
+        }
+
+    @property
+    def fits(self):
+        return self.estimate["est_bytes"] <= self.memory_budget
+
+    def _build(self, start, end):
+        foreign_docs = {}
+        out = []
+        for i in range(start, end):
+            doc = _row(self.local, i)
+            code = self._local_codes[i]
+            joined = []
+            if code >= 0:
+                for j in self._order[self._starts[code]:self._starts[code + 1]]:
+                    if j not in foreign_docs:
+                        foreign_docs[j] = _row(self.foreign, j, self._hidden)
+                    joined.append(dict(foreign_docs[j]))
+            doc[self.as_field] = joined
+            out.append(doc)
+        return out
+
+    def run(self):
+        """The whole $lookup result as a list; raises JoinBudgetExceeded when the estimate is over budget."""
+        if not self.fits:
+            raise JoinBudgetExceeded(self.estimate, self.memory_budget)
+        return self._build(0, self.n_local)
+
+    def chunks(self, max_bytes=None):
+        """Yield the result in local order as lists whose estimated size stays under max_bytes (default: budget)."""
+        budget = max_bytes or self.memory_budget
+        cumulative = np.cumsum(self._row_bytes)
+        start = 0
+        while start < self.n_local:
+            base = cumulative[start - 1] if start else 0
+            end = int(np.searchsorted(cumulative, base + budget, side="right"))
+            end = max(end, start + 1)  # one oversized document still goes out alone
+            yield self._build(start, end)
+            start = end
+
+
+def main(argv=None):
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Hash-join version of example #52 (market_data self-lookup)")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=5_000)
+    parser.add_argument("--budget-mb", type=float, default=64)
+    args = parser.parse_args(argv)
+
+    db = connect(args.backend, args.uri)
+    collection = seed_market_data(db, args.size)
+    budget = int(args.budget_mb * (1 << 20))
+
+    start = time.perf_counter()
+    join = HashLookup(collection, "symbol", "symbol", "joined_docs", memory_budget=budget)
+    print(f"📐 estimate in {time.perf_counter() - start:.2f}s: {join.estimate}")
+    try:
+        join.run()
+        print("✅ fits in budget")
+    except JoinBudgetExceeded as exc:
+        print(f"⛔ {exc}")
+
+    start = time.perf_counter()
+    total = sizes = 0
+    for chunk in join.chunks():
+        total += len(chunk)
+        sizes += 1
+    print(f"🌊 streamed {total:,} docs in {sizes} chunks in {time.perf_counter() - start:.2f}s")
+
+    # Projected foreign side: the join most callers actually need
+    slim = HashLookup(collection, "symbol", "symbol", "joined_docs", memory_budget=budget,
+                      foreign_projection={"_id": 0, "date": 1, "price": 1})
+    print(f"✂️  with foreign projection: {slim.estimate['est_bytes']:,} bytes (fits={slim.fits}), "
+          f"same matches: {slim.estimate['embedded_docs'] == join.estimate['embedded_docs']}")
+
+    small = list(collection.find().limit(200))
+    start = time.perf_counter()
+    expected = list(collection.aggregate([{"$limit": 200}, {"$lookup": {
+        "from": collection.name, "localField": "symbol", "foreignField": "symbol", "as": "joined_docs"}}]))
+    server_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    probe = HashLookup(small, "symbol", "symbol", "joined_docs", foreign=collection, memory_budget=budget)
+    got = [doc for chunk in probe.chunks() for doc in chunk]
+    hash_ms = (time.perf_counter() - start) * 1000
+    same = [sorted(map(str, (d["_id"] for d in a["joined_docs"]))) for a in expected] == \
+        [sorted(map(str, (d["_id"] for d in b["joined_docs"]))) for b in got]
+    print(f"🔁 200-doc probe: $lookup {server_ms:.1f} ms vs hash join {hash_ms:.1f} ms, same matches: {same}")
+
+
+if __name__ == "__main__":
+    main()
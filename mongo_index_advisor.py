@@ -0,0 +1,340 @@
+import argparse
+
+from data_prep_and_mongo_utils import mongo_query_examples
+from mongo_query_capture import capture_examples
+
+
+# ============================================================
+# 🧭 EXPLAIN-DRIVEN INDEX ADVISOR FOR market_data
+# ============================================================
+#
+#   python mongo_index_advisor.py --offline              # proposals from query shapes only
+#   python mongo_index_advisor.py --uri mongodb://...    # explain("executionStats") every read
+#   python mongo_index_advisor.py --uri ... --apply      # create proposals, then re-measure
+#
+# Proposals follow the Equality → Sort → Range rule: fields matched by value
+# first, then the sort keys (with their direction), then range predicates.
+# Candidates that are a prefix of another proposal (equality fields in any
+# order, sort directions all equal or all reversed) are folded into it, which
+# keeps the set minimal.
+
+RANGE_OPS = {"$gt", "$gte", "$lt", "$lte", "$regex"}
+EQUALITY_OPS = {"$eq", "$in"}
+
+
+class IndexProposal:
+    """A compound index key list plus the examples it serves."""
+
+    def __init__(self, collection, keys, equality, examples):
+        self.collection = collection
+        self.keys = list(keys)
+        self.equality = set(equality)
+        self.examples = set(examples)
+
+    @property
+    def name(self):
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def covers(self, other):
+        """True when `other` can use this index: same collection and `other` is a prefix of it."""
+        if self.collection != other.collection or len(other.keys) > len(self.keys):
+            return False
+        n_eq = len(other.equality)
+        if {f for f, _ in self.keys[:n_eq]} != other.equality:
+            return False
+        rest, mine = other.keys[n_eq:], self.keys[n_eq:n_eq + len(other.keys) - n_eq]
+        if [f for f, _ in rest] != [f for f, _ in mine]:
+            return False
+        same = all(a == b for (_, a), (_, b) in zip(rest, mine))
+        flipped = all(a == -b for (_, a), (_, b) in zip(rest, mine))
+        return same or flipped
+
+    def __repr__(self):
+        return f"<{self.collection} {self.keys} serves {sorted(self.examples)}>"
+
+
+# ============================================================
+# 🟢 QUERY SHAPES → CANDIDATE INDEXES
+# ============================================================
+
+def _filter_shape(filter):
+    """Split a find filter into (equality fields, range fields, $or branches)."""
+    equality, ranges, branches = [], [], []
+    for field, cond in (filter or {}).items():
+        if field == "$and":
+            for sub in cond:
+                eq, rng, br = _filter_shape(sub)
+                equality += eq
+                ranges += rng
+                branches += br
+        elif field == "$or":
+            branches.append(cond)
+        elif field.startswith("$"):
+            continue  # $nor / $expr / $text — not index-driven here
+        elif isinstance(cond, dict) and cond and all(op.startswith("$") for op in cond):
+            ops = set(cond) - {"$options"}
+            if ops <= EQUALITY_OPS:
+                equality.append(field)
+            elif "$regex" in ops and (not str(cond["$regex"]).startswith("^") or "i" in cond.get("$options", "")):
+                continue  # unanchored / case-insensitive regex cannot bound an index scan
+            elif ops & RANGE_OPS:
+                ranges.append(field)
+            # $ne / $nin / $exists match most of the collection: an index rarely helps
+        else:
+            equality.append(field)
+    return equality, ranges, branches
+
+
+def _candidate(collection, example, equality, sort, ranges):
+    keys, seen = [], set()
+    for field in sorted(set(equality)):
+        keys.append((field, 1))
+        seen.add(field)
+    for field, direction in (sort or {}).items():
+        if field not in seen:
+            keys.append((field, 1 if direction >= 0 else -1))
+            seen.add(field)
+    for field in ranges:
+        if field not in seen:
+            keys.append((field, 1))
+            seen.add(field)
+    if not keys:
+        return None
+    return IndexProposal(collection, keys, set(equality), {example})
+
+
+def _shapes(filter, sort):
+    """(equality, ranges) per index-able branch of a filter; $or yields one shape per branch."""
+    equality, ranges, branches = _filter_shape(filter)
+    if not branches:
+        return [(equality, ranges)]
+    shapes = []
+    for branch_list in branches:
+        for branch in branch_list:
+            eq, rng, _ = _filter_shape(branch)
+            shapes.append((equality + eq, ranges + rng))
+    return shapes
+
+
+def _pipeline_shape(pipeline):
+    """Leading $match stages plus the $sort right after them, as (filter, sort, lookups, window_sort)."""
+    filter, sort, lookups, window_sort = {"$and": []}, None, [], None
+    kept = None  # fields an inclusion $project lets through to a later $sort
+    for i, stage in enumerate(pipeline):
+        (name, spec), = stage.items()
+        if name == "$match" and sort is None and kept is None:
+            filter["$and"].append(spec)
+        elif name == "$sort" and sort is None:
+            if kept is not None and not set(spec) <= kept:
+                break
+            sort = spec
+        elif name == "$project" and kept is None and all(v in (1, True) for k, v in spec.items() if k != "_id"):
+            kept = set(spec)
+        elif name == "$setWindowFields" and i == len(filter["$and"]) and sort is None:
+            window_sort = {}
+            if isinstance(spec.get("partitionBy"), str):
+                window_sort[spec["partitionBy"][1:]] = 1
+            window_sort.update(spec.get("sortBy") or {})
+            break
+        else:
+            break
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$lookup" and "foreignField" in spec:
+            lookups.append((spec["from"], spec["foreignField"]))
+    return filter, sort, lookups, window_sort
+
+
+def candidates_for(call):
+    """Candidate indexes (one per $or branch / $lookup target) for one captured read."""
+    if not call.is_read or call.method == "estimated_document_count":
+        return []
+    out = []
+    if call.method == "aggregate":
+        filter, sort, lookups, window_sort = _pipeline_shape(call.pipeline)
+        for foreign, field in lookups:
+            out.append(IndexProposal(foreign, [(field, 1)], {field}, {call.example}))
+        sort = sort or window_sort
+    elif call.method == "distinct":
+        filter, sort = call.filter, {call.key: 1}
+    else:
+        filter, sort = call.filter, call.sort
+    for equality, ranges in _shapes(filter, sort):
+        candidate = _candidate(call.collection, call.example, equality, sort, ranges)
+        if candidate is not None:
+            out.append(candidate)
+    return out
+
+
+def propose_indexes(calls):
+    """Minimal set of compound indexes covering every captured read."""
+    merged = {}
+    for call in calls:
+        for cand in candidates_for(call):
+            key = (cand.collection, tuple(cand.keys))
+            if key in merged:
+                merged[key].examples |= cand.examples
+            else:
+                merged[key] = cand
+    kept = []
+    for cand in sorted(merged.values(), key=lambda c: -len(c.keys)):
+        owner = next((k for k in kept if k.covers(cand)), None)
+        if owner is not None:
+            owner.examples |= cand.examples
+        else:
+            kept.append(cand)
+    return sorted(kept, key=lambda c: min(c.examples))
+
+
+# ============================================================
+# 🟡 explain("executionStats") MEASUREMENT
+# ============================================================
+
+def explain_command(call):
+    """The explain-able command document for a captured read (None when not explainable)."""
+    name = call.collection
+    if call.method in ("find", "find_one"):
+        cmd = {"find": name, "filter": call.filter}
+        if call.projection:
+            cmd["projection"] = call.projection
+        if call.sort:
+            cmd["sort"] = call.sort
+        if call.limit or call.method == "find_one":
+            cmd["limit"] = call.limit or 1
+        if call.skip:
+            cmd["skip"] = call.skip
+        return cmd
+    if call.method == "count_documents":
+        return {"count": name, "query": call.filter}
+    if call.method == "distinct":
+        return {"distinct": name, "key": call.key, "query": call.filter}
+    if call.method == "aggregate":
+        return {"aggregate": name, "pipeline": call.pipeline, "cursor": {}}
+    return None
+
+
+def _walk(node, visit):
+    if isinstance(node, dict):
+        visit(node)
+        for value in node.values():
+            _walk(value, visit)
+    elif isinstance(node, list):
+        for value in node:
+            _walk(value, visit)
+
+
+def summarize_explain(explain):
+    """Pull docsExamined / keysExamined / nReturned and plan flags out of an explain document."""
+    stats, stages, indexes = [], [], []
+
+    def visit(node):
+        if "executionStats" in node and isinstance(node["executionStats"], dict):
+            stats.append(node["executionStats"])
+        if "stage" in node:
+            stages.append(node["stage"])
+            if node["stage"] in ("IXSCAN", "DISTINCT_SCAN") and "indexName" in node:
+                indexes.append(node["indexName"])
+        if "$sort" in node:
+            stages.append("$sort")
+
+    _walk(explain, visit)
+    first = stats[0] if stats else {}
+    docs = sum(s.get("totalDocsExamined", 0) for s in stats)
+    keys = sum(s.get("totalKeysExamined", 0) for s in stats)
+    returned = first.get("nReturned", 0)
+    return {
+        "docs_examined": docs,
+        "keys_examined": keys,
+        "n_returned": returned,
+        "examined_per_returned": round(docs / returned, 1) if returned else float(docs),
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages or "$sort" in stages,
+        "indexes": sorted(set(indexes)),
+        "ms": first.get("executionTimeMillis", 0),
+    }
+
+
+def measure(db, calls):
+    """explain("executionStats") every captured read; one summary row per call."""
+    rows = []
+    for call in calls:
+        cmd = explain_command(call)
+        if cmd is None:
+            continue
+        row = {"example": call.example, "method": call.method}
+        try:
+            row.update(summarize_explain(db.command({"explain": cmd, "verbosity": "executionStats"})))
+        except Exception as exc:  # unsupported stage on this server version, timeouts...
+            row["error"] = f"{type(exc).__name__}: {exc}"
+        rows.append(row)
+    return rows
+
+
+def apply_proposals(db, proposals):
+    """Create each proposed index; returns the created index names."""
+    return [db[p.collection].create_index(p.keys, name=p.name) for p in proposals]
+
+
+def advise(db=None, apply=False, examples=None, examples_fn=mongo_query_examples):
+    """
+    Capture the workload, propose indexes and (with a live db) measure them:
+    - examples: optional 1-based numbers to restrict the workload (e.g. skip #52 at 10M docs)
+    - apply: create the proposals and re-measure
+    Returns (before rows, proposals, after rows).
+    """
+    calls = [c for c in capture_examples(examples_fn) if c.is_read]
+    if examples:
+        calls = [c for c in calls if c.example in set(examples)]
+    proposals = propose_indexes(calls)
+    if db is None:
+        return [], proposals, []
+    before = measure(db, calls)
+    after = []
+    if apply:
+        apply_proposals(db, proposals)
+        after = measure(db, calls)
+    return before, proposals, after
+
+
+def print_report(before, proposals, after):
+    if before:
+        print(f"{'#':>3} {'method':<16} {'docsExam':>10} {'keysExam':>10} {'nReturned':>10} {'ratio':>8}  flags")
+        for r in before:
+            if "error" in r:
+                print(f"{r['example']:>3} {r['method']:<16} ⚠️  {r['error'][:80]}")
+                continue
+            flags = " ".join(f for f, on in (("COLLSCAN", r["collscan"]), ("SORT", r["in_memory_sort"])) if on)
+            print(f"{r['example']:>3} {r['method']:<16} {r['docs_examined']:>10} {r['keys_examined']:>10} "
+                  f"{r['n_returned']:>10} {r['examined_per_returned']:>8}  {flags}")
+    print("\n📌 Proposed indexes (Equality → Sort → Range):")
+    for p in proposals:
+        print(f"  {p.collection}.create_index({p.keys})   # examples {sorted(p.examples)}")
+    if after:
+        print("\n🔁 After creating the indexes:")
+        old = {(r["example"], r["method"]): r for r in before}
+        for r in after:
+            prev = old.get((r["example"], r["method"]), {})
+            if "error" in r or "error" in prev:
+                continue
+            print(f"  #{r['example']:>2} docsExamined {prev['docs_examined']:>10} → {r['docs_examined']:>10}   "
+                  f"COLLSCAN {prev['collscan']!s:<5} → {r['collscan']!s:<5}  indexes {r['indexes']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index advisor for the mongo_query_examples workload")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="benchmark")
+    parser.add_argument("--offline", action="store_true", help="propose from query shapes without a server")
+    parser.add_argument("--apply", action="store_true", help="create the proposed indexes and re-measure")
+    parser.add_argument("--examples", type=int, nargs="*")
+    args = parser.parse_args(argv)
+
+    db = None
+    if not args.offline:
+        from mongo_client_manager import get_database
+        db = get_database(args.db, args.uri)
+    print_report(*advise(db, apply=args.apply, examples=args.examples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+import heapq
+import math
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from data_prep_and_mongo_utils import mongo_query_examples
+from mongo_frame_bridge import find_frame
+
+
+# ============================================================
+# 📊 INCREMENTALLY MAINTAINED SECTOR AGGREGATES
+# ============================================================
+#
+# Examples #21, #22, #24, #25, #32, #36, #60 and #61 rescan market_data for
+# per-sector numbers a dashboard polls every few seconds.  SectorAggregates
+# keeps running count / sum / sum of squares and min / max heaps per sector and
+# applies deltas as documents come and go, so a read costs O(#sectors):
+#
+#     aggregates = SectorAggregates.build(db["market_data"])      # one full scan
+#     db = MaterializedDatabase(db, aggregates)                     # writes keep it in sync
+#     db["market_data"].insert_one({...})
+#     db["market_data"].aggregate([{"$group": {"_id": "$sector", "avg_price": {"$avg": "$price"}}}])
+#     # ↑ answered from the running totals, no collection scan
+#     aggregates.verify(raw_db["market_data"])                       # full recompute check
+#
+# Deltas arrive either through MaterializedCollection (insert_one / insert_many /
+# update_one / update_many / delete_one / delete_many re-read the touched
+# documents around the write; writes touching most of the collection, like
+# #14's $rename, trigger a vectorized rebuild instead) or from a change stream
+# via follow_changes(), which needs pre- and post-images (MongoDB 6.0+,
+# changeStreamPreAndPostImages) so every event carries the document as it was
+# before and after that event.  Only numeric values count, as $avg / $sum /
+# $min / $max ignore everything else; $min / $max here cover numbers only.
+
+DEFAULT_FIELDS = ("price", "volume", "VaR", "return", "sentiment_score", "default_flag")
+DEFAULT_SLICES = {"non_default": {"default_flag": 0}}  # example #36 filters before grouping
+REBUILD_FRACTION = 0.25  # writes touching more of the collection than this recompute instead of diffing
+
+SUPPORTED_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$stdDevPop", "$stdDevSamp", "$count"}
+
+
+def _number(value):
+    kind = type(value)
+    return kind is int or (kind is float and value == value) or (
+        isinstance(value, (int, float)) and not isinstance(value, bool) and value == value)
+
+
+def _lookup(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+class _Heap:
+    """Min-heap with lazy deletion (store negated values for a max-heap); compacted once half of it is deleted."""
+
+    def __init__(self, sign):
+        self.sign = sign
+        self.items = []
+        self.deleted = Counter()
+        self.pending = 0  # lazily deleted items still in the heap
+
+    def push(self, value):
+        heapq.heappush(self.items, self.sign * value)
+
+    def remove(self, value):
+        self.deleted[self.sign * value] += 1
+        self.pending += 1
+        if self.pending > len(self.items) // 2:
+            self._compact()
+
+    def _compact(self):
+        kept = []
+        for item in self.items:
+            if self.deleted[item]:  # a Counter lookup doesn't insert missing keys
+                self.deleted[item] -= 1
+            else:
+                kept.append(item)
+        heapq.heapify(kept)
+        self.items, self.deleted, self.pending = kept, Counter(), 0
+
+    def top(self):
+        while self.items and self.deleted[self.items[0]]:
+            item = heapq.heappop(self.items)
+            self.deleted[item] -= 1
+            if not self.deleted[item]:
+                del self.deleted[item]
+            self.pending -= 1
+        return self.sign * self.items[0] if self.items else None
+
+
+class _FieldStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0.0
+        self.low = _Heap(1)
+        self.high = _Heap(-1)
+
+    def add(self, value, sign):
+        self.count += sign
+        self.total += sign * value
+        self.squares += sign * float(value) * float(value)
+        if sign > 0:
+            self.low.push(value)
+            self.high.push(value)
+        else:
+            self.low.remove(value)
+            self.high.remove(value)
+
+    def result(self, op):
+        if op == "$sum":
+            return self.total
+        if not self.count:
+            return None
+        if op == "$avg":
+            return self.total / self.count
+        if op == "$min":
+            return self.low.top()
+        if op == "$max":
+            return self.high.top()
+        mean = self.total / self.count
+        variance = max(self.squares / self.count - mean * mean, 0.0)
+        if op == "$stdDevPop":
+            return math.sqrt(variance)
+        if self.count < 2:
+            return None
+        return math.sqrt(variance * self.count / (self.count - 1))
+
+
+class SectorAggregates:
+    """
+    Running per-group statistics for market_data:
+    - group_field: grouping key ("sector"); documents without it fall in the null group
+    - fields: numeric fields to track
+    - slices: named equality filters with their own statistics ({"non_default": {"default_flag": 0}})
+    """
+
+    def __init__(self, group_field="sector", fields=DEFAULT_FIELDS, slices=DEFAULT_SLICES):
+        self.group_field = group_field
+        self.fields = tuple(fields)
+        self.slices = dict(slices)
+        self.reset()
+
+    def reset(self):
+        # stats[slice][group] = (document count, {field: _FieldStats}); slice None = every document
+        self.stats = {name: {} for name in [None, *self.slices]}
+
+    @property
+    def projection(self):
+        names = {self.group_field, *self.fields}
+        for query in self.slices.values():
+            names.update(query)
+        return {name: 1 for name in names}
+
+    def _apply(self, doc, sign):
+        group = _lookup(doc, self.group_field)
+        for name, per_group in self.stats.items():
+            if name is not None and any(_lookup(doc, k) != v for k, v in self.slices[name].items()):
+                continue
+            count, fields = per_group.get(group, (0, None))
+            if fields is None:
+                fields = {f: _FieldStats() for f in self.fields}
+            for field in self.fields:
+                value = _lookup(doc, field)
+                if _number(value):
+                    fields[field].add(value, sign)
+            count += sign
+            if count:
+                per_group[group] = (count, fields)
+            else:
+                per_group.pop(group, None)
+
+    @property
+    def documents(self):
+        return sum(count for count, _ in self.stats[None].values())
+
+    def add(self, doc):
+        self._apply(doc, 1)
+
+    def remove(self, doc):
+        self._apply(doc, -1)
+
+    @classmethod
+    def build(cls, collection, **kwargs):
+        """Fill from one projected scan of the collection."""
+        return cls(**kwargs).rebuild(collection)
+
+    def rebuild(self, collection):
+        """Recompute everything from a projected scan, vectorized per group with pandas."""
+        frame = find_frame(collection, {}, self.projection)
+        self.reset()
+        if frame.empty:
+            return self
+        keys = frame[self.group_field].astype(object) if self.group_field in frame else \
+            pd.Series([None] * len(frame), dtype=object)
+        keys = keys.where(keys.notna(), None)
+        numeric = {}  # field → (float values with NaN for non-numbers, column holds ints)
+        for field in self.fields:
+            if field not in frame:
+                continue
+            column = frame[field]
+            if column.dtype.kind in "iuf":
+                numeric[field] = (column.astype(float), column.dtype.kind in "iu")
+            else:
+                numeric[field] = (column.where(column.map(_number).astype(bool)).astype(float), False)
+        for name in self.stats:
+            rows = np.ones(len(frame), bool)
+            for field, value in (self.slices[name].items() if name is not None else ()):
+                rows &= (frame[field] == value).to_numpy() if field in frame else False
+            for key, index in keys[rows].groupby(keys[rows], dropna=False, sort=False).groups.items():
+                fields = {f: _FieldStats() for f in self.fields}
+                for field, (column, ints) in numeric.items():
+                    values = column.loc[index].dropna().to_numpy()
+                    if not len(values):
+                        continue
+                    stats = fields[field]
+                    items = values.astype(np.int64).tolist() if ints else values.tolist()
+                    stats.count = len(items)
+                    stats.total = sum(items)
+                    stats.squares = float(np.square(values).sum())
+                    stats.low.items = items
+                    stats.high.items = [-v for v in items]
+                    heapq.heapify(stats.low.items)
+                    heapq.heapify(stats.high.items)
+                self.stats[name][None if key is None or key != key else key] = (len(index), fields)
+        return self
+
+    # ---------------- reads: O(#groups) ----------------
+
+    def _slice_for(self, query):
+        if not query:
+            return None, True
+        for name, filter in self.slices.items():
+            if filter == query:
+                return name, True
+        return None, False
+
+    def answer(self, pipeline):
+        """
+        Result of a [$match <slice>]? + $group-by-group_field pipeline, or None when it can't be served:
+        - accumulators: $sum / $avg / $min / $max / $stdDevPop / $stdDevSamp / $count over tracked fields
+        """
+        stages = list(pipeline)
+        query = {}
+        if len(stages) == 2 and list(stages[0]) == ["$match"]:
+            query = stages.pop(0)["$match"]
+        if len(stages) != 1 or list(stages[0]) != ["$group"]:
+            return None
+        group = stages[0]["$group"]
+        name, ok = self._slice_for(query)
+        if not ok or group.get("_id") != "$" + self.group_field:
+            return None
+
+        outputs = []
+        for out, spec in group.items():
+            if out == "_id":
+                continue
+            (op, arg), = spec.items()
+            if op not in SUPPORTED_ACCUMULATORS:
+                return None
+            if op == "$count" or (op == "$sum" and _number(arg)):
+                outputs.append((out, "count", arg if op == "$sum" else 1))
+            elif isinstance(arg, str) and arg[1:] in self.fields:
+                outputs.append((out, op, arg[1:]))
+            else:
+                return None
+
+        rows = []
+        for key, (count, fields) in self.stats[name].items():
+            row = {"_id": key}
+            for out, op, arg in outputs:
+                row[out] = count * arg if op == "count" else fields[arg].result(op)
+            rows.append(row)
+        return rows
+
+    def verify(self, collection, pipelines=None, rel_tol=1e-6):
+        """
+        Full recompute check: run each pipeline on the collection and compare with answer().
+        Returns a list of mismatch descriptions (empty when everything agrees).
+        """
+        problems = []
+        for pipeline in pipelines or served_example_pipelines(self):
+            expected = {d["_id"]: d for d in collection.aggregate(pipeline)}
+            got = {d["_id"]: d for d in self.answer(pipeline)}
+            if expected.keys() != got.keys():
+                problems.append(f"{pipeline}: groups {sorted(map(str, expected))} vs {sorted(map(str, got))}")
+                continue
+            for key, doc in expected.items():
+                for field, value in doc.items():
+                    mine = got[key].get(field)
+                    if _number(value) and _number(mine):
+                        if not math.isclose(value, mine, rel_tol=rel_tol, abs_tol=1e-12):
+                            problems.append(f"{pipeline}: {key}.{field} {value} vs {mine}")
+                    elif value != mine:
+                        problems.append(f"{pipeline}: {key}.{field} {value!r} vs {mine!r}")
+        return problems
+
+
+def served_example_pipelines(aggregates):
+    """The mongo_query_examples pipelines the aggregates can answer (#21, #22, #24, #25, #32, #36, #60, #61, ...)."""
+    from mongo_query_capture import capture_examples
+
+    return [call.pipeline for call in capture_examples(mongo_query_examples)
+            if call.method == "aggregate" and aggregates.answer(call.pipeline) is not None]
+
+
+# ============================================================
+# 🔁 KEEPING IT IN SYNC: collection wrapper or change stream
+# ============================================================
+
+class MaterializedCollection:
+    """Collection wrapper that feeds every write into SectorAggregates and serves matching pipelines."""
+
+    def __init__(self, collection, aggregates):
+        self._collection = collection
+        self.aggregates = aggregates
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _touched(self, ids):
+        return list(self._collection.find({"_id": {"$in": ids}}, self.aggregates.projection)) if ids else []
+
+    def insert_one(self, document):
+        result = self._collection.insert_one(document)
+        self.aggregates.add(document)
+        return result
+
+    def insert_many(self, documents, ordered=True):
+        documents = list(documents)
+        result = self._collection.insert_many(documents, ordered=ordered)
+        for doc in documents:
+            self.aggregates.add(doc)
+        return result
+
+    def _update(self, filter, update, upsert, many):
+        cursor = self._collection.find(filter, self.aggregates.projection)
+        before = list(cursor if many else cursor.limit(1))
+        method = self._collection.update_many if many else self._collection.update_one
+        if len(before) > REBUILD_FRACTION * self.aggregates.documents:  # e.g. #14/#15 touch every document
+            result = method(filter, update, upsert=upsert)
+            self.aggregates.rebuild(self._collection)
+            return result
+        if before:
+            # pin the exact documents we read so a concurrent insert can't slip in between
+            filter = {"_id": {"$in": [d["_id"] for d in before]}} if many else {"_id": before[0]["_id"]}
+        result = method(filter, update, upsert=upsert)
+        ids = [d["_id"] for d in before]
+        if getattr(result, "upserted_id", None) is not None:
+            ids.append(result.upserted_id)
+        for doc in before:
+            self.aggregates.remove(doc)
+        for doc in self._touched(ids):
+            self.aggregates.add(doc)
+        return result
+
+    def update_one(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter, update, upsert=False):
+        return self._update(filter, update, upsert, many=True)
+
+    def _delete(self, filter, many):
+        cursor = self._collection.find(filter, self.aggregates.projection)
+        before = list(cursor if many else cursor.limit(1))
+        if not before:
+            return self._collection.delete_many({"_id": {"$in": []}})
+        if len(before) > REBUILD_FRACTION * self.aggregates.documents:
+            result = self._collection.delete_many(filter)
+            self.aggregates.rebuild(self._collection)
+            return result
+        result = self._collection.delete_many({"_id": {"$in": [d["_id"] for d in before]}})
+        for doc in before:
+            self.aggregates.remove(doc)
+        return result
+
+    def delete_one(self, filter):
+        return self._delete(filter, many=False)
+
+    def delete_many(self, filter):
+        return self._delete(filter, many=True)
+
+    def aggregate(self, pipeline, **kwargs):
+        rows = self.aggregates.answer(pipeline)
+        if rows is not None:
+            return iter(rows)
+        return self._collection.aggregate(pipeline, **kwargs)
+
+
+class MaterializedDatabase:
+    """db wrapper: db[collection_name] is wrapped, every other collection passes through."""
+
+    def __init__(self, database, aggregates, collection_name="market_data"):
+        self._database = database
+        self.aggregates = aggregates
+        self.collection_name = collection_name
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        collection = self._database[name]
+        return MaterializedCollection(collection, self.aggregates) if name == self.collection_name else collection
+
+    def get_collection(self, name):
+        return self[name]
+
+
+def apply_change(aggregates, event):
+    """
+    Apply one change-stream event; returns False when an image it needs is missing and a rebuild is needed:
+    - watch with full_document="whenAvailable", full_document_before_change="whenAvailable" so both images
+      belong to the event (updateLookup returns the document as it is now, not as this event left it)
+    - insert needs the post-image, delete the pre-image, update / replace both
+    """
+    operation = event["operationType"]
+    before = event.get("fullDocumentBeforeChange")
+    after = event.get("fullDocument")
+    if operation not in ("insert", "update", "replace", "delete"):
+        return False
+    if (operation != "insert" and before is None) or (operation != "delete" and after is None):
+        return False
+    if before is not None and operation != "insert":
+        aggregates.remove(before)
+    if after is not None and operation != "delete":
+        aggregates.add(after)
+    return True
+
+
+def follow_changes(collection, aggregates, max_events=None):
+    """Tail collection.watch() into the aggregates; rebuilds from a full scan if an event can't be applied."""
+    seen = 0
+    with collection.watch(full_document="whenAvailable", full_document_before_change="whenAvailable") as stream:
+        for event in stream:
+            if event["operationType"] in ("drop", "rename", "dropDatabase", "invalidate"):
+                break
+            if not apply_change(aggregates, event):
+                aggregates.rebuild(collection)
+            seen += 1
+            if max_events is not None and seen >= max_events:
+                break
+    return seen
+
+
+if __name__ == "__main__":
+    import time
+
+    from mongo_benchmark import connect, seed_market_data
+
+    raw = connect("columnar")
+    collection = seed_market_data(raw, 200_000)
+    start = time.perf_counter()
+    aggregates = SectorAggregates.build(collection)
+    print(f"🏗️  built from {collection.count_documents({}):,} docs in {time.perf_counter() - start:.2f}s")
+
+    db = MaterializedDatabase(raw, aggregates)
+    examples = mongo_query_examples(db)
+    for number in (1, 2, 12, 13, 15):  # writes keep the aggregates in sync
+        examples[number - 1]()
+    db["market_data"].delete_one({"sector": "Energy"})
+    db["market_data"].update_many({"sector": "Auto"}, {"$inc": {"volume": 10}})
+    examples[13]()  # #14 renames price → last_price everywhere
+
+    for pipeline in served_example_pipelines(aggregates):
+        start = time.perf_counter()
+        list(collection.aggregate(pipeline))
+        scan_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        aggregates.answer(pipeline)
+        read_ms = (time.perf_counter() - start) * 1000
+        print(f"   {str(pipeline)[:70]:<72} scan {scan_ms:>7.2f} ms  materialized {read_ms:>6.3f} ms")
+    problems = aggregates.verify(collection)
+    print("✅ matches a full recompute" if not problems else "❌ " + "\n❌ ".join(problems))
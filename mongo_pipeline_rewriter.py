@@ -0,0 +1,565 @@
+import copy
+import logging
+import re
+import time
+
+log = logging.getLogger("mongo_pipeline_rewriter")
+
+
+# ============================================================
+# 🔧 AGGREGATION PIPELINE REWRITE PASS
+# ============================================================
+#
+# Rewrites a pipeline into a cheaper equivalent before it reaches
+# collection.aggregate, logging every rule that fires:
+#
+#     pipeline, fired = rewrite_pipeline(pipeline, collection="market_data")
+#
+#     db = RewritingDatabase(client["market"])      # or a ColumnarDatabase
+#     examples = mongo_query_examples(db)            # every aggregate() is rewritten
+#
+# Rules (each one only fires when the result is provably the same, except
+# median_from_avg, which fixes a mislabelled average on purpose):
+# - merge_adjacent        $match+$match, $sort+$sort, $limit+$limit, $skip+$skip, $set+$set, $unset+$unset
+# - match_earlier         $match hops over $sort / $project / $set / $unset / simple $group it does not depend on
+# - lookup_totals_window  $group → self-$lookup → $unwind → $addFields → $replaceRoot  ⇒  $setWindowFields
+# - push_slice_topn       $sort → $group {$push} → {$slice: [.., n]}  ⇒  $topN / $bottomN
+#                         (only when a $match guarantees the pushed field exists)
+# - median_from_avg       {"median_x": {"$avg": ..}}  ⇒  $median  (only outputs named median_*)
+# - drop_sort_before_group  $sort feeding a $group whose accumulators ignore order
+# - inline_into_group     $project / $set feeding a $group is folded into the group expressions
+# - fold_project_into_group  a $project that only keeps / renames $group outputs
+#
+# server_version gates rules on operators the target may lack
+# ($setWindowFields 5.0, $topN 5.2, $median / $percentile 7.0).
+
+ORDER_FREE_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$count", "$stdDevPop", "$stdDevSamp", "$addToSet",
+                           "$median", "$percentile", "$top", "$bottom", "$topN", "$bottomN", "$minN", "$maxN"}
+WINDOW_ACCUMULATORS = {"$sum", "$avg", "$min", "$max", "$count", "$stdDevPop", "$stdDevSamp", "$push",
+                       "$addToSet", "$first", "$last", "$median", "$percentile"}
+LOGICAL_OPS = ("$and", "$or", "$nor")
+
+_MEDIAN_NAME = re.compile(r"^median_", re.IGNORECASE)
+_NULL_SENSITIVE_OPS = {"$exists", "$type"}
+
+
+def _stage(stage):
+    (name, spec), = stage.items()
+    return name, spec
+
+
+def _field_refs(expr):
+    """Root field names an expression reads; None when it reads the whole document ($$ROOT / $$CURRENT)."""
+    roots = set()
+    stack = [expr]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            if item.startswith("$$"):
+                if item.split(".")[0] in ("$$ROOT", "$$CURRENT"):
+                    return None
+            elif item.startswith("$"):
+                roots.add(item[1:].split(".")[0])
+        elif isinstance(item, dict):
+            if "$literal" in item:
+                continue
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return roots
+
+
+def _filter_fields(query):
+    """Root field names a $match filter reads; None when it can't be analysed ($where, $text, ...)."""
+    roots = set()
+    for key, value in query.items():
+        if key in LOGICAL_OPS:
+            for part in value:
+                inner = _filter_fields(part)
+                if inner is None:
+                    return None
+                roots |= inner
+        elif key == "$expr":
+            inner = _field_refs(value)
+            if inner is None:
+                return None
+            roots |= inner
+        elif key.startswith("$"):
+            return None
+        else:
+            roots.add(key.split(".")[0])
+    return roots
+
+
+def _projection_flag(value):
+    if isinstance(value, bool) or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+        return bool(value)
+    return None
+
+
+def _and(a, b):
+    if not (a.keys() & b.keys()):
+        return {**a, **b}
+    parts = a["$and"] if list(a) == ["$and"] else [a]
+    return {"$and": parts + [b]}
+
+
+def _substitute(expr, replacements):
+    """Replace exact "$field" references with expressions."""
+    if isinstance(expr, str) and expr.startswith("$") and not expr.startswith("$$"):
+        return copy.deepcopy(replacements.get(expr[1:], expr))
+    if isinstance(expr, dict):
+        if "$literal" in expr:
+            return expr
+        return {k: _substitute(v, replacements) for k, v in expr.items()}
+    if isinstance(expr, list):
+        return [_substitute(v, replacements) for v in expr]
+    return expr
+
+
+def _null_sensitive(query):
+    """True when a filter tells a null value from a missing field ($exists, $type) or mentions null at all."""
+    stack = [query]
+    while stack:
+        item = stack.pop()
+        if item is None:
+            return True
+        if isinstance(item, dict):
+            if item.keys() & _NULL_SENSITIVE_OPS:
+                return True
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return False
+
+
+def _requires_field(query, field):
+    """True when every document matching `query` has `field` (null counts as present)."""
+    if not isinstance(query, dict):
+        return False
+    for key, cond in query.items():
+        if key == "$and" and any(_requires_field(q, field) for q in cond):
+            return True
+        if key == "$or" and cond and all(_requires_field(q, field) for q in cond):
+            return True
+        if key != field:
+            continue
+        if not (isinstance(cond, dict) and any(str(k).startswith("$") for k in cond)):
+            if cond is not None:  # equality with a value that a missing field can't match
+                return True
+            continue
+        for op, operand in cond.items():
+            if op == "$exists" and operand:
+                return True
+            if op == "$type":
+                return True
+            if op in ("$eq", "$gt", "$gte", "$lt", "$lte") and operand is not None:
+                return True
+            if op == "$in" and operand and None not in operand:
+                return True
+    return False
+
+
+def _always_present(pipeline, end, output):
+    """
+    True when `output` evaluates to a value for every document reaching pipeline[end]:
+    - an object literal always does; a "$field" path only when an earlier $match requires the field,
+      with nothing but $match / $sort / $limit / $skip in between
+    """
+    if isinstance(output, dict):
+        return bool(output) and not any(str(k).startswith("$") for k in output)
+    if not (isinstance(output, str) and output.startswith("$") and not output.startswith("$$")):
+        return False
+    for stage in reversed(pipeline[:end]):
+        name, spec = _stage(stage)
+        if name == "$match" and _requires_field(spec, output[1:]):
+            return True
+        if name not in ("$match", "$sort", "$limit", "$skip"):
+            return False
+    return False
+
+
+def _rename_id(query, field):
+    """Rewrite a filter on a $group _id into the same filter on the source field."""
+    out = {}
+    for key, value in query.items():
+        if key in LOGICAL_OPS:
+            out[key] = [_rename_id(part, field) for part in value]
+        else:
+            out[field if key == "_id" else key] = value
+    return out
+
+
+# ============================================================
+# 🧩 RULES — each returns (new pipeline, stage index, detail) or None
+# ============================================================
+
+def merge_adjacent(pipeline, context):
+    for i in range(len(pipeline) - 1):
+        (a, first), (b, second) = _stage(pipeline[i]), _stage(pipeline[i + 1])
+        if a != b and {a, b} != {"$set", "$addFields"}:
+            continue
+        merged = None
+        if a == "$match":
+            merged = {"$match": _and(first, second)}
+        elif a == "$sort":
+            merged = {"$sort": {**second, **{k: v for k, v in first.items() if k not in second}}}
+        elif a == "$limit":
+            merged = {"$limit": min(first, second)}
+        elif a == "$skip":
+            merged = {"$skip": first + second}
+        elif a == "$unset":
+            fields = ([first] if isinstance(first, str) else list(first))
+            fields += [f for f in ([second] if isinstance(second, str) else second) if f not in fields]
+            merged = {"$unset": fields}
+        elif a in ("$set", "$addFields"):
+            reads = _field_refs(list(second.values()))
+            written = {k.split(".")[0] for k in first}
+            if reads is None or reads & written or written & {k.split(".")[0] for k in second}:
+                continue
+            merged = {a: {**first, **second}}
+        if merged is not None:
+            return pipeline[:i] + [merged] + pipeline[i + 2:], i, f"{a} + {b}"
+    return None
+
+
+def match_earlier(pipeline, context):
+    for i in range(1, len(pipeline)):
+        name, query = _stage(pipeline[i])
+        if name != "$match":
+            continue
+        fields = _filter_fields(query)
+        if fields is None:
+            continue
+        before, spec = _stage(pipeline[i - 1])
+        moved = None
+        if before == "$sort":
+            moved = query
+        elif before in ("$set", "$addFields"):
+            if not fields & {k.split(".")[0] for k in spec}:
+                moved = query
+        elif before == "$unset":
+            if not fields & {f.split(".")[0] for f in ([spec] if isinstance(spec, str) else spec)}:
+                moved = query
+        elif before == "$project":
+            flags = {k: _projection_flag(v) for k, v in spec.items()}
+            exclusion = any(f is False for k, f in flags.items() if k != "_id")
+            if exclusion:
+                ok = not fields & {k.split(".")[0] for k, f in flags.items() if f is False}
+            else:
+                kept = {k for k, f in flags.items() if f is True or spec[k] == "$" + k}
+                if flags.get("_id") is not False and "_id" not in spec:
+                    kept.add("_id")
+                ok = fields <= kept and not any("." in k for k in spec)
+            if ok:
+                moved = query
+        elif before == "$group":
+            group_id = spec["_id"]
+            simple = isinstance(group_id, str) and group_id.startswith("$") and not group_id.startswith("$$")
+            # the null group also collects documents missing the field, so only null-blind filters can move
+            if simple and fields == {"_id"} and "$expr" not in repr(query) and not _null_sensitive(query):
+                moved = _rename_id(query, group_id[1:])
+        if moved is not None:
+            return pipeline[:i - 1] + [{"$match": moved}, pipeline[i - 1]] + pipeline[i + 1:], i, f"$match before {before}"
+    return None
+
+
+def lookup_totals_window(pipeline, context):
+    """
+    pipeline2.txt pattern: totals computed by $group, then re-attached to every
+    document by looking the collection up again — one $setWindowFields does it in a single pass.
+    """
+    if len(pipeline) < 5:
+        return None
+    names = [_stage(s)[0] for s in pipeline[:5]]
+    if names[0] != "$group" or names[1] != "$lookup" or names[2] != "$unwind" \
+            or names[3] not in ("$addFields", "$set") or names[4] not in ("$replaceRoot", "$replaceWith"):
+        return None
+    group, lookup, unwind, add, replace = (_stage(s)[1] for s in pipeline[:5])
+    if lookup.get("from") != context.get("collection") or "let" in lookup:
+        return None
+    if "pipeline" in lookup:
+        if lookup["pipeline"] or "localField" in lookup or group["_id"] is not None:
+            return None
+        partition = None
+    else:
+        group_id = group["_id"]
+        if lookup.get("localField") != "_id" or group_id != "$" + lookup.get("foreignField", ""):
+            return None
+        partition = group_id
+    alias = lookup["as"]
+    if isinstance(unwind, dict):
+        if set(unwind) != {"path"}:
+            return None
+        unwind = unwind["path"]
+    root = replace.get("newRoot") if names[4] == "$replaceRoot" else replace
+    if unwind != "$" + alias or root != "$" + alias:
+        return None
+
+    output = {}
+    for key, value in add.items():
+        if not key.startswith(alias + ".") or "." in key[len(alias) + 1:]:
+            return None
+        if not (isinstance(value, str) and value.startswith("$") and value[1:] in group and value != "$_id"):
+            return None
+        (op, arg), = group[value[1:]].items()
+        if op not in WINDOW_ACCUMULATORS:
+            return None
+        output[key[len(alias) + 1:]] = {op: arg}
+
+    window = {"partitionBy": partition, "output": output} if partition else {"output": output}
+    return [{"$setWindowFields": window}] + pipeline[5:], 0, "self-$lookup totals → $setWindowFields"
+
+
+def push_slice_topn(pipeline, context):
+    for i in range(1, len(pipeline) - 1):
+        (before, sort), (name, group), (after, spec) = (_stage(s) for s in pipeline[i - 1:i + 2])
+        if before != "$sort" or name != "$group" or after not in ("$project", "$set", "$addFields"):
+            continue
+        if after == "$project" and any(_projection_flag(v) is False for k, v in spec.items() if k != "_id"):
+            continue  # an exclusion $project passes the full $push array through
+        for acc, expr in group.items():
+            if acc == "_id" or list(expr) != ["$push"]:
+                continue
+            uses = [k for k, v in spec.items() if _field_refs(v) is None or acc in _field_refs(v)]
+            if len(uses) != 1:
+                continue
+            # the full array must not survive: $set / $addFields keep `acc` unless the slice overwrites it,
+            # an inclusion $project keeps it only when it is listed
+            if uses[0] != acc and (after != "$project" or acc in spec):
+                continue
+            target = spec[uses[0]]
+            sliced = target.get("$slice") if isinstance(target, dict) and len(target) == 1 else None
+            if not (isinstance(sliced, list) and len(sliced) == 2 and sliced[0] == "$" + acc
+                    and isinstance(sliced[1], int) and sliced[1]):
+                continue
+            if not _always_present(pipeline, i - 1, expr["$push"]):
+                continue  # $push skips a missing value where $topN / $bottomN would emit null
+            n = sliced[1]
+            op = "$topN" if n > 0 else "$bottomN"
+            new_group = dict(group)
+            new_group[acc] = {op: {"n": abs(n), "sortBy": dict(sort), "output": expr["$push"]}}
+            new_spec = dict(spec)
+            new_spec[uses[0]] = "$" + acc
+            rewritten = pipeline[:i] + [{"$group": new_group}, {after: new_spec}] + pipeline[i + 2:]
+            return rewritten, i, f"$push + $slice {n} → {op}"
+    return None
+
+
+def median_from_avg(pipeline, context):
+    for i, stage in enumerate(pipeline):
+        name, group = _stage(stage)
+        if name != "$group":
+            continue
+        for acc, expr in group.items():
+            if acc == "_id" or list(expr) != ["$avg"]:
+                continue
+            if _MEDIAN_NAME.search(acc):
+                new_group = dict(group)
+                new_group[acc] = {"$median": {"input": expr["$avg"], "method": "approximate"}}
+                return pipeline[:i] + [{"$group": new_group}] + pipeline[i + 1:], i, f"{acc}: $avg → $median"
+    return None
+
+
+def drop_sort_before_group(pipeline, context):
+    for i in range(len(pipeline) - 1):
+        (a, _), (b, group) = _stage(pipeline[i]), _stage(pipeline[i + 1])
+        if a == "$sort" and b == "$group":
+            ops = {next(iter(v)) for k, v in group.items() if k != "_id"}
+            if ops <= ORDER_FREE_ACCUMULATORS:
+                return pipeline[:i] + pipeline[i + 1:], i, "$sort unused by $group"
+    return None
+
+
+def inline_into_group(pipeline, context):
+    """#38 / #44: a $project that only feeds the next $group is evaluated inside the group instead."""
+    for i in range(len(pipeline) - 1):
+        (a, spec), (b, group) = _stage(pipeline[i]), _stage(pipeline[i + 1])
+        if b != "$group" or a not in ("$project", "$set", "$addFields") or any("." in k for k in spec):
+            continue
+        reads = _field_refs(list(group.values()))
+        if reads is None:
+            continue
+        if a == "$project":
+            flags = {k: _projection_flag(v) for k, v in spec.items()}
+            if any(f is False for k, f in flags.items() if k != "_id"):
+                continue
+            visible = {k for k in spec if flags[k] is not False}
+            if flags.get("_id") is not False:
+                visible.add("_id")
+            if not reads <= visible:
+                continue
+        # in $set / $addFields every value is computed, even a literal 1 or True
+        computed = {k: v for k, v in spec.items() if a != "$project" or _projection_flag(v) is None}
+        if any(f"${k}." in repr(group) for k in computed):
+            continue
+        if _field_refs(list(computed.values())) is None:
+            continue
+        new_group = {k: _substitute(v, computed) for k, v in group.items()}
+        return pipeline[:i] + [{"$group": new_group}] + pipeline[i + 2:], i, f"{a} folded into $group"
+    return None
+
+
+def fold_project_into_group(pipeline, context):
+    for i in range(len(pipeline) - 1):
+        (a, group), (b, spec) = _stage(pipeline[i]), _stage(pipeline[i + 1])
+        if a != "$group" or b != "$project" or _projection_flag(spec.get("_id", True)) is not True:
+            continue
+        new_group = {"_id": group["_id"]}
+        for key, value in spec.items():
+            if key == "_id":
+                continue
+            if _projection_flag(value) is True and key in group:
+                new_group[key] = group[key]
+            elif isinstance(value, str) and value[1:] in group and value not in ("$_id",) \
+                    and value.startswith("$") and not value.startswith("$$"):
+                new_group[key] = group[value[1:]]
+            else:
+                new_group = None
+                break
+        if new_group is not None:
+            return pipeline[:i] + [{"$group": new_group}] + pipeline[i + 2:], i, "$project kept/renamed $group outputs"
+    return None
+
+
+RULES = [
+    ("merge_adjacent", None, merge_adjacent),
+    ("match_earlier", None, match_earlier),
+    ("lookup_totals_window", (5, 0), lookup_totals_window),
+    ("push_slice_topn", (5, 2), push_slice_topn),
+    ("median_from_avg", (7, 0), median_from_avg),
+    ("drop_sort_before_group", None, drop_sort_before_group),
+    ("inline_into_group", None, inline_into_group),
+    ("fold_project_into_group", None, fold_project_into_group),
+]
+
+
+def rewrite_pipeline(pipeline, collection=None, server_version=None, rules=None, max_passes=50):
+    """
+    Apply the rewrite rules until none fires:
+    - collection: name of the collection the pipeline runs on (needed for self-$lookup rules)
+    - server_version: e.g. (6, 0) to skip rules that emit newer operators
+    - rules: optional subset of rule names
+    Returns (new pipeline, list of (rule, stage index, detail)); the input is not modified.
+    """
+    context = {"collection": collection}
+    active = [(name, fn) for name, min_version, fn in RULES
+              if (rules is None or name in rules)
+              and (server_version is None or min_version is None or tuple(server_version) >= min_version)]
+    pipeline = copy.deepcopy(list(pipeline))
+    fired = []
+    for _ in range(max_passes):
+        for name, fn in active:
+            result = fn(pipeline, context)
+            if result is not None:
+                pipeline, index, detail = result
+                fired.append((name, index, detail))
+                log.info("%s fired at stage %d on %s: %s", name, index, collection or "?", detail)
+                break
+        else:
+            break
+    return pipeline, fired
+
+
+class RewritingCollection:
+    """Wraps a pymongo-style collection; aggregate() runs the rewrite pass first."""
+
+    def __init__(self, collection, database):
+        self._collection = collection
+        self._database = database
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def aggregate(self, pipeline, **kwargs):
+        rewritten, fired = rewrite_pipeline(pipeline, collection=self._collection.name,
+                                            server_version=self._database.server_version)
+        for name, _, _ in fired:
+            self._database.fired[name] = self._database.fired.get(name, 0) + 1
+        return self._collection.aggregate(rewritten, **kwargs)
+
+
+class RewritingDatabase:
+    """Database wrapper whose collections rewrite every pipeline; `fired` counts rules by name."""
+
+    def __init__(self, database, server_version=None):
+        self._database = database
+        self.server_version = server_version
+        self.fired = {}
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        return RewritingCollection(self._database[name], self)
+
+    def get_collection(self, name):
+        return self[name]
+
+
+# ============================================================
+# 🧪 DEMO: rewrite the examples + pipeline2.txt, check results still match
+# ============================================================
+
+# pipeline2.txt's "attach totals back to each doc" pattern, pointed at market_data
+TOTALS_VIA_LOOKUP = [
+    {"$group": {"_id": None, "total_volume": {"$sum": "$volume"}, "avg_VaR": {"$avg": "$VaR"}}},
+    {"$lookup": {"from": "market_data", "pipeline": [], "as": "docs"}},
+    {"$unwind": "$docs"},
+    {"$addFields": {"docs.total_volume": "$total_volume", "docs.avg_VaR": "$avg_VaR"}},
+    {"$replaceRoot": {"newRoot": "$docs"}},
+]
+SECTOR_AVG_VIA_LOOKUP = [
+    {"$group": {"_id": "$sector", "avg_price": {"$avg": "$price"}}},
+    {"$lookup": {"from": "market_data", "localField": "_id", "foreignField": "sector", "as": "docs"}},
+    {"$unwind": "$docs"},
+    {"$addFields": {"docs.avg_price_for_sector": "$avg_price"}},
+    {"$replaceRoot": {"newRoot": "$docs"}},
+]
+
+
+def _normalized(documents):
+    def clean(value):
+        if isinstance(value, float):
+            return round(value, 9)
+        if isinstance(value, dict):
+            return {k: clean(v) for k, v in sorted(value.items())}
+        if isinstance(value, list):
+            return [clean(v) for v in value]
+        return value
+    return sorted(repr(clean(d)) for d in documents)
+
+
+def compare_rewrites(db, pipelines, collection="market_data"):
+    """Run each (label, pipeline) before and after rewriting; report rules, timings and whether results match."""
+    rows = []
+    for label, pipeline in pipelines:
+        rewritten, fired = rewrite_pipeline(pipeline, collection=collection)
+        if not fired:
+            continue
+        start = time.perf_counter()
+        before = list(db[collection].aggregate(pipeline))
+        middle = time.perf_counter()
+        after = list(db[collection].aggregate(rewritten))
+        end = time.perf_counter()
+        intended = any(name == "median_from_avg" for name, _, _ in fired)
+        rows.append({"label": label, "rules": [name for name, _, _ in fired], "pipeline": rewritten,
+                     "before_ms": (middle - start) * 1000, "after_ms": (end - middle) * 1000,
+                     "same": _normalized(before) == _normalized(after), "intended_change": intended})
+    return rows
+
+
+if __name__ == "__main__":
+    from mongo_benchmark import connect, seed_market_data
+    from mongo_query_capture import capture_examples
+
+    logging.basicConfig(level=logging.INFO, format="🔧 %(message)s")
+    db = connect("columnar")
+    seed_market_data(db, 20_000)
+
+    pipelines = [(f"#{c.example}", c.pipeline) for c in capture_examples() if c.method == "aggregate"]
+    pipelines += [("pipeline2 totals", TOTALS_VIA_LOOKUP), ("pipeline2 per-sector", SECTOR_AVG_VIA_LOOKUP)]
+    for row in compare_rewrites(db, pipelines):
+        status = "✅ same" if row["same"] else ("📝 changed (intended)" if row["intended_change"] else "❌ DIFFERENT")
+        print(f"{row['label']:<22} {row['before_ms']:>9.1f} → {row['after_ms']:>8.1f} ms  {status}  {row['rules']}")
+        print(f"{'':<22} {row['pipeline']}")
@@ -0,0 +1,498 @@
+import argparse
+import hashlib
+import json
+import pickle
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from data_prep_and_mongo_utils import WRITE_EXAMPLES, mongo_query_examples
+
+
+# ============================================================
+# 🗃️ QUERY RESULT CACHE WITH WRITE-AWARE INVALIDATION
+# ============================================================
+#
+# The read examples are deterministic for a given collection state, and a
+# dashboard re-issues the same few (distinct("sector"), the sector group-bys,
+# top-N by return) over and over.  CachedDatabase answers repeats from an LRU
+# cache bounded in bytes and drops entries when a write through the wrapper
+# can change them:
+#
+#     cache = QueryCache(max_bytes=32 << 20)
+#     db = CachedDatabase(raw_db, cache)
+#     db["market_data"].distinct("sector")            # miss → server
+#     db["market_data"].distinct("sector")            # hit
+#     db["market_data"].update_many({}, {"$rename": {"price": "last_price"}})
+#     # ↑ drops entries reading price / last_price (or whole documents); distinct("sector") stays
+#     cache.stats()                                    # hits / misses / evictions / invalidations / bytes
+#
+# Keys hash the collection, method, filter (key order normalized), projection,
+# sort, skip, limit and pipeline.  Each entry records the fields it reads:
+# inserts and deletes invalidate the whole collection, operator updates only
+# entries touching the updated fields.  Results are stored pickled, so the size
+# is exact and callers can't mutate a cached result.  Reads that are not
+# deterministic ($sample, $rand, $sampleRate, $$NOW, $$CLUSTER_TIME) always go
+# to the server.  Writes that bypass the wrapper are invisible: call
+# cache.invalidate(name) after them.
+
+DEFAULT_MAX_BYTES = 64 << 20
+ALL_FIELDS = "*"
+
+# Stages whose output is no longer the input documents, so fields they don't mention can't leak through
+_SHAPING_STAGES = {"$group", "$project", "$count", "$sortByCount", "$bucket", "$bucketAuto",
+                   "$replaceRoot", "$replaceWith"}
+
+# Query operators that read documents through something other than field paths
+_WHOLE_DOCUMENT_OPERATORS = {"$where", "$text", "$jsonSchema"}
+
+# Stages / operators / variables whose result changes from one run to the next
+_RANDOM_KEYS = {"$sample", "$rand", "$sampleRate"}
+_CLOCK_VARIABLES = ("$$NOW", "$$CLUSTER_TIME")
+
+
+def _normalize_query(query):
+    """Sort the keys of a query where order doesn't matter (fields, operators, $and/$or branches)."""
+    if not isinstance(query, dict):
+        return query
+    out = {}
+    for key in sorted(query):
+        cond = query[key]
+        if key in ("$and", "$or", "$nor"):
+            out[key] = [_normalize_query(q) for q in cond]
+        elif isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            out[key] = {op: _normalize_query(v) if op in ("$elemMatch", "$not") else v
+                        for op, v in sorted(cond.items())}
+        else:
+            out[key] = cond  # literal values (embedded documents compare in order)
+    return out
+
+
+def _normalize_pipeline(pipeline):
+    return [{"$match": _normalize_query(stage["$match"])} if list(stage) == ["$match"] else stage
+            for stage in pipeline or []]
+
+
+def _tagged(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, re.Pattern):
+        return {"$regex": value.pattern, "$flags": value.flags}
+    return {"$" + type(value).__name__: str(value)}  # ObjectId, Decimal128, numpy scalars, ...
+
+
+def cache_key(collection, method, filter=None, projection=None, sort=None, skip=0, limit=0,
+              pipeline=None, key=None):
+    """Stable hash of one read call; equivalent filters written in a different key order share a key."""
+    spec = [collection, method, _normalize_query(filter or {}), projection,
+            list(sort.items()) if isinstance(sort, dict) else sort, skip, limit,
+            _normalize_pipeline(pipeline), key]
+    return hashlib.sha1(json.dumps(spec, default=_tagged).encode()).hexdigest()
+
+
+def _root(path):
+    return path.split(".", 1)[0]
+
+
+def _query_fields(query, out):
+    for key, cond in (query or {}).items():
+        if key in ("$and", "$or", "$nor"):
+            for sub in cond:
+                _query_fields(sub, out)
+        elif key == "$expr":
+            _expression_fields(cond, out)
+        elif key in _WHOLE_DOCUMENT_OPERATORS:
+            out.add(ALL_FIELDS)
+        elif not key.startswith("$"):
+            out.add(_root(key))
+    return out
+
+
+def _expression_fields(expr, out):
+    if isinstance(expr, str):
+        if expr in ("$$ROOT", "$$CURRENT") or expr.startswith(("$$ROOT.", "$$CURRENT.")):
+            out.add(ALL_FIELDS)
+        elif expr.startswith("$") and not expr.startswith("$$"):
+            out.add(_root(expr[1:]))
+    elif isinstance(expr, dict):
+        for value in expr.values():
+            _expression_fields(value, out)
+    elif isinstance(expr, list):
+        for value in expr:
+            _expression_fields(value, out)
+    return out
+
+
+def nondeterministic(spec):
+    """True when a filter / projection / pipeline uses randomness or the clock, so its result can't be reused."""
+    if isinstance(spec, str):
+        return spec.startswith(_CLOCK_VARIABLES)
+    if isinstance(spec, dict):
+        return any(k in _RANDOM_KEYS or nondeterministic(v) for k, v in spec.items())
+    if isinstance(spec, (list, tuple)):
+        return any(nondeterministic(v) for v in spec)
+    return False
+
+
+def _whole_documents(projection):
+    """True unless the projection includes (or computes) some field other than _id."""
+    return not any(k != "_id" and (v or not isinstance(v, (bool, int))) for k, v in (projection or {}).items())
+
+
+def _projection_fields(projection, out):
+    if _whole_documents(projection):
+        out.add(ALL_FIELDS)  # whole documents, or everything but a few fields
+    else:
+        out.update(_root(k) for k in projection)
+        _expression_fields(list(projection.values()), out)
+    return out
+
+
+def _pipeline_dependencies(pipeline, collection, deps):
+    fields = deps.setdefault(collection, set())
+    shaped = False
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            _query_fields(spec, fields)
+        elif name in ("$lookup", "$graphLookup", "$unionWith"):
+            other = spec if isinstance(spec, str) else spec.get("from", spec.get("coll"))
+            deps.setdefault(other, set()).add(ALL_FIELDS)
+            if isinstance(spec, dict):
+                fields.update(_root(spec[k]) for k in ("localField",) if k in spec)
+                _expression_fields([spec.get("startWith"), spec.get("let")], fields)
+        elif name == "$facet":
+            for sub in spec.values():
+                _pipeline_dependencies(sub, collection, deps)
+        elif name == "$project" and _whole_documents(spec):
+            continue  # still whole documents minus a few fields
+        else:
+            if name in ("$sort", "$project", "$addFields", "$set"):
+                fields.update(_root(k) for k in spec)
+            if name == "$setWindowFields":
+                fields.update(_root(k) for k in spec.get("sortBy", {}))
+            _expression_fields(spec, fields)
+        shaped = shaped or name in _SHAPING_STAGES or name == "$facet"
+    if not shaped:
+        fields.add(ALL_FIELDS)  # documents flow out unchanged
+    return deps
+
+
+def read_dependencies(collection, method, filter=None, projection=None, sort=None, pipeline=None, key=None):
+    """{collection: set of root fields read} for one read call; "*" means whole documents."""
+    if method == "aggregate":
+        return _pipeline_dependencies(pipeline or [], collection, {})
+    fields = _query_fields(filter, set())
+    if method == "distinct":
+        fields.add(_root(key))
+    elif method in ("find", "find_one"):
+        _projection_fields(projection, fields)
+        fields.update(_root(k) for k in dict(sort or {}))
+    return {collection: fields}
+
+
+def updated_fields(update):
+    """Root fields an update document can change; None when it may change anything (replacement / pipeline)."""
+    if not isinstance(update, dict) or not update or not all(k.startswith("$") for k in update):
+        return None
+    fields = set()
+    for op, spec in update.items():
+        if op == "$setOnInsert":
+            continue
+        for name, value in spec.items():
+            fields.add(_root(name))
+            if op == "$rename":
+                fields.add(_root(value))
+    return fields
+
+
+class QueryCache:
+    """
+    LRU cache of read results, bounded by the pickled size of what it holds:
+    - max_bytes: total budget; results bigger than this are never stored
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # key → (blob, deps)
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """(True, fresh copy of the result) or (False, None)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, pickle.loads(entry[0])
+
+    def put(self, key, result, deps):
+        blob = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        self._drop(key)
+        while self._entries and self.bytes + len(blob) > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[key] = (blob, deps)
+        self.bytes += len(blob)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[0])
+
+    def invalidate(self, collection, fields=None):
+        """Drop entries reading `collection` (only those touching `fields` when given); returns how many."""
+        stale = []
+        for key, (_, deps) in self._entries.items():
+            read = deps.get(collection)
+            if read is not None and (fields is None or ALL_FIELDS in read or not read.isdisjoint(fields)):
+                stale.append(key)
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "entries": len(self._entries), "bytes": self.bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+class _CachedCursor:
+    """find() cursor stand-in: records sort / skip / limit, resolves through the cache on iteration."""
+
+    def __init__(self, owner, filter, projection):
+        self._owner = owner
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = self._limit = 0
+        self._batch_size = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = [(key_or_list, 1 if direction is None else direction)] if isinstance(key_or_list, str) \
+            else list(key_or_list.items() if isinstance(key_or_list, dict) else key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, count):
+        self._batch_size = count
+        return self
+
+    def _run(self):
+        cursor = self._owner._collection.find(self._filter, self._projection)
+        if self._sort:
+            cursor = cursor.sort(self._sort)
+        if self._skip:
+            cursor = cursor.skip(self._skip)
+        if self._limit:
+            cursor = cursor.limit(self._limit)
+        if self._batch_size:
+            cursor = cursor.batch_size(self._batch_size)
+        return list(cursor)
+
+    def __iter__(self):
+        return iter(self._owner._cached("find", self._run, filter=self._filter, projection=self._projection,
+                                        sort=self._sort, skip=self._skip, limit=self._limit))
+
+
+class CachedCollection:
+    """Collection wrapper: reads go through the QueryCache, writes invalidate what they can change."""
+
+    def __init__(self, collection, cache):
+        self._collection = collection
+        self.cache = cache
+        self.name = collection.name
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _cached(self, method, run, **call):
+        if nondeterministic([call.get("filter"), call.get("projection"), call.get("pipeline")]):
+            return run()  # a fresh sample / clock reading every time
+        key = cache_key(self.name, method, **call)
+        found, result = self.cache.get(key)
+        if found:
+            return result
+        result = run()
+        deps = read_dependencies(self.name, method, call.get("filter"), call.get("projection"), call.get("sort"),
+                                 call.get("pipeline"), call.get("key"))
+        self.cache.put(key, result, deps)
+        return result
+
+    # ---------------- reads ----------------
+
+    def find(self, filter=None, projection=None):
+        return _CachedCursor(self, filter, projection)
+
+    def find_one(self, filter=None, projection=None):
+        return self._cached("find_one", lambda: self._collection.find_one(filter, projection),
+                            filter=filter, projection=projection)
+
+    def count_documents(self, filter):
+        return self._cached("count_documents", lambda: self._collection.count_documents(filter), filter=filter)
+
+    def distinct(self, key, filter=None):
+        return self._cached("distinct", lambda: self._collection.distinct(key, filter), filter=filter, key=key)
+
+    def aggregate(self, pipeline, **kwargs):
+        pipeline = list(pipeline)
+        target = (pipeline[-1].get("$out") or pipeline[-1].get("$merge")) if pipeline else None
+        if target is not None:  # writes to another collection: run it, then forget what read that one
+            result = self._collection.aggregate(pipeline, **kwargs)
+            if isinstance(target, dict):
+                target = target.get("into", target.get("coll"))
+            self.cache.invalidate(target if isinstance(target, str) else target.get("coll"))
+            return result
+        return iter(self._cached("aggregate", lambda: list(self._collection.aggregate(pipeline, **kwargs)),
+                                 pipeline=pipeline))
+
+    # ---------------- writes ----------------
+
+    def insert_one(self, document):
+        result = self._collection.insert_one(document)
+        self.cache.invalidate(self.name)
+        return result
+
+    def insert_many(self, documents, ordered=True):
+        result = self._collection.insert_many(documents, ordered=ordered)
+        self.cache.invalidate(self.name)
+        return result
+
+    def _updated(self, result, update, upsert):
+        fields = updated_fields(update)
+        if upsert or fields is None:
+            self.cache.invalidate(self.name)
+        elif result.matched_count:
+            self.cache.invalidate(self.name, fields)
+        return result
+
+    def update_one(self, filter, update, upsert=False):
+        return self._updated(self._collection.update_one(filter, update, upsert=upsert), update, upsert)
+
+    def update_many(self, filter, update, upsert=False):
+        return self._updated(self._collection.update_many(filter, update, upsert=upsert), update, upsert)
+
+    def replace_one(self, filter, replacement, upsert=False):
+        result = self._collection.replace_one(filter, replacement, upsert=upsert)
+        self.cache.invalidate(self.name)
+        return result
+
+    def delete_one(self, filter):
+        result = self._collection.delete_one(filter)
+        if result.deleted_count:
+            self.cache.invalidate(self.name)
+        return result
+
+    def delete_many(self, filter):
+        result = self._collection.delete_many(filter)
+        if result.deleted_count:
+            self.cache.invalidate(self.name)
+        return result
+
+    def bulk_write(self, requests, ordered=True):
+        result = self._collection.bulk_write(requests, ordered=ordered)
+        self.cache.invalidate(self.name)
+        return result
+
+    def drop(self):
+        self._collection.drop()
+        self.cache.invalidate(self.name)
+
+
+class CachedDatabase:
+    """db wrapper whose collections share one QueryCache."""
+
+    def __init__(self, database, cache=None):
+        self._database = database
+        self.cache = cache if cache is not None else QueryCache()
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+    def __getitem__(self, name):
+        return CachedCollection(self._database[name], self.cache)
+
+    def get_collection(self, name):
+        return self[name]
+
+
+# ============================================================
+# 🔁 REPLAYED DASHBOARD WORKLOAD
+# ============================================================
+
+def replay(db, reads, rounds, writes=()):
+    """
+    Run the `reads` examples `rounds` times, firing the `writes` examples spread across the rounds:
+    - returns (seconds, results of the last round by example number)
+    """
+    examples = mongo_query_examples(db)
+    schedule = {round(i * rounds / (len(writes) + 1)): n for i, n in enumerate(writes, 1)}
+    start = time.perf_counter()
+    last = {}
+    for r in range(rounds):
+        if r in schedule:
+            examples[schedule[r] - 1]()
+        for number in reads:
+            last[number] = examples[number - 1]()
+    return time.perf_counter() - start, last
+
+
+def main(argv=None):
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Replay repeated example reads with and without the cache")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-mb", type=float, default=64)
+    parser.add_argument("--reads", type=int, nargs="*", default=[21, 22, 24, 25, 27, 31, 58, 75])
+    parser.add_argument("--writes", type=int, nargs="*", default=[1, 13, 14])
+    args = parser.parse_args(argv)
+    if set(args.reads) & WRITE_EXAMPLES:
+        parser.error(f"--reads must not include write examples {sorted(WRITE_EXAMPLES)}")
+
+    plain_db = connect(args.backend, args.uri, "cache_plain")
+    seed_market_data(plain_db, args.size)
+    plain_s, expected = replay(plain_db, args.reads, args.rounds, args.writes)
+
+    cached_db = CachedDatabase(connect(args.backend, args.uri, "cache_cached"), QueryCache(int(args.max_mb * 2 ** 20)))
+    seed_market_data(cached_db._database, args.size)
+    cached_s, got = replay(cached_db, args.reads, args.rounds, args.writes)
+
+    def normalized(result):
+        rows = list(result) if not isinstance(result, (int, float)) else [result]
+        return sorted(map(repr, ({k: v for k, v in row.items() if k != "_id"} if isinstance(row, dict)
+                                 else row for row in rows)))
+
+    same = all(normalized(expected[n]) == normalized(got[n]) for n in args.reads)
+    print(f"📚 {len(args.reads)} reads × {args.rounds} rounds, writes {args.writes} on {args.size:,} docs")
+    print(f"   uncached {plain_s:.2f}s  cached {cached_s:.2f}s  ({plain_s / cached_s:.1f}x)")
+    print(f"   {cached_db.cache.stats()}")
+    print("✅ same results as uncached" if same else "❌ cached results differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from data_prep_and_mongo_utils import mongo_query_examples
+
+
+# ============================================================
+# 🎥 RECORD THE QUERIES BEHIND mongo_query_examples
+# ============================================================
+#
+# The examples are opaque lambdas.  Running them against a RecordingDatabase
+# captures every collection call they make (method + filter / projection /
+# sort / limit / pipeline) without touching a server, so tools can inspect
+# the workload statically:
+#
+#     calls = capture_examples()
+#     calls[4].method, calls[4].filter    # → "find", {"sector": "Tech"}
+
+READ_METHODS = {"find", "find_one", "count_documents", "estimated_document_count", "distinct", "aggregate"}
+WRITE_METHODS = {"insert_one", "insert_many", "update_one", "update_many", "delete_one", "delete_many",
+                 "replace_one", "bulk_write"}
+
+
+class CapturedCall:
+    """One collection method call made by an example."""
+
+    def __init__(self, example, collection, method, **args):
+        self.example = example
+        self.collection = collection
+        self.method = method
+        self.filter = args.get("filter") or {}
+        self.projection = args.get("projection")
+        self.sort = args.get("sort")
+        self.limit = args.get("limit", 0)
+        self.skip = args.get("skip", 0)
+        self.pipeline = args.get("pipeline")
+        self.key = args.get("key")
+        self.update = args.get("update")
+        self.documents = args.get("documents")
+
+    @property
+    def is_read(self):
+        return self.method in READ_METHODS
+
+    def __repr__(self):
+        detail = self.pipeline if self.method == "aggregate" else self.filter
+        return f"<#{self.example} {self.collection}.{self.method} {detail}>"
+
+
+class _RecordingCursor:
+    def __init__(self, call):
+        self._call = call
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            self._call.sort = {key_or_list: direction if direction is not None else 1}
+        else:
+            self._call.sort = dict(key_or_list)
+        return self
+
+    def limit(self, count):
+        self._call.limit = count
+        return self
+
+    def skip(self, count):
+        self._call.skip = count
+        return self
+
+    def batch_size(self, count):
+        return self
+
+    def __iter__(self):
+        return iter(())
+
+
+class _Ack:
+    inserted_id = None
+    inserted_ids = ()
+    matched_count = modified_count = deleted_count = 0
+    acknowledged = True
+
+
+class RecordingCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def _record(self, method, **args):
+        call = CapturedCall(self.database.current_example, self.name, method, **args)
+        self.database.calls.append(call)
+        return call
+
+    def find(self, filter=None, projection=None):
+        return _RecordingCursor(self._record("find", filter=filter, projection=projection))
+
+    def find_one(self, filter=None, projection=None):
+        self._record("find_one", filter=filter, projection=projection, limit=1)
+        return None
+
+    def count_documents(self, filter):
+        self._record("count_documents", filter=filter)
+        return 0
+
+    def estimated_document_count(self):
+        self._record("estimated_document_count")
+        return 0
+
+    def distinct(self, key, filter=None):
+        self._record("distinct", key=key, filter=filter)
+        return []
+
+    def aggregate(self, pipeline, **kwargs):
+        self._record("aggregate", pipeline=pipeline)
+        return iter(())
+
+    def insert_one(self, document):
+        self._record("insert_one", documents=[document])
+        return _Ack()
+
+    def insert_many(self, documents, ordered=True):
+        self._record("insert_many", documents=list(documents))
+        return _Ack()
+
+    def update_one(self, filter, update, upsert=False):
+        self._record("update_one", filter=filter, update=update)
+        return _Ack()
+
+    def update_many(self, filter, update, upsert=False):
+        self._record("update_many", filter=filter, update=update)
+        return _Ack()
+
+    def delete_one(self, filter):
+        self._record("delete_one", filter=filter)
+        return _Ack()
+
+    def delete_many(self, filter):
+        self._record("delete_many", filter=filter)
+        return _Ack()
+
+
+class RecordingDatabase:
+    """Stand-in db whose collections record calls instead of executing them."""
+
+    def __init__(self, name="recording"):
+        self.name = name
+        self.calls = []
+        self.current_example = None
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = RecordingCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+
+def capture_examples(examples_fn=mongo_query_examples):
+    """Run every example against a RecordingDatabase; return the CapturedCall list in order."""
+    db = RecordingDatabase()
+    for number, example in enumerate(examples_fn(db), 1):
+        db.current_example = number
+        example()
+    return db.calls
+
+
+if __name__ == "__main__":
+    for call in capture_examples():
+        print(call)
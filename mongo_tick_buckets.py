@@ -0,0 +1,357 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import bson
+except ImportError:  # pymongo not installed — fall back to JSON size estimates
+    bson = None
+
+
+# ============================================================
+# 🪣 TIME-SERIES BUCKETED STORAGE FOR TICKS
+# ============================================================
+#
+# price_ticks.json holds one document per 1-second tick.  BucketedTickStore
+# keeps one document per (symbol, time window, up to 1,000 ticks) instead,
+# laid out like the server's own time-series buckets:
+#
+#     {"_id": ObjectId(...), "symbol": "AAPL", "start": 10:00, "end": 11:00,
+#      "count": 1000, "min_ts": ..., "max_ts": ...,
+#      "ts": [...], "price": [...], "volume": [...],                # column arrays
+#      "price_min": ..., "price_max": ..., "price_sum": ...,        # per-field summaries
+#      "price_first": [ts, price], "price_last": [ts, price], "volume_min": ..., ...}
+#
+# Each insert appends to the window's open bucket with one upsert
+# ($push / $inc / $min / $max), so nothing is read back and concurrent
+# writers don't lose each other's ticks.  A bucket that can't take the whole
+# append stays as it is and the upsert opens a new one, like the server's
+# buckets that close at 1,000 measurements.  first / last are [ts, value]
+# pairs so $min / $max keep the earliest / latest tick whatever the arrival
+# order.
+#
+#     store = BucketedTickStore(db, "ticks_1h", window="1h")
+#     store.insert(ticks)                                  # DataFrame or iterable of tick dicts
+#     store.range("AAPL", t0, t1)                          # ticks in [t0, t1) as a DataFrame
+#     store.ohlc("AAPL", t0, t1, freq="1h")                # bars from bucket summaries
+#
+# Queries only touch buckets overlapping [t0, t1): the filter is a bounded
+# range on (symbol, start).  OHLC bars that are whole multiples of the window
+# are built from the summaries of fully covered buckets without reading their
+# arrays; only the edge buckets are unpacked.
+#
+# TickStore is the same interface over one document per tick, either a plain
+# collection or a native time-series collection (native=True, MongoDB 5.0+).
+
+DEFAULT_WINDOW = "1h"
+DEFAULT_BUCKET_MAX = 1_000  # measurements per bucket, as in the server's time-series collections
+VALUE_FIELDS = ("price", "volume")
+
+
+def _as_frame(ticks, time_field):
+    frame = ticks if isinstance(ticks, pd.DataFrame) else pd.DataFrame(list(ticks))
+    frame = frame.copy()
+    frame[time_field] = pd.to_datetime(frame[time_field]).astype("datetime64[ms]")
+    return frame
+
+
+def _bars(frame, time_field, price, volume, freq):
+    """OHLCV bars from ticks, labelled by the floor of each bar like resample()."""
+    if frame.empty:
+        return pd.DataFrame(columns=["open", "high", "low", "close", "volume", "count"])
+    keys = frame[time_field].dt.floor(freq)
+    grouped = frame.groupby(keys, sort=True)
+    bars = pd.DataFrame({
+        "open": grouped[price].first(), "high": grouped[price].max(), "low": grouped[price].min(),
+        "close": grouped[price].last(), "volume": grouped[volume].sum(), "count": grouped[price].size(),
+    })
+    bars.index.name = time_field
+    return bars
+
+
+def _ensure_index(collection, keys):
+    if callable(getattr(type(collection), "create_index", None)):
+        collection.create_index(keys)
+
+
+class BucketedTickStore:
+    """
+    Ticks stored as per-symbol, per-window bucket documents:
+    - window: bucket width ("1min", "1h", "1D", ...)
+    - bucket_max: ticks per bucket before a new bucket is opened for the same window
+    - fields: per-tick value fields kept as column arrays with min/max/first/last/sum summaries
+    """
+
+    def __init__(self, db, name="tick_buckets", window=DEFAULT_WINDOW, fields=VALUE_FIELDS,
+                 time_field="timestamp", symbol_field="symbol", bucket_max=DEFAULT_BUCKET_MAX):
+        self.collection = db[name]
+        self.window = pd.Timedelta(window)
+        self.fields = tuple(fields)
+        self.time_field = time_field
+        self.symbol_field = symbol_field
+        self.bucket_max = bucket_max
+        _ensure_index(self.collection, [("symbol", 1), ("start", 1)])
+
+    def _append(self, start, ts, values):
+        """One upsert that adds these ticks (at most bucket_max, sorted by time) to the bucket it matches."""
+        first, last = pd.Timestamp(ts[0]).to_pydatetime(), pd.Timestamp(ts[-1]).to_pydatetime()
+        update = {
+            "$setOnInsert": {"end": (start + self.window).to_pydatetime()},
+            "$inc": {"count": len(ts)},
+            "$min": {"min_ts": first},
+            "$max": {"max_ts": last},
+            "$push": {"ts": {"$each": ts.astype("datetime64[ms]").tolist()}},
+        }
+        for field in self.fields:
+            column = values[field]
+            update["$push"][field] = {"$each": column.tolist()}
+            update["$inc"][f"{field}_sum"] = column.sum().item()
+            update["$min"].update({f"{field}_min": column.min().item(), f"{field}_first": [first, column[0].item()]})
+            update["$max"].update({f"{field}_max": column.max().item(), f"{field}_last": [last, column[-1].item()]})
+        return update
+
+    def insert(self, ticks):
+        """
+        Add ticks (DataFrame or iterable of dicts) to their buckets:
+        - one upsert per bucket_max ticks of a (symbol, window); buckets are never read back
+        - late ticks are fine: range() and ohlc() order each bucket's arrays by time
+        - returns the number of appends (upserts) sent
+        """
+        frame = _as_frame(ticks, self.time_field).sort_values(self.time_field, kind="stable")
+        starts = frame[self.time_field].dt.floor(self.window)
+        appends = 0
+        for (symbol, start), part in frame.groupby([frame[self.symbol_field], starts], sort=False):
+            ts = part[self.time_field].to_numpy()
+            values = {f: part[f].to_numpy() for f in self.fields}
+            for lo in range(0, len(ts), self.bucket_max):
+                hi = min(lo + self.bucket_max, len(ts))
+                # an open bucket is one with room for the whole append; otherwise the upsert opens a new one
+                open_bucket = {"symbol": symbol, "start": start.to_pydatetime(),
+                               "count": {"$lte": self.bucket_max - (hi - lo)}}
+                self.collection.update_one(open_bucket, self._append(start, ts[lo:hi],
+                                                                     {f: v[lo:hi] for f, v in values.items()}),
+                                           upsert=True)
+                appends += 1
+        return appends
+
+    def _overlapping(self, symbol, start, end):
+        # end = start + window, so "bucket.end > t0" is the bounded range "bucket.start > t0 - window"
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        return {"symbol": symbol, "start": {"$gt": (start - self.window).to_pydatetime(), "$lt": end.to_pydatetime()}}
+
+    def _unpack(self, buckets, start, end):
+        parts = []
+        for b in buckets:
+            ts = np.array(b["ts"], dtype="datetime64[ms]")
+            keep = (ts >= np.datetime64(pd.Timestamp(start), "ms")) & (ts < np.datetime64(pd.Timestamp(end), "ms"))
+            if keep.any():
+                part = {self.time_field: ts[keep]}
+                part.update({f: np.asarray(b[f])[keep] for f in self.fields})
+                parts.append(pd.DataFrame(part))
+        if not parts:
+            return pd.DataFrame({self.time_field: np.array([], dtype="datetime64[ms]"),
+                                 **{f: [] for f in self.fields}})
+        frame = pd.concat(parts, ignore_index=True)  # late ticks sit at the end of their bucket
+        return frame.sort_values(self.time_field, kind="stable", ignore_index=True)
+
+    def range(self, symbol, start, end):
+        """Ticks of one symbol with start <= timestamp < end, read from overlapping buckets only."""
+        projection = {"_id": 0, "ts": 1, **{f: 1 for f in self.fields}}
+        buckets = self.collection.find(self._overlapping(symbol, start, end), projection).sort("start", 1)
+        frame = self._unpack(buckets, start, end)
+        frame.insert(0, self.symbol_field, symbol)
+        return frame
+
+    def ohlc(self, symbol, start, end, freq="1min", price="price", volume="volume"):
+        """
+        OHLCV bars in [start, end):
+        - freq a multiple of the window → fully covered buckets contribute their summaries only
+        - otherwise the overlapping buckets are unpacked and resampled
+        """
+        bar = pd.Timedelta(freq)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if bar % self.window:
+            return _bars(self.range(symbol, start, end), self.time_field, price, volume, bar)
+
+        summary_fields = [f"{f}_{stat}" for f in (price, volume) for stat in ("min", "max", "first", "last", "sum")]
+        summaries = list(self.collection.find(self._overlapping(symbol, start, end),
+                                              {"start": 1, "end": 1, "count": 1, **{f: 1 for f in summary_fields}}))
+        rows = []
+        edges = [b["_id"] for b in summaries if b["start"] < start or b["end"] > end]
+        if edges:
+            ticks = self._unpack(self.collection.find({"_id": {"$in": edges}}), start, end)
+            windows = ticks[self.time_field].dt.floor(self.window)
+            edge_bars = _bars(ticks, self.time_field, price, volume, self.window)
+            grouped = ticks.groupby(windows, sort=True)[self.time_field]
+            rows.extend(zip(edge_bars.index, grouped.min(), edge_bars["open"], edge_bars["high"], edge_bars["low"],
+                            grouped.max(), edge_bars["close"], edge_bars["volume"], edge_bars["count"]))
+        edges = set(edges)
+        for b in summaries:
+            if b["_id"] in edges:
+                continue
+            (first_ts, first), (last_ts, last) = b[f"{price}_first"], b[f"{price}_last"]
+            rows.append((pd.Timestamp(b["start"]), first_ts, first, b[f"{price}_max"], b[f"{price}_min"],
+                         last_ts, last, b[f"{volume}_sum"], b["count"]))
+        if not rows:
+            return _bars(pd.DataFrame(columns=[self.time_field, price, volume]), self.time_field, price, volume, bar)
+
+        # one row per bucket; a window can hold several, so open / close go by each bucket's first / last tick
+        per_bucket = pd.DataFrame(rows, columns=[self.time_field, "first_ts", "open", "high", "low", "last_ts",
+                                                 "close", "volume", "count"])
+        keys = per_bucket[self.time_field].dt.floor(bar)
+        grouped = per_bucket.groupby(keys, sort=True)
+        bars = pd.DataFrame({
+            "open": per_bucket.sort_values("first_ts", kind="stable").groupby(keys, sort=True)["open"].first(),
+            "high": grouped["high"].max(), "low": grouped["low"].min(),
+            "close": per_bucket.sort_values("last_ts", kind="stable").groupby(keys, sort=True)["close"].last(),
+            "volume": grouped["volume"].sum(), "count": grouped["count"].sum(),
+        })
+        bars.index.name = self.time_field
+        return bars
+
+
+class TickStore:
+    """One document per tick — plain collection, or a native time-series collection with native=True."""
+
+    def __init__(self, db, name="ticks", native=False, granularity="seconds",
+                 time_field="timestamp", symbol_field="symbol"):
+        self.time_field = time_field
+        self.symbol_field = symbol_field
+        if native and name not in db.list_collection_names():
+            db.create_collection(name, timeseries={"timeField": time_field, "metaField": symbol_field,
+                                                   "granularity": granularity})
+        self.collection = db[name]
+        if not native:
+            _ensure_index(self.collection, [(symbol_field, 1), (time_field, 1)])
+
+    def insert(self, ticks):
+        records = _as_frame(ticks, self.time_field).to_dict(orient="records")
+        for record in records:
+            record[self.time_field] = record[self.time_field].to_pydatetime()
+        if records:
+            self.collection.insert_many(records, ordered=False)
+        return len(records)
+
+    def range(self, symbol, start, end):
+        query = {self.symbol_field: symbol,
+                 self.time_field: {"$gte": pd.Timestamp(start).to_pydatetime(), "$lt": pd.Timestamp(end).to_pydatetime()}}
+        docs = list(self.collection.find(query, {"_id": 0}).sort(self.time_field, 1))
+        frame = pd.DataFrame(docs, columns=[self.symbol_field, self.time_field, *VALUE_FIELDS]) if not docs \
+            else pd.DataFrame(docs)
+        frame[self.time_field] = pd.to_datetime(frame[self.time_field]).astype("datetime64[ms]")
+        return frame
+
+    def ohlc(self, symbol, start, end, freq="1min", price="price", volume="volume"):
+        return _bars(self.range(symbol, start, end), self.time_field, price, volume, pd.Timedelta(freq))
+
+
+# ============================================================
+# ⏱️ BENCHMARK: buckets vs one document per tick
+# ============================================================
+
+def synthetic_ticks(symbols=5, hours=6, start="2025-10-15 09:30", seed=0):
+    """1-second random-walk ticks for `symbols` symbols over `hours` hours."""
+    rng = np.random.default_rng(seed)
+    seconds = int(hours * 3600)
+    stamps = pd.date_range(start, periods=seconds, freq="s").to_numpy().astype("datetime64[ms]")
+    frames = []
+    for i in range(symbols):
+        base = 100 + 50 * i
+        frames.append(pd.DataFrame({
+            "symbol": f"SYM{i:02d}",
+            "timestamp": stamps,
+            "price": np.round(base + np.cumsum(rng.normal(0, 0.02, seconds)), 2),
+            "volume": rng.integers(100, 2_000, seconds),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def collection_bytes(db, name):
+    """Logical data size: collStats on a server, summed BSON sizes on the stand-ins."""
+    try:
+        return db.command("collStats", name)["size"]
+    except Exception:
+        total = 0
+        for doc in db[name].find():
+            total += len(bson.encode(doc)) if bson is not None else len(json.dumps(doc, default=str))
+        return total
+
+
+def _median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), result
+
+
+def benchmark(db, ticks, window=DEFAULT_WINDOW, repeat=5, native=False):
+    """Ingest `ticks` both ways, then compare storage and range / OHLC latency (results must match)."""
+    for name in ("bench_ticks", "bench_tick_buckets"):
+        db.drop_collection(name)
+    flat = TickStore(db, "bench_ticks", native=native)
+    bucketed = BucketedTickStore(db, "bench_tick_buckets", window=window)
+
+    report = {}
+    for label, store in (("per_tick", flat), ("bucketed", bucketed)):
+        start = time.perf_counter()
+        store.insert(ticks)
+        report[label] = {"ingest_s": time.perf_counter() - start}
+    report["per_tick"]["bytes"] = collection_bytes(db, "bench_ticks")
+    report["bucketed"]["bytes"] = collection_bytes(db, "bench_tick_buckets")
+    report["per_tick"]["docs"] = flat.collection.count_documents({})
+    report["bucketed"]["docs"] = bucketed.collection.count_documents({})
+
+    symbol = ticks["symbol"].iloc[0]
+    t0 = ticks["timestamp"].min()
+    t1 = ticks["timestamp"].max() + pd.Timedelta("1s")
+    middle = t0 + (t1 - t0) / 2
+    queries = {
+        "range_10min": lambda s: s.range(symbol, middle, middle + pd.Timedelta("10min")),
+        "ohlc_1min_1h": lambda s: s.ohlc(symbol, middle, middle + pd.Timedelta("1h"), "1min"),
+        "ohlc_1h_all": lambda s: s.ohlc(symbol, t0, t1, "1h"),
+    }
+    for query, fn in queries.items():
+        flat_ms, expected = _median_ms(lambda: fn(flat), repeat)
+        bucket_ms, got = _median_ms(lambda: fn(bucketed), repeat)
+        same = True
+        try:
+            pd.testing.assert_frame_equal(expected.reset_index(drop=True), got.reset_index(drop=True),
+                                          check_dtype=False)
+        except AssertionError:
+            same = False
+        report[query] = {"per_tick_ms": flat_ms, "bucketed_ms": bucket_ms, "same": same}
+    return report
+
+
+def main(argv=None):
+    from mongo_benchmark import connect
+
+    parser = argparse.ArgumentParser(description="Bucketed vs one-document-per-tick storage")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--symbols", type=int, default=5)
+    parser.add_argument("--hours", type=float, default=6)
+    parser.add_argument("--window", default=DEFAULT_WINDOW)
+    parser.add_argument("--native", action="store_true", help="per-tick side as a native time-series collection")
+    args = parser.parse_args(argv)
+
+    db = connect(args.backend, args.uri, "ticks")
+    ticks = synthetic_ticks(args.symbols, args.hours)
+    report = benchmark(db, ticks, window=args.window, native=args.native)
+    print(f"📦 {len(ticks):,} ticks, window {args.window}")
+    for label in ("per_tick", "bucketed"):
+        r = report[label]
+        print(f"   {label:<9} {r['docs']:>9,} docs {r['bytes'] / 2 ** 20:>9.2f} MB  ingest {r['ingest_s']:.2f}s")
+    for query in ("range_10min", "ohlc_1min_1h", "ohlc_1h_all"):
+        r = report[query]
+        print(f"   {query:<13} per-tick {r['per_tick_ms']:>8.2f} ms  bucketed {r['bucketed_ms']:>8.2f} ms  "
+              f"{'✅ same' if r['same'] else '❌ DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+try:
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    BulkWriteError = None
+
+
+# ============================================================
+# 📥 STREAMING BULK LOADER FOR EXTENDED-JSON TICK DUMPS
+# ============================================================
+#
+#   python mongo_tick_loader.py price_ticks.json --backend mongod --writers 4
+#   python mongo_tick_loader.py ticks_2025.json --backend mongod --resume   # after a failure
+#
+# Works on a JSON array (price_ticks.json, mongoexport --jsonArray) or on
+# newline-delimited JSON.  The file is read in fixed-size chunks and decoded
+# one document at a time, so memory stays at roughly
+# chunk_size + writers × batch size no matter how large the dump is.
+# {"$date": ...}, {"$oid": ...} and {"$numberLong": ...} become datetime /
+# ObjectId / int while parsing.
+#
+# Progress is checkpointed as byte ranges: the offset up to which every
+# batch is written, plus the batches past it that finished out of order.
+# Resuming seeks to the offset and skips the documents of those batches.
+# Documents without an _id get one from the file's content and their
+# position in it ("<content hash>:<end byte offset>"), so a batch that is
+# replayed anyway (e.g. after a crash mid-insert) only raises duplicate
+# keys, which are tolerated, while a different dump under the same name
+# gets new ids.  The checkpoint records that hash too: resuming against a
+# file that has changed since is refused.  Once a batch has failed no
+# further batch is submitted.
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_BATCH_BYTES = 8 << 20
+MAX_RECORD_BYTES = 16 << 20  # BSON's document size limit: an undecodable record longer than this is malformed
+DUPLICATE_KEY = 11000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _parse_date(value):
+    if isinstance(value, (int, float)):
+        return _EPOCH + timedelta(milliseconds=value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def extended_json_hook(document):
+    """json object_hook turning Extended JSON wrappers into native values (naive UTC datetimes)."""
+    if len(document) == 1:
+        (key, value), = document.items()
+        if key == "$date":
+            return _parse_date(value)
+        if key == "$oid":
+            return ObjectId(value) if ObjectId is not None else value
+        if key in ("$numberLong", "$numberInt"):
+            return int(value)
+        if key == "$numberDouble":
+            return float(value)
+    return document
+
+
+_SEPARATORS = re.compile(r"[\s,\[\]]*")
+
+
+def _byte_len(text, start, end):
+    piece = text[start:end]
+    return len(piece) if piece.isascii() else len(piece.encode())
+
+
+def _read_text(fh, pending, chunk_size):
+    """Read one chunk → (text, leftover bytes, eof); never splits a multi-byte UTF-8 character."""
+    raw = fh.read(chunk_size)
+    data = pending + raw
+    if not raw:
+        return data.decode(), b"", True
+    lead = len(data) - 1
+    while lead > 0 and (data[lead] & 0xC0) == 0x80:
+        lead -= 1
+    width = 1 if data[lead] < 0xC0 else 2 if data[lead] < 0xE0 else 3 if data[lead] < 0xF0 else 4
+    cut = len(data) if lead + width <= len(data) else lead
+    return data[:cut].decode(), data[cut:], False
+
+
+def iter_extended_json(path, start_offset=0, chunk_size=DEFAULT_CHUNK_SIZE, max_record_bytes=MAX_RECORD_BYTES):
+    """
+    Yield (document, end_offset) from a JSON array or NDJSON file:
+    - start_offset: byte offset to resume from (an offset previously yielded)
+    - end_offset: byte offset just past the document, usable as a resume point
+    - raises ValueError at the record's byte offset when no document decodes within max_record_bytes
+    """
+    decoder = json.JSONDecoder(object_hook=extended_json_hook)
+    with open(path, "rb") as fh:
+        fh.seek(start_offset)
+        offset = start_offset
+        pending = b""
+        buffer, pos = "", 0
+        eof = False
+        while True:
+            skip = _SEPARATORS.match(buffer, pos).end()
+            offset += _byte_len(buffer, pos, skip)
+            pos = skip
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pending, eof = _read_text(fh, pending, chunk_size)
+                pos = 0
+                continue
+            try:
+                document, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                if len(buffer) - pos > max_record_bytes:  # characters ≤ bytes, so this never cuts a valid record
+                    raise ValueError(f"{path}: no complete JSON record within {max_record_bytes:,} bytes "
+                                     f"of byte offset {offset:,}") from None
+                text, pending, eof = _read_text(fh, pending, chunk_size)  # document spans the chunk boundary
+                buffer, pos = buffer[pos:] + text, 0
+                continue
+            offset += _byte_len(buffer, pos, end)
+            pos = end
+            yield document, offset
+
+
+def iter_batches(documents, batch_size=DEFAULT_BATCH_SIZE, batch_bytes=DEFAULT_BATCH_BYTES, start_offset=0,
+                 skip=None):
+    """
+    Group (document, end_offset) pairs into (batch, start_offset, end_offset) lists capped by count and bytes:
+    - each batch covers the byte range (start_offset, end_offset] of the file
+    - skip(end_offset) → True drops that document; a batch never spans a dropped one
+    """
+    batch, size, start, last = [], 0, start_offset, start_offset
+    for document, end in documents:
+        if skip is not None and skip(end):
+            if batch:
+                yield batch, start, last
+                batch, size = [], 0
+            start = last = end
+            continue
+        span = end - last
+        if batch and (len(batch) >= batch_size or size + span > batch_bytes):
+            yield batch, start, last
+            batch, size, start = [], 0, last
+        batch.append(document)
+        size += span
+        last = end
+    if batch:
+        yield batch, start, last
+
+
+def file_digest(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Short content hash of a file (one sequential read), naming the dump in ids and checkpoints."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def with_source_ids(documents, name):
+    """Give documents without an _id a deterministic one: "<name>:<end byte offset>"."""
+    for document, end in documents:
+        if "_id" not in document:
+            document["_id"] = f"{name}:{end}"
+        yield document, end
+
+
+def _insert_batch(collection, batch):
+    """Unordered insert; duplicate keys (a batch replayed after resume) are not failures."""
+    try:
+        return len(collection.insert_many(batch, ordered=False).inserted_ids)
+    except Exception as exc:
+        if BulkWriteError is None or not isinstance(exc, BulkWriteError):
+            raise
+        errors = exc.details.get("writeErrors", [])
+        if any(e.get("code") != DUPLICATE_KEY for e in errors):
+            raise
+        return exc.details.get("nInserted", 0)
+
+
+class _Checkpoint:
+    """Completed byte ranges of batches that finish out of order; `offset` ends the contiguous prefix."""
+
+    def __init__(self, path, source=None, offset=0, docs=0, done=()):
+        self.path = path
+        self.source = source
+        self.offset = offset
+        self.docs = docs
+        self._done = {start: (end, n) for start, end, n in done}  # start → (end, inserted) past the prefix
+        self._lock = threading.Lock()
+        self._advance()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fh:
+            saved = json.load(fh)
+        return cls(path, saved.get("source"), saved["offset"], saved["docs"], saved.get("done", ()))
+
+    def _advance(self):
+        while self.offset in self._done:
+            end, n = self._done.pop(self.offset)
+            self.offset = end
+            self.docs += n
+
+    @property
+    def total(self):
+        return self.docs + sum(n for _, n in self._done.values())
+
+    def written(self, end_offset):
+        """True when the document ending at end_offset belongs to a batch that already completed."""
+        with self._lock:
+            return any(start < end_offset <= end for start, (end, _) in self._done.items())
+
+    def complete(self, start_offset, end_offset, inserted):
+        with self._lock:
+            self._done[start_offset] = (end_offset, inserted)
+            self._advance()
+            if self.path:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as fh:
+                    json.dump({"source": self.source, "offset": self.offset, "docs": self.docs,
+                               "done": [[s, e, n] for s, (e, n) in sorted(self._done.items())]}, fh)
+                os.replace(tmp, self.path)
+
+
+def load_ticks(path, collection, batch_size=DEFAULT_BATCH_SIZE, writers=4, checkpoint=None, resume=False,
+               chunk_size=DEFAULT_CHUNK_SIZE, batch_bytes=DEFAULT_BATCH_BYTES, progress_every=5.0, source_ids=True):
+    """
+    Stream an Extended-JSON dump into `collection` with parallel unordered insert_many:
+    - writers: number of concurrent insert_many calls (at most 2× that many batches held in memory)
+    - checkpoint: JSON file holding the completed byte ranges (defaults to <path>.offset)
+    - resume: continue from the checkpoint instead of byte 0 (the checkpoint is removed once the load completes)
+    - source_ids: give documents without an _id the deterministic "<content hash>:<end offset>" id
+    Returns a stats dict: docs, seconds, docs_per_sec, offset.
+    """
+    checkpoint = checkpoint or path + ".offset"
+    started = last_report = time.perf_counter()
+    source = file_digest(path, chunk_size)
+    if resume and os.path.exists(checkpoint):
+        state = _Checkpoint.load(checkpoint)
+        if state.source != source:
+            raise ValueError(f"{checkpoint} was written for a different version of {path}; "
+                             f"remove it or load without --resume")
+    else:
+        state = _Checkpoint(checkpoint, source)
+    start_docs = state.total
+    in_flight, failures = set(), []
+    documents = iter_extended_json(path, state.offset, chunk_size)
+    if source_ids:
+        documents = with_source_ids(documents, source)
+    batches = iter_batches(documents, batch_size, batch_bytes, state.offset, skip=state.written)
+
+    def finished(future, start, end):
+        if future.exception() is None:
+            state.complete(start, end, future.result())
+
+    def settle(futures):
+        # failures are read off the futures themselves: done callbacks may still be running after wait()
+        failures.extend(f.exception() for f in futures if f.exception() is not None)
+
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        for batch, start_offset, end_offset in batches:
+            if len(in_flight) >= 2 * writers:
+                wait(in_flight, return_when=FIRST_COMPLETED)
+            done = {f for f in in_flight if f.done()}
+            in_flight -= done
+            settle(done)
+            if failures:
+                break  # stop at the first failed batch; the checkpoint has everything that did complete
+            future = pool.submit(_insert_batch, collection, batch)
+            future.add_done_callback(lambda f, start=start_offset, end=end_offset: finished(f, start, end))
+            in_flight.add(future)
+
+            now = time.perf_counter()
+            if progress_every and now - last_report >= progress_every:
+                rate = (state.total - start_docs) / (now - started)
+                print(f"⏳ {state.total:,} docs  offset {state.offset:,}  {rate:,.0f} docs/sec")
+                last_report = now
+        wait(in_flight)
+        settle(in_flight)
+    if failures:
+        raise failures[0]
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)  # finished: the next run starts from the top
+
+    seconds = time.perf_counter() - started
+    loaded = state.total - start_docs
+    return {"docs": loaded, "total_docs": state.total, "seconds": round(seconds, 3),
+            "docs_per_sec": round(loaded / seconds) if seconds else 0, "offset": state.offset}
+
+
+def main(argv=None):
+    from mongo_benchmark import connect
+
+    parser = argparse.ArgumentParser(description="Stream an Extended-JSON tick dump into MongoDB")
+    parser.add_argument("path", nargs="?", default="price_ticks.json")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="market")
+    parser.add_argument("--collection", default="price_ticks")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args(argv)
+
+    collection = connect(args.backend, args.uri, args.db)[args.collection]
+    stats = load_ticks(args.path, collection, batch_size=args.batch_size, writers=args.writers,
+                       checkpoint=args.checkpoint, resume=args.resume)
+    print(f"✅ {stats['docs']:,} docs in {stats['seconds']}s → {stats['docs_per_sec']:,} docs/sec "
+          f"(offset {stats['offset']:,})")
+
+
+if __name__ == "__main__":
+    main()
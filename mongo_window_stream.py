@@ -0,0 +1,327 @@
+import argparse
+import itertools
+import math
+from collections import deque
+
+from data_prep_and_mongo_utils import mongo_query_examples
+
+
+# ============================================================
+# 🪟 STREAMING $setWindowFields EVALUATOR
+# ============================================================
+#
+# Examples #39–#42 and #54 rank, roll and accumulate with $setWindowFields,
+# which the server evaluates partition by partition and spills to disk once a
+# partition is large.  The streaming evaluator reads a cursor sorted by
+# (partitionBy, sortBy) and computes the same outputs in one pass with state
+# proportional to the window, not the partition:
+#
+#     spec = {"partitionBy": "$sector", "sortBy": {"date": 1},
+#             "output": {"cumulative_volume": {"$sum": "$volume",
+#                                              "window": {"documents": ["unbounded", "current"]}}}}
+#     for batch in stream_window_fields(db["market_data"], spec, batch_size=10_000):
+#         ...                                   # lists of documents with the new fields
+#     for batch in stream_pipeline(db["market_data"], pipeline):   # [$match] [$sort] $setWindowFields
+#         ...
+#
+# - $rank / $denseRank / $documentNumber only look at the previous sort key
+# - $sum / $avg / $count over a documents window keep a ring buffer of the rows
+#   inside it plus running totals; ["unbounded", ...] keeps just the totals
+# - $min / $max keep a monotonic deque
+# - windows reaching ahead (["current", 2]) hold back that many documents
+# - whole-partition outputs (no window, e.g. #42's $percentile) come from one
+#   server-side $group per output, so documents are never buffered
+# Windowed $min / $max / $sum / $avg consider numbers only.
+
+DEFAULT_BATCH_SIZE = 10_000
+
+RANK_OPS = {"$rank", "$denseRank", "$documentNumber"}
+SLIDING_OPS = {"$sum", "$avg", "$count", "$min", "$max"}
+
+
+def _lookup(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _field_of(expression, what):
+    if not (isinstance(expression, str) and expression.startswith("$") and not expression.startswith("$$")):
+        raise NotImplementedError(f"{what} must be a plain field path like '$sector', got {expression!r}")
+    return expression[1:]
+
+
+def _bounds(window):
+    """documents window → (lo, hi) offsets; None = unbounded.  No window = the whole partition."""
+    if window is None:
+        return None, None
+    if set(window) != {"documents"}:
+        raise NotImplementedError("only 'documents' windows are supported by the streaming evaluator")
+    lo, hi = window["documents"]
+    lo = None if lo == "unbounded" else 0 if lo == "current" else int(lo)
+    hi = None if hi == "unbounded" else 0 if hi == "current" else int(hi)
+    return lo, hi
+
+
+class _SlidingWindow:
+    """$sum / $avg / $count / $min / $max over rows [i + lo, i + hi] of one partition as i advances."""
+
+    def __init__(self, op, lo, hi):
+        self.op, self.lo, self.hi = op, lo, hi
+        self.waiting = deque()  # (row, value) arrived but not yet inside the window
+        self.inside = deque()   # (row, value) inside the window, needed again only to evict
+        self.extreme = deque()  # monotonic (row, value) for $min / $max
+        self.total = 0
+        self.count = 0
+
+    def arrive(self, row, value):
+        # every document counts for $count, so its rows arrive as 1 rather than a (missing) field value
+        self.waiting.append((row, 1 if self.op == "$count" else value if _number(value) else None))
+
+    def _enter(self, row, value):
+        if self.lo is not None:
+            self.inside.append((row, value))
+        if value is None:
+            return
+        if self.op in ("$min", "$max"):
+            beaten = (lambda v: v >= value) if self.op == "$min" else (lambda v: v <= value)
+            while self.extreme and beaten(self.extreme[-1][1]):
+                self.extreme.pop()
+            self.extreme.append((row, value))
+        elif self.op != "$count":
+            self.total += value
+        self.count += 1
+
+    def _leave(self, value):
+        if value is not None and self.op not in ("$min", "$max"):
+            if self.op != "$count":
+                self.total -= value
+            self.count -= 1
+
+    def result(self, i):
+        """Value for row i; rows up to i + hi must have arrived (or the partition has ended)."""
+        last = None if self.hi is None else i + self.hi
+        while self.waiting and (last is None or self.waiting[0][0] <= last):
+            self._enter(*self.waiting.popleft())
+        if self.lo is not None:
+            while self.inside and self.inside[0][0] < i + self.lo:
+                self._leave(self.inside.popleft()[1])
+            while self.extreme and self.extreme[0][0] < i + self.lo:
+                self.extreme.popleft()
+        if self.op == "$count":
+            return self.count
+        if self.op == "$sum":
+            return self.total
+        if self.op == "$avg":
+            return self.total / self.count if self.count else None
+        return self.extreme[0][1] if self.extreme else None
+
+
+class _Output:
+    def __init__(self, name, spec):
+        self.name = name
+        self.window = spec.get("window")
+        (self.op, self.arg), = ((k, v) for k, v in spec.items() if k != "window")
+        self.lo, self.hi = _bounds(self.window)
+        if self.op in RANK_OPS:
+            self.kind = "rank"
+        elif self.lo is None and self.hi is None:
+            self.kind = "partition"  # one value per partition, from a server-side $group
+        elif self.op in SLIDING_OPS and self.hi is not None:
+            self.kind = "sliding"
+            self.field = None if self.op == "$count" else _field_of(self.arg, self.op)
+        else:
+            raise NotImplementedError(f"{self.op} over window {self.window} is not supported by the streaming "
+                                      f"evaluator (windows ending at 'unbounded' must also start there)")
+
+
+def partition_totals(collection, spec, filter=None):
+    """{output name: {partition key: value}} for whole-partition outputs, one $group each."""
+    totals = {}
+    partition = spec.get("partitionBy")
+    for name, out_spec in spec["output"].items():
+        output = _Output(name, out_spec)
+        if output.kind != "partition":
+            continue
+        pipeline = [{"$match": filter}] if filter else []
+        pipeline.append({"$group": {"_id": partition, "value": {output.op: output.arg}}})
+        totals[name] = {doc["_id"]: doc["value"] for doc in collection.aggregate(pipeline)}
+    return totals
+
+
+def evaluate_windows(documents, spec, totals=None):
+    """
+    Yield documents with the $setWindowFields outputs added, one pass:
+    - documents: iterable already sorted by (partitionBy, sortBy)
+    - totals: partition_totals() for outputs without a window (required when there are any)
+    """
+    outputs = [_Output(name, out_spec) for name, out_spec in spec["output"].items()]
+    partition_field = _field_of(spec["partitionBy"], "partitionBy") if spec.get("partitionBy") is not None else None
+    sort_fields = list(spec.get("sortBy") or {})
+    lookahead = max([o.hi for o in outputs if o.kind == "sliding" and o.hi > 0], default=0)
+    if any(o.kind == "partition" for o in outputs) and totals is None:
+        raise ValueError("outputs without a window need partition_totals()")
+
+    seen = set()
+    current = object()
+    pending = deque()  # (row, document) held back for look-ahead windows
+    windows, row = {}, 0
+    rank = dense = 0
+    previous_key = object()
+
+    def emit(through):
+        # finish every held-back row whose look-ahead is satisfied (all of them when through is None)
+        while pending and (through is None or pending[0][0] + lookahead <= through):
+            i, doc = pending.popleft()
+            for output in outputs:
+                if output.kind == "sliding":
+                    doc[output.name] = windows[output.name].result(i)
+                elif output.kind == "partition":
+                    doc[output.name] = totals[output.name].get(current)
+            yield doc
+
+    for doc in documents:
+        key = _lookup(doc, partition_field) if partition_field else None
+        if key != current:
+            yield from emit(None)
+            if key in seen:
+                raise ValueError(f"input is not sorted by partitionBy: {key!r} appears again")
+            seen.add(key)
+            current, row, rank, dense, previous_key = key, 0, 0, 0, object()
+            windows = {o.name: _SlidingWindow(o.op, o.lo, o.hi) for o in outputs if o.kind == "sliding"}
+
+        sort_key = tuple(_lookup(doc, f) for f in sort_fields)
+        if sort_key != previous_key:
+            rank, dense, previous_key = row + 1, dense + 1, sort_key
+        for output in outputs:
+            if output.kind == "rank":
+                doc[output.name] = {"$rank": rank, "$denseRank": dense, "$documentNumber": row + 1}[output.op]
+            elif output.kind == "sliding":
+                windows[output.name].arrive(row, None if output.field is None else _lookup(doc, output.field))
+        pending.append((row, doc))
+        yield from emit(row)
+        row += 1
+    yield from emit(None)
+
+
+def _window_cursor(collection, spec, filter, batch_size):
+    sort = []
+    if spec.get("partitionBy") is not None:
+        sort.append((_field_of(spec["partitionBy"], "partitionBy"), 1))
+    sort.extend((spec.get("sortBy") or {}).items())
+    cursor = collection.find(filter or {})
+    if sort:
+        cursor = cursor.sort(sort)
+    return cursor.batch_size(batch_size)
+
+
+def stream_window_fields(collection, spec, filter=None, batch_size=DEFAULT_BATCH_SIZE):
+    """$setWindowFields `spec` over collection.find(filter), yielded as lists of at most batch_size documents."""
+    totals = partition_totals(collection, spec, filter)
+    documents = evaluate_windows(_window_cursor(collection, spec, filter, batch_size), spec, totals)
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_pipeline(collection, pipeline, batch_size=DEFAULT_BATCH_SIZE):
+    """A [$match]* [$sort] $setWindowFields pipeline (the #39–#42 / #54 shape) through the streaming evaluator."""
+    filter, spec = {}, None
+    for stage in pipeline:
+        (name, body), = stage.items()
+        if name == "$match" and spec is None:
+            filter = {"$and": [filter, body]} if filter else body
+        elif name == "$sort" and spec is None:
+            continue  # $setWindowFields re-sorts by its own sortBy
+        elif name == "$setWindowFields" and spec is None:
+            spec = body
+        else:
+            raise NotImplementedError(f"{name} is not supported around $setWindowFields by the streaming evaluator")
+    if spec is None:
+        raise ValueError("pipeline has no $setWindowFields stage")
+    return stream_window_fields(collection, spec, filter, batch_size)
+
+
+# ============================================================
+# 📏 SERVER WINDOWS VS STREAMING, #39–#42 AND #54
+# ============================================================
+
+# Not among the examples, but $count is the one sliding op with no field to read
+COUNT_CASE = ("cnt", [{"$match": {"symbol": {"$in": ["AAPL", "MSFT"]}}},
+                      {"$setWindowFields": {"partitionBy": "$symbol", "sortBy": {"date": 1}, "output": {
+                          "docs_last_5": {"$count": {}, "window": {"documents": [-4, "current"]}},
+                          "docs_around": {"$count": {}, "window": {"documents": [-1, 1]}}}}}])
+
+
+def window_examples():
+    """(example number, pipeline) for the $setWindowFields examples, plus COUNT_CASE."""
+    from mongo_query_capture import capture_examples
+
+    return [(call.example, call.pipeline) for call in capture_examples(mongo_query_examples)
+            if call.pipeline and any("$setWindowFields" in stage for stage in call.pipeline)] + [COUNT_CASE]
+
+
+def _close(a, b, rel_tol=1e-9):
+    # running sums and the server's prefix sums round differently in the last bits
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_close(x, y, rel_tol) for x, y in zip(a, b))
+    if _number(a) and _number(b):
+        return math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-12)
+    return a == b
+
+
+def compare_examples(collection, batch_size=DEFAULT_BATCH_SIZE):
+    """One row per window example: seconds and peak MB for aggregate() vs streaming, and whether outputs match."""
+    from mongo_frame_bridge import measure_peak
+
+    rows = []
+    for number, pipeline in window_examples():
+        spec = next(stage["$setWindowFields"] for stage in pipeline if "$setWindowFields" in stage)
+        names = list(spec["output"])
+        expected, server_peak, server_s = measure_peak(lambda: list(collection.aggregate(pipeline)))
+        expected = {doc["_id"]: [doc.get(n) for n in names] for doc in expected}
+
+        def streamed():
+            # checked batch by batch so the measured peak is the evaluator's, not a copy of the result
+            seen = wrong = largest = 0
+            for batch in stream_pipeline(collection, pipeline, batch_size):
+                largest = max(largest, len(batch))
+                seen += len(batch)
+                wrong += sum(not _close([doc.get(n) for n in names], expected.get(doc["_id"])) for doc in batch)
+            return seen, wrong, largest
+
+        (seen, wrong, largest), peak, seconds = measure_peak(streamed)
+        same = seen == len(expected) and not wrong
+        rows.append({"example": number, "docs": seen, "server_s": server_s, "stream_s": seconds,
+                     "server_mb": server_peak / 2 ** 20, "stream_mb": peak / 2 ** 20,
+                     "largest_batch": largest, "same": same})
+    return rows
+
+
+def main(argv=None):
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="Streaming $setWindowFields vs aggregate() for #39–#42 / #54")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    collection = seed_market_data(connect(args.backend, args.uri), args.size)
+    print(f"{'#':>3} {'docs':>9} {'server s':>9} {'stream s':>9} {'server MB':>10} {'stream MB':>10}  same")
+    for r in compare_examples(collection, args.batch_size):
+        print(f"{r['example']:>3} {r['docs']:>9,} {r['server_s']:>9.2f} {r['stream_s']:>9.2f} "
+              f"{r['server_mb']:>10.1f} {r['stream_mb']:>10.1f}  {'✅' if r['same'] else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
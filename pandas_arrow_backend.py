@@ -0,0 +1,220 @@
+import argparse
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow not installed — only the NumPy backend is available
+    pa = None
+
+from pandas_utils import pandas_query_examples
+
+
+# ============================================================
+# 🏹 PYARROW DTYPE BACKEND FOR THE PANDAS EXAMPLE SUITE
+# ============================================================
+#
+# Built from documents, market_data's symbol / sector are object strings and
+# every string example (#11 unique, #18 value_counts, #33 replace, #57
+# symbol + "_" + sector) walks Python objects.  to_backend(df, "pyarrow")
+# rebuilds the frame with dtype_backend="pyarrow" (Arrow strings, nullable
+# Arrow numerics) and compare_backends() runs the whole suite under both:
+#
+#     frame = to_backend(df, "pyarrow")                  # or read_parquet(path, backend="pyarrow")
+#     report = compare_backends(df)                      # one row per example: ms / MB per backend
+#     report[report["fallback"] != ""]                   # examples whose result left Arrow
+#
+# ms comes from a run without tracemalloc, which would slow every Python
+# allocation and skew the ratio towards whichever backend allocates less; MB
+# from a second, traced run: the tracemalloc peak (NumPy / Python
+# allocations) plus the peak of a fresh Arrow memory pool that is the
+# default for just that run.  #28 / #29 are
+# skipped unless --skip is given.  `fallback` is "object" when an
+# Arrow run returned object-dtype data and "numpy" when it came back as plain
+# NumPy columns; `same` says whether both backends agree within tolerance
+# ("order" when they return the same rows with ties in a different order).
+
+BACKENDS = ("numpy", "pyarrow")
+SKIP_BY_DEFAULT = (28, 29)  # self-merge / self-join on symbol: quadratic in rows on either backend
+
+# pandas_questions' row-wise value_counts, on the market_data columns
+EXTRA_EXAMPLES = {
+    "questions: value_counts rows": lambda df: df.value_counts(),
+    "questions: value_counts subset": lambda df: df.value_counts(subset=["sector", "symbol"]),
+}
+
+
+def to_backend(frame, backend):
+    """market_data frame on the given backend: "numpy" (object strings, NumPy numbers) or "pyarrow"."""
+    if backend == "numpy":
+        strings = frame.select_dtypes(exclude=["number", "datetime", "bool"]).columns
+        numpy = frame.astype({c: object for c in strings})
+        for column in numpy.columns.difference(strings):
+            if isinstance(numpy[column].dtype, pd.ArrowDtype):
+                numpy[column] = numpy[column].to_numpy(dtype=numpy[column].dtype.numpy_dtype, na_value=np.nan)
+        return numpy
+    if backend == "pyarrow":
+        if pa is None:
+            raise ImportError("pyarrow is required for the pyarrow backend")
+        return frame.convert_dtypes(dtype_backend="pyarrow")
+    raise ValueError(f"unknown backend {backend!r} (expected numpy / pyarrow)")
+
+
+def read_parquet(path, backend="pyarrow", columns=None):
+    """pd.read_parquet straight into the chosen backend (no NumPy intermediate for pyarrow)."""
+    if backend == "pyarrow":
+        return pd.read_parquet(path, columns=columns, dtype_backend="pyarrow")
+    return to_backend(pd.read_parquet(path, columns=columns), backend)
+
+
+def _dtypes(result):
+    # the values' dtypes; a row index is only counted when it is the result itself
+    if isinstance(result, pd.DataFrame):
+        return list(result.dtypes)
+    if isinstance(result, pd.Series):
+        return [result.dtype]
+    if isinstance(result, pd.MultiIndex):
+        return [level.dtype for level in result.levels]
+    if isinstance(result, (pd.Index, np.ndarray, pd.api.extensions.ExtensionArray)):
+        return [result.dtype] if not isinstance(result, pd.RangeIndex) else []
+    return []
+
+
+def fallback(result):
+    """"object" / "numpy" when an Arrow-backend result holds object or plain NumPy data, else ""."""
+    dtypes = _dtypes(result)
+    if any(d == object for d in dtypes):
+        return "object"
+    if any(isinstance(d, np.dtype) and d.kind in "iufM" for d in dtypes):
+        return "numpy"
+    return ""
+
+
+def _arrow_pool():
+    # a proxy of the current default pool tracks its own peak (max_memory) from zero
+    return pa.proxy_memory_pool(pa.default_memory_pool()) if pa is not None else None
+
+
+def _prepared(frame, number, thunk):
+    examples = pandas_query_examples(frame)
+    examples.frame()  # the date-parsed copy is shared set-up, not the example's cost
+    return examples, thunk if thunk is not None else examples[number].thunk
+
+
+def _call(run, frame):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return run(frame)
+    except Exception as exc:
+        return exc
+
+
+def run_example(frame, number=None, name=None, thunk=None):
+    """
+    Run one example twice, each time on a fresh QueryExamples (so nothing is memoized):
+    - a timed run without tracemalloc, then a traced run for the memory peak
+    - returns (result or exception of the timed run, ms, MB)
+    """
+    examples, run = _prepared(frame, number, thunk)
+    start = time.perf_counter()
+    result = _call(run, examples.frame())
+    seconds = time.perf_counter() - start
+
+    examples, run = _prepared(frame, number, thunk)
+    pool = _arrow_pool()
+    if pool is not None:
+        previous = pa.default_memory_pool()
+        pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        _call(run, examples.frame())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if pool is not None:
+            pa.set_memory_pool(previous)
+    arrow_peak = pool.max_memory() or 0 if pool is not None else 0
+    return result, seconds * 1000, (peak + arrow_peak) / 1e6
+
+
+def compare_backends(frame, numbers=None, extras=True, rtol=1e-9, atol=1e-12):
+    """Run every example (plus the pandas_questions extras) on both backends; one row per example."""
+    from market_data_schema import EXPECTED_DIFFERENCES, results_match
+
+    frames = {backend: to_backend(frame, backend) for backend in BACKENDS}
+    entries = [(n, pandas_query_examples(None)[n].name, None) for n in (numbers or range(1, 76))]
+    if extras:
+        entries += [(None, name, thunk) for name, thunk in EXTRA_EXAMPLES.items()]
+    rows = []
+    for number, name, thunk in entries:
+        row = {"example": number if number is not None else "-", "name": name}
+        results = {}
+        for backend in BACKENDS:
+            result, ms, mb = run_example(frames[backend], number, name, thunk)
+            results[backend] = result
+            row[f"{backend}_ms"] = round(ms, 2)
+            row[f"{backend}_MB"] = round(mb, 2)
+            row[f"{backend}_error"] = type(result).__name__ if isinstance(result, Exception) else ""
+        arrow = results["pyarrow"]
+        row["fallback"] = "" if isinstance(arrow, Exception) else fallback(arrow)
+        if any(isinstance(r, Exception) for r in results.values()):
+            row["same"] = row["numpy_error"] == row["pyarrow_error"]
+        elif name in EXPECTED_DIFFERENCES or results_match(results["numpy"], arrow, rtol, atol):
+            row["same"] = True
+        elif isinstance(arrow, (pd.DataFrame, pd.Series)) and results_match(
+                results["numpy"].sort_index(), arrow.sort_index(), rtol, atol):
+            row["same"] = "order"
+        else:
+            row["same"] = False
+        row["speedup"] = round(row["numpy_ms"] / row["pyarrow_ms"], 2) if row["pyarrow_ms"] else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def frame_memory(frame):
+    """Deep memory (MB) of the frame itself on each backend."""
+    return {backend: round(to_backend(frame, backend).memory_usage(deep=True).sum() / 1e6, 2) for backend in BACKENDS}
+
+
+def main(argv=None):
+    from market_data_generator import market_data_frame
+
+    parser = argparse.ArgumentParser(description="pandas_query_examples on the NumPy vs the PyArrow dtype backend")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--examples", type=int, nargs="*")
+    parser.add_argument("--skip", type=int, nargs="*", default=list(SKIP_BY_DEFAULT),
+                        help=f"examples to leave out (default {list(SKIP_BY_DEFAULT)}; --skip with no numbers runs all)")
+    parser.add_argument("--out", help="also save the per-example report as CSV")
+    args = parser.parse_args(argv)
+
+    frame = market_data_frame(args.rows)
+    print(f"🏹 frame memory (MB): {frame_memory(frame)}")
+    numbers = [n for n in (args.examples or range(1, 76)) if n not in args.skip]
+    skipped = [n for n in (args.examples or range(1, 76)) if n in args.skip]
+    if skipped:
+        print(f"⏭️  skipping {skipped}" + (" (self-merge / self-join on symbol: quadratic in rows on either backend)"
+                                          if set(skipped) <= set(SKIP_BY_DEFAULT) else ""))
+    report = compare_backends(frame, numbers)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(report.drop(columns=["numpy_error", "pyarrow_error"]).to_string(index=False))
+    ok = report[(report["numpy_error"] == "") & (report["pyarrow_error"] == "")]
+    print(f"⏱️  total {ok['numpy_ms'].sum():,.0f} ms (numpy) vs {ok['pyarrow_ms'].sum():,.0f} ms (pyarrow) "
+          f"over {len(ok)} examples that run on both")
+    print(f"↩️  object fallback: {report.loc[report['fallback'] == 'object', 'example'].tolist()}")
+    print(f"↩️  NumPy fallback: {report.loc[report['fallback'] == 'numpy', 'example'].tolist()}")
+    failing = report[(report["numpy_error"] != "") | (report["pyarrow_error"] != "")]
+    for row in failing.itertuples(index=False):
+        print(f"⚠️  #{row.example} {row.name}: numpy {row.numpy_error or 'ok'}, pyarrow {row.pyarrow_error or 'ok'}")
+    different = ok.loc[ok["same"].eq(False), "example"].tolist()  # one-sided errors are listed above
+    print("✅ both backends agree" if not different else f"❌ results differ for {different}")
+    if args.out:
+        report.to_csv(args.out, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from market_data_schema import results_match
+from pandas_utils import pandas_query_examples
+
+
+# ============================================================
+# 🏎️ VECTORIZED FAST PATHS FOR THE APPLY-BASED EXAMPLES
+# ============================================================
+#
+# Every pair below is (the original lambda-through-pandas version, the
+# vectorized / cythonized equivalent).  #19, #48, #63 and #73 come straight
+# from pandas_query_examples(df) and pandas_query_examples(df, fast=True); the
+# agg(lambda ...) pairs mirror pandas_aggregations (daily revenue) and
+# pandas_eda_analysis (mean speed per animal) on frames of the same shape,
+# since importing those scripts runs them:
+#
+#     check_equivalence(10_000)          # [{"pair": ..., "match": True}, ...]
+#     speedup_report([100_000, 1_000_000, 10_000_000])   # rows/s per pair and size
+#     python pandas_fast_paths.py --sizes 100000 1000000 10000000 --out fast_paths.md
+#
+# The slow variants run at up to --slow-cap rows; past that their rows/s is
+# measured on the first --slow-cap rows (marked *) so a 1e7-row report
+# doesn't spend an hour in a row-wise apply.
+
+DEFAULT_SIZES = [100_000, 1_000_000, 10_000_000]
+DEFAULT_SLOW_CAP = 1_000_000
+
+
+def sales_frame(n, seed=0):
+    """Rows with the columns of pandas_aggregations.df_time (sales plus the derived date features), sorted by Date."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-01", "2025-06-30", freq="D")
+    units = rng.integers(1, 50, n)
+    price = rng.integers(200, 2000, n)
+    discount = rng.choice([0, 5, 10, 15, 20], n)
+    frame = pd.DataFrame({"Date": rng.choice(dates, n), "Revenue": units * price * (1 - discount / 100)})
+    frame = frame.assign(
+        Region=rng.choice(np.array(["North", "South", "East", "West"], dtype=object), n),
+        Salesperson=rng.choice(np.array(["Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona"], dtype=object), n),
+        Product=rng.choice(np.array(["Laptop", "Phone", "Tablet", "Monitor", "Keyboard"], dtype=object), n),
+        Units_Sold=units,
+        Unit_Price=price,
+        Discount=discount,
+        Customer_Rating=rng.choice([1, 2, 3, 4, 5], n),
+        Profit=frame["Revenue"] * rng.uniform(0.1, 0.3, n),
+        Month=frame["Date"].dt.month_name(),
+        Weekday=frame["Date"].dt.day_name(),
+        Week_Number=frame["Date"].dt.isocalendar().week,
+        Quarter=frame["Date"].dt.quarter,
+    )
+    columns = ["Date", "Region", "Salesperson", "Product", "Units_Sold", "Unit_Price", "Discount", "Customer_Rating",
+               "Revenue", "Profit", "Month", "Weekday", "Week_Number", "Quarter"]
+    return frame[columns].sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+def speeds_frame(n, seed=0):
+    """Living Being / Max Speed rows shaped like pandas_eda_analysis.new_df."""
+    rng = np.random.default_rng(seed)
+    beings = np.array(["Falcon", "Parrot", "Lion", "Man"], dtype=object)
+    return pd.DataFrame({"Living Being": rng.choice(beings, n), "Max Speed": np.round(rng.uniform(10, 400, n), 1)})
+
+
+def _example_pair(number):
+    # building the examples runs nothing, so no frame is needed to get at the thunks
+    return pandas_query_examples(None)[number].thunk, pandas_query_examples(None, fast=True)[number].thunk
+
+
+def _market_frame(n, seed=0):
+    from market_data_generator import market_data_frame
+
+    return market_data_frame(n, seed, chunk=min(max(n, 1), 1_000_000))
+
+
+# name → (frame builder, slow, fast)
+PAIRS = {
+    "#19 squared returns": (_market_frame, *_example_pair(19)),
+    "#48 row-wise price × return": (_market_frame, *_example_pair(48)),
+    "#63 Positive / Negative label": (_market_frame, *_example_pair(63)),
+    "#73 share of returns > 1% per sector": (_market_frame, *_example_pair(73)),
+    "aggregations: daily revenue agg(lambda x: x.sum())": (
+        sales_frame,
+        lambda df: df.groupby(by=["Date"], group_keys=True)[["Revenue"]].agg(lambda x: x.sum()),
+        lambda df: df.groupby(by=["Date"], group_keys=True)[["Revenue"]].sum(),
+    ),
+    "eda: mean speed agg(lambda x: x.values.mean())": (
+        speeds_frame,
+        lambda df: df.groupby(by=["Living Being"], group_keys=True)[["Max Speed"]].agg(lambda x: x.values.mean()),
+        lambda df: df.groupby(by=["Living Being"], group_keys=True)[["Max Speed"]].mean(skipna=False),  # values.mean() propagates NaN
+    ),
+}
+
+
+def check_equivalence(n=10_000, seed=0, rtol=1e-9, atol=1e-12):
+    """Run both variants of every pair on the same frame; one row per pair with match True / False."""
+    rows, frames = [], {}
+    for name, (build, slow, fast) in PAIRS.items():
+        if build not in frames:
+            frames[build] = build(n, seed)
+        frame = frames[build]
+        frame_with_nan = frame.copy()
+        numeric = frame_with_nan.select_dtypes("number").columns
+        frame_with_nan.loc[frame_with_nan.index[::97], numeric] = np.nan  # missing values take the same path
+        rows.append({"pair": name, "rows": n, "match": all(
+            results_match(slow(f), fast(f), rtol, atol) for f in (frame, frame_with_nan))})
+    return rows
+
+
+def _rows_per_second(fn, frame, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - start)
+    return len(frame) / best
+
+
+def speedup_report(sizes=DEFAULT_SIZES, slow_cap=DEFAULT_SLOW_CAP, repeat=3, seed=0):
+    """rows/s of the slow and fast variant of every pair at every size, as a DataFrame."""
+    rows = []
+    for n in sizes:
+        frames = {}
+        for name, (build, slow, fast) in PAIRS.items():
+            if build not in frames:
+                frames[build] = build(n, seed)
+            frame = frames[build]
+            sampled = len(frame) > slow_cap
+            slow_rate = _rows_per_second(slow, frame.iloc[:slow_cap] if sampled else frame, 1 if sampled else repeat)
+            fast_rate = _rows_per_second(fast, frame, repeat)
+            rows.append({"pair": name, "rows": n, "slow_rows_per_s": slow_rate, "fast_rows_per_s": fast_rate,
+                         "speedup": fast_rate / slow_rate, "slow_sampled": sampled})
+        del frames
+    return pd.DataFrame(rows)
+
+
+def format_report(report):
+    """The speed-up report as a Markdown table."""
+    lines = ["| pair | rows | slow rows/s | fast rows/s | speed-up |", "|---|---:|---:|---:|---:|"]
+    for r in report.itertuples(index=False):
+        star = "*" if r.slow_sampled else ""
+        lines.append(f"| {r.pair} | {r.rows:,} | {r.slow_rows_per_s:,.0f}{star} | {r.fast_rows_per_s:,.0f} | "
+                     f"{r.speedup:,.1f}x |")
+    if report["slow_sampled"].any():
+        lines.append("")
+        lines.append("\\* slow variant measured on its first rows only (see --slow-cap)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Equivalence and speed-up of the vectorized fast paths")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES)
+    parser.add_argument("--slow-cap", type=int, default=DEFAULT_SLOW_CAP)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write the Markdown report here as well")
+    args = parser.parse_args(argv)
+
+    checks = check_equivalence()
+    for row in checks:
+        print(f"{'✅' if row['match'] else '❌'} {row['pair']}")
+    if not all(row["match"] for row in checks):
+        raise SystemExit("fast paths disagree with the originals")
+
+    report = format_report(speedup_report(args.sizes, args.slow_cap, args.repeat))
+    print(report)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 🪶 LAZY UPSAMPLING INSTEAD OF MATERIALIZED resample().ffill()
+# ============================================================
+#
+# pandas_resample.py upsamples with n_df.resample('D').ffill() and
+# df_d.resample('h').sum(): month-end rows become ~30 daily copies of the same
+# values, daily rows become 24 hourly rows that are mostly 0.  UpsampledView
+# keeps only the source rows and the target frequency, and answers from them:
+#
+#     view = upsample(n_df, "D")                       # how="ffill" | "bfill" | "asfreq" | "sum" | "mean" | ...
+#     view.loc["2025-11-17"]                           # one day: binary search, nothing materialized
+#     view.loc["2025-11-01":"2025-11-30"]              # just those 30 rows, as resample('D').ffill() has them
+#     view.iloc[-48:]                                  # positions work too
+#     view.sum("2025-11-01", "2026-06-30")             # aggregate over the range without building it
+#     view.to_frame()                                  # == n_df.resample("D").ffill()
+#
+# The view is a list of runs — grid positions [start, stop) that all hold
+# the same source row — plus the value of positions outside every run (NaN,
+# or 0 for sum / count).  ffill / bfill give one run per source row, asfreq
+# and the aggregations one single-position run per occupied bin.  A lookup
+# or slice finds its runs with searchsorted and only builds the rows asked
+# for; sum / mean / count / min / max weight each run by its overlap with
+# the range, so they cost O(log n + runs in range) whatever the grid size.
+#
+# The grid is the one resample() uses (origin "start_day", left-labelled
+# bins), so rules must be fixed durations ("h", "15min", ..., and "D" when
+# the index has no time zone); calendar rules (ME, W, QE, ...) are refused.
+# Aggregations use the numeric columns.
+
+FILL_METHODS = ("ffill", "bfill", "asfreq")
+AGGREGATIONS = ("sum", "mean", "count", "min", "max", "first", "last", "median")
+_ZERO_FILLED = ("sum", "count")
+
+
+def _step(rule, tz):
+    offset = pd.tseries.frequencies.to_offset(rule)
+    if isinstance(offset, pd.offsets.Day) and tz is None:
+        return offset, offset.n * pd.Timedelta(days=1).value  # calendar days are 24h without a time zone
+    if not isinstance(offset, pd.offsets.Tick):
+        raise ValueError(f"{rule!r} is a calendar frequency here; only fixed durations (h, min, ...; D on naive "
+                         "indexes) can be viewed lazily")
+    return offset, pd.Timedelta(offset).value
+
+
+class _Indexer:
+    # view.loc[...] / view.iloc[...]
+    def __init__(self, view, by_label):
+        self.view, self.by_label = view, by_label
+
+    def __getitem__(self, key):
+        view = self.view
+        if isinstance(key, slice):
+            if self.by_label:
+                if key.step is not None:
+                    raise ValueError("label slices don't take a step")
+                return view._take(np.arange(*view._label_range(key.start, key.stop)))
+            return view._take(np.arange(*key.indices(len(view))))
+        if self.by_label:
+            return view._point(view._position_of(key))
+        position = int(key) + (len(view) if key < 0 else 0)
+        if not 0 <= position < len(view):
+            raise IndexError(f"position {key} is out of bounds for {len(view):,} rows")
+        return view._point(position)
+
+
+class UpsampledView:
+    """
+    frame.resample(rule).<how>() without building it:
+    - loc / iloc: point lookups and slices, materializing only the rows asked for
+    - sum / mean / count / min / max over a label range, straight from the source rows
+    - to_frame(): the whole thing, as resample() would return it
+    """
+
+    def __init__(self, frame, rule, how="ffill"):
+        if how not in FILL_METHODS + AGGREGATIONS:
+            raise ValueError(f"unknown how {how!r} (expected one of {FILL_METHODS + AGGREGATIONS})")
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            raise TypeError("upsampling needs a DatetimeIndex")
+        if not frame.index.is_monotonic_increasing:
+            frame = frame.sort_index(kind="stable")
+        self.is_series = isinstance(frame, pd.Series)
+        self.name = frame.name if self.is_series else None  # to_frame() labels an unnamed Series 0
+        self.source = frame.to_frame() if self.is_series else frame
+        self.rule, self.how = rule, how
+        index = self.source.index
+        self.tz, self.unit = index.tz, index.unit
+        self.offset, self.step = _step(rule, self.tz)
+        times = index.as_unit("ns").asi8
+        if len(times):
+            origin = index[0].normalize().as_unit("ns").value
+            self.first = origin + (times[0] - origin) // self.step * self.step
+            self.length = int((times[-1] - self.first) // self.step + 1)
+        else:
+            self.first, self.length = 0, 0
+        self.values, self.starts, self.stops = self._runs(times)
+        self.fill = 0 if how in _ZERO_FILLED else np.nan
+
+    def _runs(self, times):
+        # (one source-derived row per run, run start positions, run stop positions)
+        floor = (times - self.first) // self.step
+        if self.how == "ffill":
+            ceil = -((self.first - times) // self.step)
+            last = np.append(ceil[1:] != ceil[:-1], True) & (ceil < self.length)  # a later row on the same point wins
+            starts = ceil[last]
+            return self.source.iloc[np.flatnonzero(last)], starts, np.append(starts[1:], self.length)
+        if self.how == "bfill":
+            starts = np.concatenate(([0], floor[:-1] + 1))
+            stops = floor + 1
+            keep = stops > starts  # rows sharing a grid interval: the earliest one is the one bfill finds
+            return self.source.iloc[np.flatnonzero(keep)], starts[keep], stops[keep]
+        if self.how == "asfreq":
+            on_grid = (times - self.first) % self.step == 0
+            last = on_grid & np.append(floor[1:] != floor[:-1], True)
+            return self.source.iloc[np.flatnonzero(last)], floor[last], floor[last] + 1
+        binned = self.source.groupby(floor).agg(self.how)
+        starts = binned.index.to_numpy(dtype=np.int64)
+        return binned.reset_index(drop=True), starts, starts + 1
+
+    # ---------- the grid ----------
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,) if self.is_series else (self.length, self.source.shape[1])
+
+    def _labels(self, positions):
+        labels = pd.DatetimeIndex(np.asarray(self.first + positions * self.step, dtype="datetime64[ns]"))
+        if self.tz is not None:
+            labels = labels.tz_localize("UTC").tz_convert(self.tz)
+        labels = labels.as_unit(self.unit)
+        if len(positions) > 1 and np.all(np.diff(positions) == 1):
+            labels.freq = self.offset
+        return labels
+
+    def _ns(self, label):
+        stamp = pd.Timestamp(label)
+        if self.tz is not None and stamp.tz is None:
+            stamp = stamp.tz_localize(self.tz)
+        return stamp.as_unit("ns").value
+
+    def _position_of(self, label):
+        offset = self._ns(label) - self.first
+        if offset % self.step or not 0 <= offset // self.step < self.length:
+            raise KeyError(label)
+        return int(offset // self.step)
+
+    def _label_range(self, start, stop):
+        # positions [i, j) of the labels between start and stop, both inclusive like .loc
+        i = 0 if start is None else max(-((self.first - self._ns(start)) // self.step), 0)
+        j = self.length if stop is None else min((self._ns(stop) - self.first) // self.step + 1, self.length)
+        return int(i), int(max(j, i))
+
+    @property
+    def loc(self):
+        return _Indexer(self, by_label=True)
+
+    @property
+    def iloc(self):
+        return _Indexer(self, by_label=False)
+
+    # ---------- materializing ----------
+
+    def _run_of(self, positions):
+        runs = np.searchsorted(self.starts, positions, side="right") - 1
+        inside = (runs >= 0) & (positions < self.stops[np.maximum(runs, 0)]) if len(self.starts) else runs >= 0
+        return np.maximum(runs, 0), inside
+
+    def _take(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        runs, inside = self._run_of(positions)
+        if len(self.values):
+            rows = self.values.iloc[runs].set_axis(self._labels(positions))
+        else:
+            rows = pd.DataFrame(index=self._labels(positions), columns=self.values.columns, dtype=np.float64)
+        if not inside.all():
+            rows = rows.where(pd.Series(inside, index=rows.index), self.fill, axis=0)
+        rows.index.name = self.source.index.name
+        if not self.is_series:
+            return rows
+        series = rows.iloc[:, 0]
+        series.name = self.name
+        return series
+
+    def _point(self, position):
+        runs, inside = self._run_of(np.array([position]))
+        if inside[0]:
+            row = self.values.iloc[runs[0]]
+        else:
+            row = pd.Series(self.fill, index=self.values.columns, dtype=np.float64 if np.isnan(self.fill) else None)
+        return row.iloc[0] if self.is_series else row.rename(self._labels(np.array([position]))[0])
+
+    def to_frame(self):
+        """Everything, as frame.resample(rule).<how>() returns it."""
+        return self._take(np.arange(self.length))
+
+    # ---------- aggregations over a range ----------
+
+    def _overlap(self, start, end):
+        i, j = self._label_range(start, end)
+        lo = np.searchsorted(self.stops, i, side="right")
+        hi = np.searchsorted(self.starts, j, side="left")
+        lengths = np.minimum(self.stops[lo:hi], j) - np.maximum(self.starts[lo:hi], i)
+        numeric = self.values.iloc[lo:hi].select_dtypes("number")
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        uncovered = (j - i) - int(lengths.sum())
+        return numeric.columns, values, lengths, uncovered if not np.isnan(self.fill) else 0
+
+    def _result(self, columns, values):
+        result = pd.Series(values, index=columns)
+        return result.iloc[0] if self.is_series else result
+
+    def count(self, start=None, end=None):
+        """Non-missing values per column between two labels (inclusive), without materializing."""
+        columns, values, lengths, filled = self._overlap(start, end)
+        return self._result(columns, (~np.isnan(values) * lengths[:, None]).sum(axis=0) + filled)
+
+    def sum(self, start=None, end=None):
+        """Column sums between two labels (inclusive), without materializing."""
+        columns, values, lengths, filled = self._overlap(start, end)
+        return self._result(columns, np.nansum(values * lengths[:, None], axis=0) + (filled * self.fill if filled else 0))
+
+    def mean(self, start=None, end=None):
+        """Column means between two labels (inclusive), without materializing."""
+        with np.errstate(invalid="ignore"):
+            return self.sum(start, end) / self.count(start, end)  # nothing to average → NaN
+
+    def _extreme(self, reduce, start, end):
+        columns, values, _, filled = self._overlap(start, end)
+        if filled:
+            values = np.vstack([values, np.full((1, len(columns)), self.fill, dtype=np.float64)])
+        present = ~np.isnan(values)
+        result = np.full(len(columns), np.nan)
+        for k in range(len(columns)):
+            if present[:, k].any():
+                result[k] = reduce(values[present[:, k], k])
+        return self._result(columns, result)
+
+    def min(self, start=None, end=None):
+        """Column minimums between two labels (inclusive), without materializing."""
+        return self._extreme(np.min, start, end)
+
+    def max(self, start=None, end=None):
+        """Column maximums between two labels (inclusive), without materializing."""
+        return self._extreme(np.max, start, end)
+
+    # ---------- footprint ----------
+
+    def memory_usage(self):
+        """Bytes held by the view (source-derived rows + run bounds)."""
+        return int(self.values.memory_usage(deep=True).sum() + self.starts.nbytes + self.stops.nbytes)
+
+    def __repr__(self):
+        return (f"UpsampledView({self.how}, rule={self.rule!r}, {self.length:,} rows from "
+                f"{len(self.source):,} source rows in {len(self.starts):,} runs)")
+
+
+def upsample(frame, rule, how="ffill"):
+    """A lazy frame.resample(rule).<how>(): how is ffill / bfill / asfreq or a bin aggregation (sum, mean, ...)."""
+    return UpsampledView(frame, rule, how)
+
+
+# ============================================================
+# 🧪 DEMO: pandas_resample's frames, over years of history
+# ============================================================
+
+def month_end_frame(years=30, seed=0):
+    """open / high / close / volume at month ends with ~20% gaps filled like pandas_resample.n_df."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2000-01-31", periods=12 * years, freq="ME")
+    frame = pd.DataFrame(rng.standard_normal((len(index), 4)), index=index, columns=["open", "high", "close", "volume"])
+    return frame.mask(rng.random(frame.shape) < 0.2).ffill().bfill()
+
+
+def daily_sales_frame(years=30, seed=0):
+    """Daily Sales like pandas_resample.df_d."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2000-01-01", periods=365 * years, freq="D")
+    return pd.DataFrame({"Sales": rng.integers(100, 500, len(index))}, index=index)
+
+
+def check_against_resample(frame, rule, how, probes=20, seed=0):
+    """to_frame(), random loc / iloc lookups, slices and range aggregations vs frame.resample(rule).<how>()."""
+    from market_data_schema import results_match
+
+    view = upsample(frame, rule, how)
+    expected = getattr(frame.resample(rule), how)()
+    checks = [results_match(expected, view.to_frame(), 0, 0)]
+    rng = np.random.default_rng(seed)
+    for _ in range(probes):
+        i, j = np.sort(rng.integers(0, len(expected), 2))
+        start, end = expected.index[i], expected.index[j]
+        window = expected.loc[start:end]
+        checks += [
+            results_match(expected.iloc[i], view.iloc[i], 0, 0),
+            results_match(expected.loc[start], view.loc[start], 0, 0),
+            results_match(window, view.loc[start:end], 0, 0),
+            results_match(expected.iloc[i:j:3], view.iloc[i:j:3], 0, 0),
+        ]
+        numeric = window if isinstance(window, pd.Series) else window.select_dtypes("number")
+        for name in ("sum", "mean", "count", "min", "max"):
+            checks.append(results_match(getattr(numeric, name)(), getattr(view, name)(start, end), 1e-9, 1e-9))
+    return all(checks)
+
+
+def _seconds(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lazy upsampled views vs materialized resample()")
+    parser.add_argument("--years", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    month_end, daily = month_end_frame(args.years), daily_sales_frame(args.years)
+    cases = [(month_end, "D", "ffill"), (month_end, "D", "bfill"), (month_end, "D", "asfreq"),
+             (daily, "h", "sum"), (daily, "h", "ffill"), (daily, "min", "mean")]
+    small = [(month_end_frame(2), rule, how) for _, rule, how in cases[:3]]
+    small += [(daily_sales_frame(1), rule, how) for _, rule, how in cases[3:]]
+    same = all(check_against_resample(frame, rule, how) for frame, rule, how in small)
+    print("✅ lookups, slices and range aggregations match resample()" if same else "❌ views differ from resample()")
+
+    for frame, rule, how in cases:
+        view, built = _seconds(lambda: upsample(frame, rule, how))
+        dense, dense_s = _seconds(lambda: getattr(frame.resample(rule), how)())
+        dense_mb = dense.memory_usage(deep=True).sum() / 1e6
+        middle = dense.index[len(dense) // 2]
+        _, point_s = _seconds(lambda: view.loc[middle])
+        _, slice_s = _seconds(lambda: view.loc[middle:middle + pd.Timedelta("30D")])
+        _, sum_s = _seconds(lambda: view.sum(dense.index[0], dense.index[-1]))
+        print(f"🪶 {len(frame):,} rows → resample({rule!r}).{how}(): {len(dense):,} rows, {dense_mb:,.1f} MB in "
+              f"{dense_s * 1000:,.1f} ms | view {view.memory_usage() / 1e6:,.3f} MB in {built * 1000:,.1f} ms, "
+              f"point {point_s * 1000:.2f} ms, 30-day slice {slice_s * 1000:.2f} ms, full-range sum {sum_s * 1000:.2f} ms")
+        del dense
+
+
+if __name__ == "__main__":
+    main()
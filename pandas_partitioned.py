@@ -0,0 +1,467 @@
+import argparse
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow not installed — partitioned datasets can't be read or written
+    pa = pc = pq = None
+
+
+# ============================================================
+# 🗂️ OUT-OF-CORE PANDAS EXAMPLES OVER DATE-PARTITIONED PARQUET
+# ============================================================
+#
+# pandas_query_examples(df) needs the whole market_data frame in memory.  For
+# history that doesn't fit, the filter / projection / sort / value_counts /
+# groupby / describe / correlation examples (#5–#10, #18, #21–#27, #39) run
+# here over month partitions instead, one partition at a time:
+#
+#     write_partitions("market_data/", generate_market_data(100_000_000))   # month=YYYY-MM/part-*.parquet
+#     dataset = PartitionedDataset("market_data/")
+#     run_example(dataset, 21)                                  # == pandas_query_examples(df)[21].result
+#     run_example(dataset, 6, start="2025-03-01", end="2025-06-30")   # only those months are opened
+#     for piece in iter_example(dataset, 9): ...                # a large result, streamed
+#
+# Each read asks Parquet for just the columns the example uses and pushes its
+# predicate (sector == "Tech", VaR > 0.05, the date range) into the reader,
+# which skips row groups by their statistics.  Each partition is reduced to a
+# small partial aggregate (counts, sums, means + M2, crosstabs, co-moment
+# matrices), and the partials are merged exactly; only describe's quartiles
+# come from a mergeable KLL sketch (quantile_sketch) and are approximate.  The
+# global sort (#9) slices the return range at sketch quantiles (a pass over
+# that one column), reads the dataset once more to spill every partition's
+# rows into one Parquet file per slice, then sorts one slice file at a time,
+# so peak memory follows the partition / slice size, not the dataset size.
+
+PARTITION_KEY = "month"
+NUMERIC = ["price", "volume", "VaR", "return", "sentiment_score", "default_flag"]
+DESCRIBE_ROWS = ["count", "mean", "min", "25%", "50%", "75%", "max", "std"]
+SORT_SLICE_ROWS = 1_000_000
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise ImportError("pyarrow is required for partitioned execution")
+
+
+def write_partitions(root, chunks, compression="zstd"):
+    """Write DataFrame chunks as root/month=YYYY-MM/part-NNNNN.parquet; returns {month: rows}."""
+    _require_pyarrow()
+    counts = {}
+    for i, frame in enumerate(chunks):
+        months = frame["date"].to_numpy().astype("datetime64[M]")
+        for month in np.unique(months):
+            part = frame[months == month]
+            directory = os.path.join(root, f"{PARTITION_KEY}={str(month)}")
+            os.makedirs(directory, exist_ok=True)
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            pq.write_table(table, os.path.join(directory, f"part-{i:05d}.parquet"), compression=compression)
+            counts[str(month)] = counts.get(str(month), 0) + len(part)
+    return counts
+
+
+class PartitionedDataset:
+    """A directory of month=YYYY-MM partitions; iter_frames() reads them one at a time."""
+
+    def __init__(self, root):
+        _require_pyarrow()
+        self.root = root
+        self.partitions = []
+        for name in sorted(os.listdir(root)):
+            if name.startswith(f"{PARTITION_KEY}="):
+                directory = os.path.join(root, name)
+                files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".parquet"))
+                self.partitions.append((pd.Period(name.split("=", 1)[1], "M"), files))
+
+    def __len__(self):
+        return len(self.partitions)
+
+    def _pruned(self, start, end):
+        start = pd.Timestamp(start).to_period("M") if start is not None else None
+        end = pd.Timestamp(end).to_period("M") if end is not None else None
+        return [(month, files) for month, files in self.partitions
+                if (start is None or month >= start) and (end is None or month <= end)]
+
+    def iter_frames(self, columns=None, filter=None, start=None, end=None):
+        """
+        One DataFrame per partition, restricted to `columns` and rows matching `filter` (a pyarrow expression):
+        - start / end (dates, inclusive) skip whole partitions and are pushed down inside the edge ones
+        """
+        if start is not None:
+            filter = _and(filter, pc.field("date") >= pd.Timestamp(start))
+        if end is not None:
+            filter = _and(filter, pc.field("date") <= pd.Timestamp(end))
+        for _, files in self._pruned(start, end):
+            tables = [pq.read_table(path, columns=columns, filters=filter) for path in files]
+            yield pa.concat_tables(tables).to_pandas()
+
+
+    def empty_frame(self, columns=None):
+        """A zero-row frame with the partitions' schema (restricted to `columns`), for ranges that match nothing."""
+        if not self.partitions:
+            return pd.DataFrame(columns=columns)
+        table = pq.read_schema(self.partitions[0][1][0]).empty_table()
+        return (table.select(columns) if columns is not None else table).to_pandas()
+
+
+def _and(left, right):
+    if left is None:
+        return right
+    return left if right is None else left & right
+
+
+# ============================================================
+# ➕ MERGEABLE PARTIAL AGGREGATES
+# ============================================================
+
+def _moments(grouped):
+    """count / mean / M2 (sum of squared deviations) per group — the mergeable form of mean and std."""
+    count = grouped.count()
+    mean = grouped.mean()
+    return pd.concat({"n": count, "mean": mean, "m2": grouped.var(ddof=0) * count}, axis=1)
+
+
+def _merge_moments(parts):
+    """Exact parallel merge of _moments() partials (Chan et al.)."""
+    stacked = pd.concat(parts)
+    level = list(range(stacked.index.nlevels))
+    n = stacked["n"].groupby(level=level).sum()
+    mean = (stacked["n"] * stacked["mean"].fillna(0)).groupby(level=level).sum() / n
+    deviation = stacked["mean"] - mean.reindex(stacked.index).to_numpy()
+    m2 = (stacked["m2"].fillna(0) + stacked["n"] * deviation.fillna(0) ** 2).groupby(level=level).sum()
+    return n, mean, m2
+
+
+def _sector_moments(columns):
+    def partial(frame):
+        grouped = frame.groupby("sector")
+        return pd.concat({c: _moments(grouped[c]) for c in columns}, axis=1)
+
+    return partial
+
+
+def _moment_column(parts, column):
+    return _merge_moments([p[column] for p in parts])
+
+
+def _std(n, m2):
+    return np.sqrt(m2 / (n - 1)).where(n > 1)
+
+
+def _summed(parts):
+    total = parts[0]
+    for part in parts[1:]:
+        total = total.add(part, fill_value=0)
+    return total
+
+
+def _describe_partial(frame):
+    from quantile_sketch import KLLSketch
+
+    stats = {}
+    for column in frame.columns:
+        values = frame[column]
+        dates = pd.api.types.is_datetime64_any_dtype(values)
+        if dates:  # moments and quantiles over nanoseconds, turned back into timestamps at the end
+            values = pd.Series(values.to_numpy("datetime64[ns]").astype(np.int64), index=values.index).where(values.notna())
+        elif not pd.api.types.is_numeric_dtype(values):
+            continue
+        values = values.astype(np.float64)
+        stats[column] = {
+            "dates": dates,
+            "moments": _moments(values.groupby(np.zeros(len(values), dtype=int))),  # one group: the partition
+            "min": values.min(), "max": values.max(),
+            "sketch": KLLSketch(seed=0).update(values.to_numpy()),
+        }
+    return stats
+
+
+def _describe_combine(parts):
+    columns = {}
+    for column in parts[0]:
+        n, mean, m2 = _merge_moments([p[column]["moments"] for p in parts])
+        if n.empty:  # no rows at all: describe() reports a zero count and nothing else
+            missing = pd.NaT if parts[0][column]["dates"] else np.nan
+            columns[column] = pd.Series({"count": 0, **{k: missing for k in DESCRIBE_ROWS[1:-1]}, "std": np.nan},
+                                        dtype=object if parts[0][column]["dates"] else np.float64)
+            continue
+        sketch = parts[0][column]["sketch"]
+        for p in parts[1:]:
+            sketch.merge(p[column]["sketch"])
+        q25, q50, q75 = sketch.quantiles([0.25, 0.5, 0.75])
+        values = {"count": n.iloc[0], "mean": mean.iloc[0], "min": min(p[column]["min"] for p in parts),
+                  "25%": q25, "50%": q50, "75%": q75, "max": max(p[column]["max"] for p in parts),
+                  "std": _std(n, m2).iloc[0]}
+        if parts[0][column]["dates"]:  # dates report as timestamps, count as a number
+            values = {k: (v if k in ("count", "std") else pd.Timestamp(int(v))) for k, v in values.items()}
+            values["std"] = np.nan
+        columns[column] = pd.Series(values).reindex(DESCRIBE_ROWS)
+    return pd.DataFrame(columns)
+
+
+def _comoments_partial(frame):
+    values = frame[NUMERIC].to_numpy(np.float64)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    return {"n": present.T.astype(np.float64) @ present, "sx": filled.T @ present,
+            "sxx": (filled ** 2).T @ present, "sxy": filled.T @ filled}
+
+
+def _correlation(parts):
+    n = sum(p["n"] for p in parts)
+    sx, sxx, sxy = (sum(p[key] for p in parts) for key in ("sx", "sxx", "sxy"))
+    sy, syy = sx.T, sxx.T  # pairwise sums over rows where both columns are present
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    np.fill_diagonal(corr, np.where(np.diag(n) > 1, 1.0, np.nan))
+    return pd.DataFrame(corr, index=NUMERIC, columns=NUMERIC)
+
+
+# ============================================================
+# 📚 THE PARTITIONED EXAMPLES
+# ============================================================
+
+class PartitionedExample:
+    """
+    One out-of-core example:
+    - columns / filter are pushed into every partition read
+    - partial(frame) reduces a partition; combine(partials) merges them (None = concatenate rows)
+    """
+
+    def __init__(self, name, columns=None, filter=None, partial=None, combine=None, stream=None):
+        self.name = name
+        self.columns = columns
+        self.filter = filter
+        self.partial = partial or (lambda frame: frame)
+        self.combine = combine
+        self.stream = stream
+
+    def pieces(self, dataset, start=None, end=None):
+        if self.stream is not None:
+            return self.stream(dataset, start, end)
+        filter = self.filter() if callable(self.filter) else self.filter
+        return (self.partial(frame) for frame in dataset.iter_frames(self.columns, filter, start, end))
+
+
+def _spill(writers, directory, key, table):
+    if key not in writers:
+        writers[key] = pq.ParquetWriter(os.path.join(directory, f"slice-{key}.parquet"), table.schema)
+    writers[key].write_table(table)
+
+
+def _sorted_slices(column, ascending, slice_rows=SORT_SLICE_ROWS):
+    import tempfile
+
+    from quantile_sketch import KLLSketch
+
+    def stream(dataset, start, end):
+        sketch = KLLSketch(seed=0)
+        for frame in dataset.iter_frames([column], None, start, end):
+            sketch.update(frame[column].to_numpy())
+        slices = max(1, math.ceil(sketch.n / slice_rows))
+        inner = np.unique(sketch.quantiles(np.arange(1, slices) / slices))  # slice k holds (inner[k-1], inner[k]]
+
+        with tempfile.TemporaryDirectory(prefix="sorted-slices-") as scratch:
+            writers = {}
+            try:
+                for frame in dataset.iter_frames(None, None, start, end):  # the one full read
+                    values = frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                    keys = np.where(np.isnan(values), -1, np.searchsorted(inner, values, side="left"))
+                    table = pa.Table.from_pandas(frame, preserve_index=False)
+                    order = np.argsort(keys, kind="stable")
+                    bounds = np.r_[0, np.cumsum(np.bincount(keys + 1, minlength=len(inner) + 2))]
+                    for key in np.flatnonzero(np.diff(bounds)) - 1:
+                        _spill(writers, scratch, key, table.take(order[bounds[key + 1]:bounds[key + 2]]))
+            finally:
+                for writer in writers.values():
+                    writer.close()
+
+            for key in (range(len(inner) + 1) if ascending else reversed(range(len(inner) + 1))):
+                if key in writers:
+                    frame = pq.read_table(os.path.join(scratch, f"slice-{key}.parquet")).to_pandas()
+                    yield frame.sort_values(column, ascending=ascending, ignore_index=True)
+            if -1 in writers:  # sort_values puts missing values last
+                yield pq.read_table(os.path.join(scratch, "slice--1.parquet")).to_pandas()
+
+    return stream
+
+
+def _mean_of(column, name=None):
+    def combine(parts):
+        _, mean, _ = _moment_column(parts, column)
+        return mean.rename(name if name is not None else column)
+
+    return combine
+
+
+def _value_counts(parts):
+    counts = _summed(parts).astype(np.int64).sort_values(ascending=False, kind="stable")
+    counts.index.name = "sector"
+    return counts.rename("count")
+
+
+def _mean_and_std(parts):
+    n, mean, m2 = _moment_column(parts, "return")
+    return pd.DataFrame({"avg_return": mean, "std_return": _std(n, m2)})
+
+
+def _agg_price_mean_var_max(frame):
+    grouped = frame.groupby("sector")
+    return pd.concat({"price": _moments(grouped["price"]), "VaR": grouped["VaR"].max().to_frame("max")}, axis=1)
+
+
+def _price_mean_var_max(parts):
+    return pd.DataFrame({"price": _mean_of("price")(parts),
+                         "VaR": pd.concat([p["VaR"]["max"] for p in parts]).groupby(level=0).max()})
+
+
+# filters are callables so the module imports without pyarrow
+PARTITIONED_EXAMPLES = {
+    5: PartitionedExample("Describe", partial=_describe_partial, combine=_describe_combine),
+    6: PartitionedExample("Filter Tech sector", filter=lambda: pc.field("sector") == "Tech"),
+    7: PartitionedExample("High VaR", filter=lambda: pc.field("VaR") > 0.05),
+    8: PartitionedExample("Select subset", columns=["symbol", "price", "VaR"]),
+    9: PartitionedExample("Sort by return", stream=_sorted_slices("return", ascending=False)),
+    10: PartitionedExample("Missing values", partial=lambda frame: frame.isna().sum(),
+                           combine=lambda parts: _summed(parts).astype(np.int64)),
+    18: PartitionedExample("Count by sector", columns=["sector"],
+                           partial=lambda frame: frame["sector"].value_counts(), combine=_value_counts),
+    21: PartitionedExample("Group by sector (mean price)", columns=["sector", "price"],
+                           partial=_sector_moments(["price"]), combine=_mean_of("price")),
+    22: PartitionedExample("Groupby with agg", columns=["sector", "price", "VaR"],
+                           partial=_agg_price_mean_var_max, combine=_price_mean_var_max),
+    23: PartitionedExample("Rename groupby cols", columns=["sector", "return"],
+                           partial=_sector_moments(["return"]), combine=_mean_and_std),
+    24: PartitionedExample("Pivot table", columns=["sector", "return"], partial=_sector_moments(["return"]),
+                           combine=lambda parts: _mean_of("return")(parts).to_frame()),
+    25: PartitionedExample("Pivot multi", columns=["sector", "return", "VaR"],
+                           partial=_sector_moments(["return", "VaR"]),
+                           combine=lambda parts: pd.DataFrame({c: _mean_of(c)(parts) for c in ["VaR", "return"]})),
+    26: PartitionedExample("Crosstab", columns=["sector", "default_flag"],
+                           partial=lambda frame: pd.crosstab(frame["sector"], frame["default_flag"]),
+                           combine=lambda parts: _summed(parts).fillna(0).astype(np.int64)),
+    27: PartitionedExample("Reset index", columns=["sector", "return"], partial=_sector_moments(["return"]),
+                           combine=lambda parts: _mean_of("return")(parts).reset_index()),
+    39: PartitionedExample("Correlation matrix", columns=NUMERIC, partial=_comoments_partial,
+                           combine=_correlation),
+}
+
+
+def iter_example(dataset, number, start=None, end=None):
+    """The example's result in pieces: partition partials, filtered row chunks or sorted slices."""
+    if number not in PARTITIONED_EXAMPLES:
+        raise KeyError(f"example #{number} has no partitioned form (supported: {sorted(PARTITIONED_EXAMPLES)})")
+    return PARTITIONED_EXAMPLES[number].pieces(dataset, start, end)
+
+
+def run_example(dataset, number, start=None, end=None):
+    """The example's full result, computed one partition at a time."""
+    parts = list(iter_example(dataset, number, start, end))
+    example = PARTITIONED_EXAMPLES[number]
+    if not parts:  # no partition in range: combine the partial of an empty frame, as pandas would aggregate one
+        empty = dataset.empty_frame(example.columns)
+        parts = [empty] if example.combine is None else [example.partial(empty)]
+    if example.combine is None:
+        return pd.concat(parts, ignore_index=True)
+    return example.combine(parts)
+
+
+# ============================================================
+# 🧪 DEMO: SAME RESULTS, BOUNDED MEMORY
+# ============================================================
+
+def _canonical(result, number):
+    # row-returning examples come back in partition order with a fresh index
+    if number in (6, 7, 8):
+        return result.sort_values(list(result.columns), ignore_index=True)
+    if number == 9:
+        return result["return"].reset_index(drop=True)
+    if number == 5:  # sketch quartiles are approximate; dates compare as nanoseconds within tolerance
+        result = result.drop(["25%", "50%", "75%"])
+        return result.apply(lambda column: column.map(lambda v: v.value if isinstance(v, pd.Timestamp) else v))
+    return result
+
+
+def compare_with_memory(dataset, frame, numbers=None, rtol=1e-9, atol=1e-12):
+    """Partitioned vs in-memory pandas_query_examples, one row per example."""
+    from market_data_schema import results_match
+    from pandas_utils import pandas_query_examples
+
+    examples = pandas_query_examples(frame)
+    rows = []
+    for number in numbers or sorted(PARTITIONED_EXAMPLES):
+        expected = _canonical(examples[number].result, number)
+        actual = _canonical(run_example(dataset, number), number)
+        examples[number].forget()
+        rows.append({"example": number, "name": PARTITIONED_EXAMPLES[number].name,
+                     "match": results_match(expected, actual, rtol, atol)})
+    return rows
+
+
+def _peak_rss(task):
+    # run `task` in a fresh interpreter and report its peak resident set size in MB
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(task)
+
+
+def _in_memory_task(root, number):
+    import resource
+
+    from pandas_utils import pandas_query_examples
+
+    frame = pd.read_parquet(root)
+    pandas_query_examples(frame.drop(columns=[PARTITION_KEY], errors="ignore"))[number].result
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _partitioned_task(root, number):
+    import resource
+
+    for _ in iter_example(PartitionedDataset(root), number):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None):
+    import functools
+    import tempfile
+
+    from market_data_generator import generate_market_data
+
+    parser = argparse.ArgumentParser(description="Run the pandas examples over date-partitioned Parquet")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--check-rows", type=int, default=200_000, help="dataset size for the equivalence check")
+    parser.add_argument("--root", help="partition directory (default: a temporary one)")
+    parser.add_argument("--memory-examples", type=int, nargs="*", default=[9, 21, 39])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        small_root = os.path.join(scratch, "check")
+        frame = pd.concat(generate_market_data(args.check_rows), ignore_index=True)
+        write_partitions(small_root, generate_market_data(args.check_rows))
+        rows = compare_with_memory(PartitionedDataset(small_root), frame)
+        different = [r["example"] for r in rows if not r["match"]]
+        print(f"🔍 {len(rows) - len(different)}/{len(rows)} partitioned examples match pandas_query_examples "
+              f"on {args.check_rows:,} rows" + (f"; differ: {different}" if different else ""))
+
+        root = args.root or os.path.join(scratch, "market_data")
+        months = write_partitions(root, generate_market_data(args.rows, chunk=250_000))
+        print(f"🗂️  {args.rows:,} rows in {len(months)} month partitions under {root}")
+        for number in args.memory_examples:
+            in_memory = _peak_rss(functools.partial(_in_memory_task, root, number))
+            partitioned = _peak_rss(functools.partial(_partitioned_task, root, number))
+            print(f"   #{number} {PARTITIONED_EXAMPLES[number].name}: peak RSS in-memory {in_memory:,.0f} MB, "
+                  f"partitioned {partitioned:,.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import heapq
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 🕯️ STREAMING OHLCV + VWAP BARS FROM TICKS
+# ============================================================
+#
+# pandas_resample.py builds bars in one go: df.resample(...).ohlc() over a
+# frame that already holds every tick.  BarBuilder takes ticks as they
+# arrive, one at a time or in micro-batches, and hands back each bar as soon
+# as it closes:
+#
+#     builder = BarBuilder(freqs=("1s", "1min", "5min"), lateness="5s")
+#     for tick in ticks:
+#         for bar in builder.update(tick["symbol"], tick["timestamp"], tick["price"], tick["volume"]): ...
+#     bars = builder.update_batch(frame)                  # symbol / timestamp / price / volume columns
+#     bars += builder.flush()                             # end of stream: close what is still open
+#     bars_frame(bars, "1min")                            # same shape as resample_bars(frame, "1min")
+#
+# A bar [start, start + freq) is aligned like resample()'s and keeps O(1)
+# state: open / high / low / close, volume, price × volume (for VWAP), tick
+# count and its first / last timestamps.  Open and close follow timestamps,
+# not arrival order, so ticks that arrive out of order within the tolerance
+# still land correctly.  The watermark is the newest timestamp seen (any
+# symbol) minus `lateness`; a bar closes once the watermark reaches its end,
+# and a tick whose bar has already closed is dropped and counted in `late`.
+# Micro-batches give exactly the bars of feeding the same ticks one by one —
+# each tick is judged against the watermark of the ticks before it — but
+# emit them once per batch.
+
+DEFAULT_FREQS = ("1s", "1min", "5min")
+BAR_COLUMNS = ["open", "high", "low", "close", "volume", "vwap", "count"]
+_NO_WATERMARK = np.iinfo(np.int64).min // 2
+
+
+def _ns(timestamp):
+    # nanoseconds since the epoch for int / datetime / Timestamp / datetime64 / string timestamps
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return pd.Timestamp(timestamp).value
+
+
+class _Bar:
+    """Running state of one open bar."""
+
+    __slots__ = ("open", "high", "low", "close", "volume", "notional", "count", "first_ts", "last_ts")
+
+    def __init__(self, open, high, low, close, volume, notional, count, first_ts, last_ts):
+        self.open, self.high, self.low, self.close = open, high, low, close
+        self.volume, self.notional, self.count = volume, notional, count
+        self.first_ts, self.last_ts = first_ts, last_ts
+
+    def merge(self, open, high, low, close, volume, notional, count, first_ts, last_ts):
+        if first_ts < self.first_ts:  # on equal timestamps the tick that arrived first stays the open
+            self.open, self.first_ts = open, first_ts
+        if last_ts >= self.last_ts:  # ... and the one that arrived last becomes the close
+            self.close, self.last_ts = close, last_ts
+        if high > self.high:
+            self.high = high
+        if low < self.low:
+            self.low = low
+        self.volume += volume
+        self.notional += notional
+        self.count += count
+
+
+class BarBuilder:
+    """
+    Incremental OHLCV + VWAP bars per symbol at one or more frequencies:
+    - update() / update_batch() return the bars that closed because of those ticks
+    - flush() closes every open bar
+    - late: {freq: ticks dropped because their bar had already closed}
+    """
+
+    def __init__(self, freqs=DEFAULT_FREQS, lateness="0s"):
+        self.freqs = [freqs] if isinstance(freqs, str) else list(freqs)
+        self.steps = [pd.Timedelta(freq).value for freq in self.freqs]
+        if any(step <= 0 for step in self.steps):
+            raise ValueError(f"bar frequencies must be positive: {self.freqs}")
+        self.lateness = pd.Timedelta(lateness).value
+        self.bars = {}        # (symbol, freq index, start) → _Bar
+        self._closing = []    # heap of (end, freq index, symbol, start): one entry per open bar
+        self.max_ts = None
+        self.watermark = _NO_WATERMARK
+        self.ticks = 0
+        self.late = {freq: 0 for freq in self.freqs}
+
+    def _add(self, symbol, i, start, values):
+        key = (symbol, i, start)
+        bar = self.bars.get(key)
+        if bar is None:
+            self.bars[key] = _Bar(*values)
+            heapq.heappush(self._closing, (start + self.steps[i], i, symbol, start))
+        else:
+            bar.merge(*values)
+
+    def _emit(self, symbol, i, start, bar):
+        return {
+            "symbol": symbol, "freq": self.freqs[i],
+            "start": np.datetime64(start, "ns"), "end": np.datetime64(start + self.steps[i], "ns"),
+            "open": bar.open, "high": bar.high, "low": bar.low, "close": bar.close, "volume": bar.volume,
+            "vwap": bar.notional / bar.volume if bar.volume else np.nan, "count": bar.count,
+        }
+
+    def _close(self, through):
+        closed = []
+        while self._closing and self._closing[0][0] <= through:
+            _, i, symbol, start = heapq.heappop(self._closing)
+            closed.append(self._emit(symbol, i, start, self.bars.pop((symbol, i, start))))
+        return closed
+
+    def _advance(self, newest):
+        if self.max_ts is None or newest > self.max_ts:
+            self.max_ts = newest
+            self.watermark = newest - self.lateness
+            return self._close(self.watermark)
+        return []
+
+    def update(self, symbol, timestamp, price, volume):
+        """Add one tick; returns the bars it closed (oldest first)."""
+        ts = _ns(timestamp)
+        values = (price, price, price, price, volume, price * volume, 1, ts, ts)
+        for i, step in enumerate(self.steps):
+            start = ts - ts % step
+            if start + step <= self.watermark:
+                self.late[self.freqs[i]] += 1
+                continue
+            self._add(symbol, i, start, values)
+        self.ticks += 1
+        return self._advance(ts)
+
+    def update_batch(self, frame, symbol="symbol", time_field="timestamp", price="price", volume="volume"):
+        """Add a micro-batch (DataFrame, rows in arrival order); returns the bars it closed."""
+        if len(frame) == 0:
+            return []
+        ts = frame[time_field].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        prices = frame[price].to_numpy(dtype=np.float64)
+        volumes = frame[volume].to_numpy()
+        codes, symbols = pd.factorize(frame[symbol])
+        symbols = list(symbols)
+        # the watermark each tick meets: the newest timestamp among the ticks that arrived before it
+        before = np.maximum.accumulate(np.concatenate(
+            ([self.max_ts if self.max_ts is not None else _NO_WATERMARK + self.lateness], ts[:-1]))) - self.lateness
+        order = np.lexsort((ts, codes))  # stable: per symbol by timestamp, then arrival
+        notional = prices * volumes
+        for i, step in enumerate(self.steps):
+            starts = ts - ts % step
+            on_time = starts + step > before
+            self.late[self.freqs[i]] += int(len(ts) - on_time.sum())
+            rows = order[on_time[order]]
+            if len(rows) == 0:
+                continue
+            code, start = codes[rows], starts[rows]
+            first = np.flatnonzero(np.concatenate(([True], (code[1:] != code[:-1]) | (start[1:] != start[:-1]))))
+            last = np.append(first[1:], len(rows)) - 1
+            p = prices[rows]
+            segments = zip(
+                code[first].tolist(), start[first].tolist(),
+                p[first].tolist(), np.maximum.reduceat(p, first).tolist(), np.minimum.reduceat(p, first).tolist(),
+                p[last].tolist(), np.add.reduceat(volumes[rows], first).tolist(),
+                np.add.reduceat(notional[rows], first).tolist(), (last - first + 1).tolist(),
+                ts[rows[first]].tolist(), ts[rows[last]].tolist())
+            for c, s, *values in segments:
+                self._add(symbols[c], i, s, values)
+        self.ticks += len(ts)
+        return self._advance(int(ts.max()))
+
+    def flush(self):
+        """Close every bar still open (end of the stream)."""
+        return self._close(np.inf)
+
+    def feed(self, ticks, batch_size=None, symbol="symbol", time_field="timestamp", price="price", volume="volume",
+             flush=True):
+        """Yield bars from an iterable of tick dicts, tick by tick or in batch_size micro-batches."""
+        if not batch_size:
+            for tick in ticks:
+                yield from self.update(tick[symbol], tick[time_field], tick[price], tick[volume])
+        else:
+            batch = []
+            for tick in ticks:
+                batch.append(tick)
+                if len(batch) == batch_size:
+                    yield from self.update_batch(pd.DataFrame(batch), symbol, time_field, price, volume)
+                    batch = []
+            if batch:
+                yield from self.update_batch(pd.DataFrame(batch), symbol, time_field, price, volume)
+        if flush:
+            yield from self.flush()
+
+
+def bars_frame(bars, freq=None):
+    """Emitted bars as a DataFrame indexed by (symbol, start), optionally just one frequency."""
+    frame = pd.DataFrame(bars, columns=["symbol", "freq", "start", "end"] + BAR_COLUMNS)
+    if freq is not None:
+        frame = frame[frame["freq"] == freq]
+    return frame.set_index(["symbol", "start"]).sort_index()[BAR_COLUMNS]
+
+
+def resample_bars(frame, freq, symbol="symbol", time_field="timestamp", price="price", volume="volume"):
+    """The batch equivalent: groupby(symbol).resample(freq).ohlc() plus volume, VWAP and count; empty bars dropped."""
+    indexed = frame.assign(_notional=frame[price] * frame[volume]).set_index(time_field)
+    grouped = indexed.groupby(symbol)
+    bars = grouped[price].resample(freq).ohlc()
+    sums = grouped[[volume, "_notional"]].resample(freq).sum()
+    bars["volume"] = sums[volume]
+    bars["vwap"] = sums["_notional"] / sums[volume]
+    bars["count"] = grouped[price].resample(freq).count()
+    bars = bars[bars["count"] > 0]
+    bars.index.names = [symbol, "start"]
+    return bars[BAR_COLUMNS]
+
+
+# ============================================================
+# 🧪 DEMO: price_ticks.json, LATE TICKS AND THROUGHPUT
+# ============================================================
+
+def _ticks_per_second(fn, ticks):
+    start = time.perf_counter()
+    fn()
+    return ticks / (time.perf_counter() - start)
+
+
+def _late_arrivals(frame, delay, share=0.05, seed=0):
+    # the ticks in arrival order when `share` of them are held back by up to `delay`
+    rng = np.random.default_rng(seed)
+    held = np.where(rng.random(len(frame)) < share, rng.uniform(0, pd.Timedelta(delay).value, len(frame)), 0)
+    arrival = frame["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64) + held.astype(np.int64)
+    return frame.iloc[np.argsort(arrival, kind="stable")].reset_index(drop=True)
+
+
+def main(argv=None):
+    from market_data_schema import results_match
+    from mongo_tick_buckets import synthetic_ticks
+    from mongo_tick_loader import iter_extended_json
+
+    parser = argparse.ArgumentParser(description="Streaming OHLCV + VWAP bars vs groupby().resample().ohlc()")
+    parser.add_argument("--ticks-file", default="price_ticks.json")
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--hours", type=float, default=6)
+    parser.add_argument("--freqs", nargs="*", default=list(DEFAULT_FREQS))
+    parser.add_argument("--batches", type=int, nargs="*", default=[1_000, 10_000])
+    parser.add_argument("--delay", default="5s", help="how late the held-back ticks arrive in the lateness check")
+    args = parser.parse_args(argv)
+
+    builder = BarBuilder("1min")
+    bars = list(builder.feed(document for document, _ in iter_extended_json(args.ticks_file)))
+    print(f"🕯️  {args.ticks_file}: {builder.ticks} ticks → {len(bars)} one-minute bars")
+    print(bars_frame(bars).round(4).to_string())
+
+    frame = synthetic_ticks(args.symbols, args.hours)
+    frame = frame.sort_values("timestamp", kind="stable").reset_index(drop=True)  # as a feed delivers them
+    n = len(frame)
+    expected = {freq: resample_bars(frame, freq) for freq in args.freqs}
+    ticks = frame.to_dict(orient="records")
+    one_by_one = BarBuilder(args.freqs)
+    streamed = list(one_by_one.feed(ticks))
+    batched = BarBuilder(args.freqs)
+    in_batches = [bar for offset in range(0, n, args.batches[0])
+                  for bar in batched.update_batch(frame.iloc[offset:offset + args.batches[0]])] + batched.flush()
+    same = all(results_match(expected[freq], bars_frame(streamed, freq), 1e-9, 1e-9)
+               and results_match(expected[freq], bars_frame(in_batches, freq), 1e-9, 1e-9) for freq in args.freqs)
+    print(("✅" if same else "❌") + f" {n:,} in-order ticks: tick-by-tick and micro-batch bars "
+          f"{'match' if same else 'differ from'} resample_bars at {args.freqs}")
+
+    shuffled = _late_arrivals(frame, args.delay)
+    for lateness in ("0s", args.delay):
+        late = BarBuilder(args.freqs, lateness=lateness)
+        bars = [bar for offset in range(0, n, args.batches[0])
+                for bar in late.update_batch(shuffled.iloc[offset:offset + args.batches[0]])] + late.flush()
+        matches = [freq for freq in args.freqs if results_match(expected[freq], bars_frame(bars, freq), 1e-9, 1e-9)]
+        print(f"⏳ ticks up to {args.delay} late, lateness={lateness}: dropped {late.late}, "
+              f"bars match resample_bars for {matches or 'no frequency'}")
+
+    print(f"⚡ throughput on {n:,} ticks ({args.symbols} symbols × {args.hours:g}h of 1-second ticks):")
+    for freq in args.freqs:
+        batch_rate = _ticks_per_second(lambda: resample_bars(frame, freq), n)
+        tick_rate = _ticks_per_second(lambda: list(BarBuilder(freq).feed(ticks)), n)
+        rates = [f"tick-by-tick {tick_rate:,.0f}/s"]
+        for size in args.batches:
+            def run(size=size):
+                builder = BarBuilder(freq)
+                for offset in range(0, n, size):
+                    builder.update_batch(frame.iloc[offset:offset + size])
+                builder.flush()
+            rates.append(f"batches of {size:,} {_ticks_per_second(run, n):,.0f}/s")
+        print(f"   {freq:>5}: groupby().resample().ohlc() {batch_rate:,.0f}/s | " + " | ".join(rates))
+
+
+if __name__ == "__main__":
+    main()
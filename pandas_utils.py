@@ -1,259 +1,386 @@
+import numpy as np
+import pandas as pd
+
+
 # ============================================================
 # 🧮 PANDAS DATAFRAME QUERY EXAMPLES — 75 EXERCISES
 # ============================================================
+#
+# pandas_query_examples(df) returns immediately: every example is a named
+# thunk that runs the first time its result is asked for and then keeps it,
+# so a caller only pays for the examples it actually uses:
+#
+#     examples = pandas_query_examples(df)     # O(1): nothing copied, nothing run
+#     examples[6].result                       # runs #6 only ("Filter Tech sector")
+#     examples.run([21, 48, 75])               # {21: ..., 48: ..., 75: ...}
+#     examples.run(errors="capture")           # all 75, exceptions returned instead of raised
+#     for name, result in examples: ...        # the old list-of-pairs shape, evaluated one by one
+#
+# The date-parsed copy of df the examples share is also built on first use.
+# pandas_query_examples(df, fast=True) swaps the examples that push a Python
+# lambda through apply (#19, #48, #63, #73) for the vectorized equivalents in
+# FAST_PATHS; pandas_fast_paths checks each pair and reports the speed-up.
+
+FAST_PATHS = {
+    19: lambda df: df["return"] ** 2,
+    48: lambda df: df["price"] * df["return"],
+    63: lambda df: pd.Series(np.where(df["return"] > 0, "Positive", "Negative"), index=df.index, name="return"),
+    73: lambda df: (df["return"] > 0.01).groupby(df["sector"]).mean(),
+}
+
+
+class LazyExample:
+    """One named example: `result` runs it on first access and memoizes it; forget() drops the memo."""
+
+    _unset = object()
+
+    def __init__(self, number, name, thunk, frame):
+        self.number = number
+        self.name = name
+        self.thunk = thunk  # function of the prepared frame
+        self._frame = frame
+        self._result = self._unset
+
+    @property
+    def evaluated(self):
+        return self._result is not self._unset
+
+    @property
+    def result(self):
+        if self._result is self._unset:
+            self._result = self.thunk(self._frame())
+        return self._result
+
+    def forget(self):
+        self._result = self._unset
+
+    def __iter__(self):  # `name, result = example`, like the old (name, result) pairs
+        yield self.name
+        yield self.result
+
+    def __repr__(self):
+        state = "evaluated" if self.evaluated else "pending"
+        return f"<example #{self.number} {self.name!r} ({state})>"
+
+
+class QueryExamples:
+    """
+    The 75 examples over one DataFrame, numbered from 1:
+    - examples[n] / examples.by_name(name) → LazyExample
+    - run(numbers) → {number: result}, evaluating only those examples
+    """
 
-def pandas_query_examples(df):
+    def __init__(self, df, entries):
+        self._source = df
+        self._prepared = None
+        self._examples = [LazyExample(i, name, thunk, self.frame) for i, (name, thunk) in enumerate(entries, 1)]
+        self._by_name = {e.name: e for e in self._examples}
+
+    def frame(self):
+        """The date-parsed copy every example runs on (built once)."""
+        if self._prepared is None:
+            df = self._source.copy()
+            if not pd.api.types.is_datetime64_any_dtype(df["date"]):  # keeps Arrow timestamps Arrow
+                df["date"] = pd.to_datetime(df["date"], errors="coerce")
+            self._prepared = df
+        return self._prepared
+
+    def __len__(self):
+        return len(self._examples)
+
+    def __getitem__(self, number):
+        if not 1 <= number <= len(self._examples):
+            raise IndexError(f"example numbers run from 1 to {len(self._examples)}, got {number}")
+        return self._examples[number - 1]
+
+    def __iter__(self):
+        return iter(self._examples)
+
+    def by_name(self, name):
+        return self._by_name[name]
+
+    @property
+    def names(self):
+        return [e.name for e in self._examples]
+
+    def run(self, numbers=None, errors="raise", keep=True):
+        """
+        Evaluate a subset (all examples when numbers is None):
+        - errors="capture" returns the exception as that example's result instead of raising
+        - keep=False drops each memo after reading it (bounded memory for a full sweep)
+        """
+        results = {}
+        for number in numbers if numbers is not None else range(1, len(self) + 1):
+            example = self[number]
+            try:
+                results[number] = example.result
+            except Exception as exc:
+                if errors != "capture":
+                    raise
+                results[number] = exc
+            if not keep:
+                example.forget()
+        return results
+
+    def forget(self):
+        """Drop every memoized result and the prepared frame."""
+        for example in self._examples:
+            example.forget()
+        self._prepared = None
+
+
+def pandas_query_examples(df, fast=False):
     """
-    75 Pandas DataFrame manipulation examples:
+    75 Pandas DataFrame manipulation examples, evaluated lazily (see QueryExamples):
+    - fast=True uses the vectorized FAST_PATHS for the apply-based examples
     - Beginner: filtering, sorting, aggregating
     - Intermediate: groupby, pivot, merging
     - Advanced: window functions, reshaping, feature engineering
     """
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
     examples = [
         # ============================================================
         # 🟢 LEVEL 1: BASIC OPERATIONS
         # ============================================================
 
         # 1. Show first 3 rows
-        ("View first rows", df.head(3)),
+        ("View first rows", lambda df: df.head(3)),
 
         # 2. Show data types
-        ("Data types", df.dtypes),
+        ("Data types", lambda df: df.dtypes),
 
         # 3. Shape of dataframe
-        ("Shape", df.shape),
+        ("Shape", lambda df: df.shape),
 
         # 4. Column names
-        ("Columns", df.columns.tolist()),
+        ("Columns", lambda df: df.columns.tolist()),
 
         # 5. Describe numeric columns
-        ("Describe", df.describe()),
+        ("Describe", lambda df: df.describe()),
 
         # 6. Filter: Tech sector only
-        ("Filter Tech sector", df[df["sector"] == "Tech"]),
+        ("Filter Tech sector", lambda df: df[df["sector"] == "Tech"]),
 
         # 7. Filter VaR > 0.05
-        ("High VaR", df[df["VaR"] > 0.05]),
+        ("High VaR", lambda df: df[df["VaR"] > 0.05]),
 
         # 8. Select columns
-        ("Select subset", df[["symbol", "price", "VaR"]]),
+        ("Select subset", lambda df: df[["symbol", "price", "VaR"]]),
 
         # 9. Sort by return descending
-        ("Sort by return", df.sort_values("return", ascending=False)),
+        ("Sort by return", lambda df: df.sort_values("return", ascending=False)),
 
         # 10. Count missing values
-        ("Missing values", df.isna().sum()),
+        ("Missing values", lambda df: df.isna().sum()),
 
         # 11. Unique sectors
-        ("Unique sectors", df["sector"].unique()),
+        ("Unique sectors", lambda df: df["sector"].unique()),
 
         # 12. Replace missing values
-        ("Fill NaN", df.fillna({"sector": "Unknown"})),
+        ("Fill NaN", lambda df: df.fillna({"sector": "Unknown"})),
 
         # 13. Drop duplicates
-        ("Drop duplicates", df.drop_duplicates()),
+        ("Drop duplicates", lambda df: df.drop_duplicates()),
 
         # 14. Rename columns
-        ("Rename columns", df.rename(columns={"price": "close_price"})),
+        ("Rename columns", lambda df: df.rename(columns={"price": "close_price"})),
 
         # 15. Add derived column: return %
-        ("Add return_pct", df.assign(return_pct=lambda x: x["return"] * 100)),
+        ("Add return_pct", lambda df: df.assign(return_pct=lambda x: x["return"] * 100)),
 
         # 16. Boolean mask: positive returns
-        ("Positive returns", df[df["return"] > 0]),
+        ("Positive returns", lambda df: df[df["return"] > 0]),
 
         # 17. Column statistics
-        ("Mean return", df["return"].mean()),
+        ("Mean return", lambda df: df["return"].mean()),
 
         # 18. Count by sector
-        ("Count by sector", df["sector"].value_counts()),
+        ("Count by sector", lambda df: df["sector"].value_counts()),
 
         # 19. Apply lambda function
-        ("Squared returns", df["return"].apply(lambda x: x ** 2)),
+        ("Squared returns", lambda df: df["return"].apply(lambda x: x ** 2)),
 
         # 20. Create new flag
-        ("High risk flag", df.assign(high_risk=df["VaR"] > 0.05)),
+        ("High risk flag", lambda df: df.assign(high_risk=df["VaR"] > 0.05)),
 
         # ============================================================
         # 🟡 LEVEL 2: INTERMEDIATE GROUPBY, MERGE, PIVOT
         # ============================================================
 
         # 21. Group by sector with mean price
-        ("Group by sector (mean price)", df.groupby("sector")["price"].mean()),
+        ("Group by sector (mean price)", lambda df: df.groupby("sector")["price"].mean()),
 
         # 22. Multiple aggregations
-        ("Groupby with agg", df.groupby("sector").agg({"price": "mean", "VaR": "max"})),
+        ("Groupby with agg", lambda df: df.groupby("sector").agg({"price": "mean", "VaR": "max"})),
 
         # 23. Group and rename
-        ("Rename groupby cols", df.groupby("sector")["return"].agg(avg_return="mean", std_return="std")),
+        ("Rename groupby cols", lambda df: df.groupby("sector")["return"].agg(avg_return="mean", std_return="std")),
 
         # 24. Pivot table: avg return by sector
-        ("Pivot table", df.pivot_table(values="return", index="sector", aggfunc="mean")),
+        ("Pivot table", lambda df: df.pivot_table(values="return", index="sector", aggfunc="mean")),
 
         # 25. Pivot multi-value
-        ("Pivot multi", df.pivot_table(values=["return", "VaR"], index="sector", aggfunc="mean")),
+        ("Pivot multi", lambda df: df.pivot_table(values=["return", "VaR"], index="sector", aggfunc="mean")),
 
         # 26. Cross-tab: sector vs default_flag
-        ("Crosstab", pd.crosstab(df["sector"], df["default_flag"])),
+        ("Crosstab", lambda df: pd.crosstab(df["sector"], df["default_flag"])),
 
         # 27. Reset index after groupby
-        ("Reset index", df.groupby("sector")["return"].mean().reset_index()),
+        ("Reset index", lambda df: df.groupby("sector")["return"].mean().reset_index()),
 
         # 28. Merge two DataFrames
-        ("Merge example", pd.merge(df, df[["symbol", "VaR"]], on="symbol", suffixes=("", "_copy"))),
+        ("Merge example", lambda df: pd.merge(df, df[["symbol", "VaR"]], on="symbol", suffixes=("", "_copy"))),
 
         # 29. Join on index
-        ("Join example", df.set_index("symbol").join(df.set_index("symbol"), lsuffix="_1", rsuffix="_2")),
+        ("Join example", lambda df: df.set_index("symbol").join(df.set_index("symbol"), lsuffix="_1", rsuffix="_2")),
 
         # 30. Sort by multiple columns
-        ("Multi-sort", df.sort_values(["sector", "return"], ascending=[True, False])),
+        ("Multi-sort", lambda df: df.sort_values(["sector", "return"], ascending=[True, False])),
 
         # 31. Drop column
-        ("Drop column", df.drop(columns=["volume"])),
+        ("Drop column", lambda df: df.drop(columns=["volume"])),
 
         # 32. Unique value counts
-        ("Unique count", df["sector"].nunique()),
+        ("Unique count", lambda df: df["sector"].nunique()),
 
         # 33. Replace text
-        ("Replace sector", df.replace({"Tech": "Technology"})),
+        ("Replace sector", lambda df: df.replace({"Tech": "Technology"})),
 
         # 34. Filter with query()
-        ("Query syntax", df.query("VaR > 0.04 and sector == 'Tech'")),
+        ("Query syntax", lambda df: df.query("VaR > 0.04 and sector == 'Tech'")),
 
         # 35. Use np.where for flag
-        ("np.where flag", df.assign(risk_flag=np.where(df["VaR"] > 0.05, "High", "Low"))),
+        ("np.where flag", lambda df: df.assign(risk_flag=np.where(df["VaR"] > 0.05, "High", "Low"))),
 
         # 36. Conditional mean
-        ("Conditional mean", df[df["sector"] == "Tech"]["return"].mean()),
+        ("Conditional mean", lambda df: df[df["sector"] == "Tech"]["return"].mean()),
 
         # 37. Rank by VaR
-        ("Rank VaR", df.assign(VaR_rank=df["VaR"].rank(ascending=False))),
+        ("Rank VaR", lambda df: df.assign(VaR_rank=df["VaR"].rank(ascending=False))),
 
         # 38. Add daily return volatility
-        ("Return volatility", df.assign(return_vol=(df["return"] - df["return"].mean()) / df["return"].std())),
+        ("Return volatility", lambda df: df.assign(return_vol=(df["return"] - df["return"].mean()) / df["return"].std())),
 
         # 39. Correlation matrix
-        ("Correlation matrix", df.corr(numeric_only=True)),
+        ("Correlation matrix", lambda df: df.corr(numeric_only=True)),
 
         # 40. Groupby and flatten columns
-        ("Groupby flatten", df.groupby("sector").agg(["mean", "max"]).reset_index()),
+        ("Groupby flatten", lambda df: df.groupby("sector").agg(["mean", "max"]).reset_index()),
 
         # ============================================================
         # 🔵 LEVEL 3: ADVANCED ANALYTICS / FEATURE ENGINEERING
         # ============================================================
 
         # 41. Rolling average of returns (window 2)
-        ("Rolling avg returns", df.assign(rolling_avg=df["return"].rolling(2).mean())),
+        ("Rolling avg returns", lambda df: df.assign(rolling_avg=df["return"].rolling(2).mean())),
 
         # 42. Expanding cumulative sum
-        ("Cumulative sum", df.assign(cum_sum=df["return"].cumsum())),
+        ("Cumulative sum", lambda df: df.assign(cum_sum=df["return"].cumsum())),
 
         # 43. Daily return volatility (rolling std)
-        ("Rolling std", df.assign(rolling_std=df["return"].rolling(3).std())),
+        ("Rolling std", lambda df: df.assign(rolling_std=df["return"].rolling(3).std())),
 
         # 44. Shifted lag feature
-        ("Lagged returns", df.assign(prev_return=df["return"].shift(1))),
+        ("Lagged returns", lambda df: df.assign(prev_return=df["return"].shift(1))),
 
         # 45. Percentage change
-        ("Pct change", df.assign(pct_change=df["price"].pct_change())),
+        ("Pct change", lambda df: df.assign(pct_change=df["price"].pct_change())),
 
         # 46. Normalize numeric columns
-        ("Normalization", (df - df.min()) / (df.max() - df.min())),
+        ("Normalization", lambda df: (df - df.min()) / (df.max() - df.min())),
 
         # 47. Z-score scaling
-        ("Z-score scaling", (df - df.mean()) / df.std()),
+        ("Z-score scaling", lambda df: (df - df.mean()) / df.std()),
 
         # 48. Apply lambda row-wise
-        ("Row-wise operation", df.apply(lambda r: r["price"] * r["return"], axis=1)),
+        ("Row-wise operation", lambda df: df.apply(lambda r: r["price"] * r["return"], axis=1)),
 
         # 49. Use np.select for multi-condition label
-        ("Multi condition", df.assign(label=np.select(
+        ("Multi condition", lambda df: df.assign(label=np.select(
             [df["VaR"] > 0.06, df["VaR"] > 0.04], ["High", "Medium"], default="Low"
         ))),
 
         # 50. Pivot: VaR by date and symbol
-        ("Pivot VaR", df.pivot(index="date", columns="symbol", values="VaR")),
+        ("Pivot VaR", lambda df: df.pivot(index="date", columns="symbol", values="VaR")),
 
         # 51. Melt wide → long format
-        ("Melt DataFrame", df.melt(id_vars=["symbol"], value_vars=["price", "VaR"])),
+        ("Melt DataFrame", lambda df: df.melt(id_vars=["symbol"], value_vars=["price", "VaR"])),
 
         # 52. Combine datasets vertically
-        ("Concat DataFrames", pd.concat([df, df], axis=0)),
+        ("Concat DataFrames", lambda df: pd.concat([df, df], axis=0)),
 
         # 53. MultiIndex groupby (sector, date)
-        ("MultiIndex groupby", df.groupby(["sector", "date"])["VaR"].mean()),
+        ("MultiIndex groupby", lambda df: df.groupby(["sector", "date"])["VaR"].mean()),
 
         # 54. Resample daily average (time series)
-        ("Resample daily", df.set_index("date").resample("D")["price"].mean()),
+        ("Resample daily", lambda df: df.set_index("date").resample("D")["price"].mean()),
 
         # 55. Pivot table with multiple aggfunc
-        ("Pivot multi agg", df.pivot_table(index="sector", values=["return", "VaR"], aggfunc=["mean", "std"])),
+        ("Pivot multi agg", lambda df: df.pivot_table(index="sector", values=["return", "VaR"], aggfunc=["mean", "std"])),
 
         # 56. Cumulative product (simulate returns)
-        ("Cumulative product", (1 + df["return"]).cumprod()),
+        ("Cumulative product", lambda df: (1 + df["return"]).cumprod()),
 
         # 57. Combine text columns
-        ("Combine text", df.assign(symbol_sector=df["symbol"] + "_" + df["sector"])),
+        ("Combine text", lambda df: df.assign(symbol_sector=df["symbol"] + "_" + df["sector"])),
 
         # 58. Filter top 2 by VaR
-        ("Top 2 VaR", df.nlargest(2, "VaR")),
+        ("Top 2 VaR", lambda df: df.nlargest(2, "VaR")),
 
         # 59. Value counts normalized
-        ("Normalized counts", df["sector"].value_counts(normalize=True)),
+        ("Normalized counts", lambda df: df["sector"].value_counts(normalize=True)),
 
         # 60. Rank by multiple columns
-        ("Multi rank", df.assign(rank=df.rank(method="dense", ascending=False)["return"])),
+        ("Multi rank", lambda df: df.assign(rank=df.rank(method="dense", ascending=False)["return"])),
 
         # 61. Compute Sharpe ratio (mean/std)
-        ("Sharpe ratio", df["return"].mean() / df["return"].std()),
+        ("Sharpe ratio", lambda df: df["return"].mean() / df["return"].std()),
 
         # 62. Outlier detection (z-score > 2)
-        ("Outliers", df[np.abs((df["return"] - df["return"].mean()) / df["return"].std()) > 2]),
+        ("Outliers", lambda df: df[np.abs((df["return"] - df["return"].mean()) / df["return"].std()) > 2]),
 
         # 63. Custom function in apply()
-        ("Apply custom func", df["return"].apply(lambda x: "Positive" if x > 0 else "Negative")),
+        ("Apply custom func", lambda df: df["return"].apply(lambda x: "Positive" if x > 0 else "Negative")),
 
         # 64. Merge summary stats
-        ("Merge group means", df.merge(df.groupby("sector")["return"].mean(), on="sector", suffixes=("", "_sector_mean"))),
+        ("Merge group means", lambda df: df.merge(df.groupby("sector")["return"].mean(), on="sector", suffixes=("", "_sector_mean"))),
 
         # 65. Add percentile rank
-        ("Percentile rank", df.assign(percentile=df["VaR"].rank(pct=True))),
+        ("Percentile rank", lambda df: df.assign(percentile=df["VaR"].rank(pct=True))),
 
         # 66. Quantile-based binning
-        ("Quantile bins", pd.qcut(df["VaR"], 3, labels=["Low", "Med", "High"])),
+        ("Quantile bins", lambda df: pd.qcut(df["VaR"], 3, labels=["Low", "Med", "High"])),
 
         # 67. Correlation between two variables
-        ("Correlation price–VaR", df["price"].corr(df["VaR"])),
+        ("Correlation price–VaR", lambda df: df["price"].corr(df["VaR"])),
 
         # 68. Groupby cumulative return
-        ("Cumulative return per sector", df.groupby("sector")["return"].cumsum()),
+        ("Cumulative return per sector", lambda df: df.groupby("sector")["return"].cumsum()),
 
         # 69. Expand each row into multiple rows
-        ("Repeat rows", df.loc[df.index.repeat(2)]),
+        ("Repeat rows", lambda df: df.loc[df.index.repeat(2)]),
 
         # 70. Pivot → stack → unstack
-        ("Stack/unstack", df.pivot_table(values="VaR", index="sector", columns="symbol").stack()),
+        ("Stack/unstack", lambda df: df.pivot_table(values="VaR", index="sector", columns="symbol").stack()),
 
         # 71. Use eval() for inline math
-        ("Eval inline", df.eval("risk_ratio = VaR / return")),
+        ("Eval inline", lambda df: df.eval("risk_ratio = VaR / return")),
 
         # 72. Compare columns element-wise
-        ("Compare columns", df["price"].gt(df["price"].mean())),
+        ("Compare columns", lambda df: df["price"].gt(df["price"].mean())),
 
         # 73. Groupby with lambda (custom function)
-        ("Lambda groupby", df.groupby("sector")["return"].apply(lambda x: (x > 0.01).mean())),
+        ("Lambda groupby", lambda df: df.groupby("sector")["return"].apply(lambda x: (x > 0.01).mean())),
 
         # 74. Assign categorical dtype
-        ("Categorical dtype", df.assign(sector_cat=df["sector"].astype("category"))),
+        ("Categorical dtype", lambda df: df.assign(sector_cat=df["sector"].astype("category"))),
 
         # 75. Convert DataFrame to dict
-        ("To dict", df.to_dict(orient="records")),
+        ("To dict", lambda df: df.to_dict(orient="records")),
     ]
 
-    return examples
+    if fast:
+        examples = [(name, FAST_PATHS.get(i, thunk)) for i, (name, thunk) in enumerate(examples, 1)]
+    return QueryExamples(df, examples)
 # if __name__ == "__main__":
 #     print("🔍 Running 10 random DataFrame queries for demo:")
 #     df = pd.DataFrame(sample_docs)
@@ -0,0 +1,336 @@
+import argparse
+import json
+import math
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================================
+# 📐 MERGEABLE QUANTILE SKETCHES (KLL)
+# ============================================================
+#
+# Exact quantiles sort everything: #42's $percentile over the collection,
+# #53's per-sector median, pd.qcut in pandas_utils #66 and pandas_eda_analysis.
+# A KLL sketch keeps a few hundred values per group whatever the input size,
+# answers any quantile within a rank error of about error_for_k(k) (~1.7% of
+# n at k=200), merges across chunks and processes, and round-trips through
+# bytes:
+#
+#     sketch = KLLSketch(k=200).update(df["VaR"])           # or .update() chunk by chunk
+#     sketch.quantiles([0.5, 0.9]), sketch.median()
+#     merged = KLLSketch.from_bytes(blob_a).merge(KLLSketch.from_bytes(blob_b))
+#     groups = sketch_collection(db["market_data"], "VaR", by="sector")    # #53, one pass
+#     groups.quantiles(0.5)                                  # → {sector: median}
+#     edges = qcut_edges(sketch, 3)                          # pd.qcut-style bins for #66
+#     pd.cut(df["VaR"], edges, labels=["Low", "Med", "High"], include_lowest=True)
+#
+# Level h holds values standing for 2**h inputs each.  When a level outgrows
+# its capacity (k at the top, shrinking by 2/3 per level below) it is sorted
+# and every other value, from a random start, moves up one level.
+
+DEFAULT_K = 200
+DECAY = 2 / 3
+MIN_WIDTH = 8
+
+
+def error_for_k(k):
+    """Approximate normalized rank error (99% confidence) of a KLL sketch with parameter k."""
+    return 3.3 / k
+
+
+def k_for_error(error):
+    """Smallest k whose error_for_k() is within `error` (e.g. 0.01 → 330)."""
+    return max(MIN_WIDTH, math.ceil(3.3 / error))
+
+
+class KLLSketch:
+    """
+    Streaming quantile sketch over floats:
+    - k: accuracy / size knob (see error_for_k, k_for_error)
+    - seed: makes the random compaction choices reproducible
+    NaN / None inputs are skipped; min and max are kept exactly.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"<KLLSketch k={self.k} n={self.n:,} retained={self.retained}>"
+
+    @property
+    def retained(self):
+        return sum(len(level) for level in self.levels)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(MIN_WIDTH, math.ceil(self.k * DECAY ** depth))
+
+    def update(self, values):
+        """Add a scalar or any array-like (Series, ndarray, list); returns self."""
+        values = pd.to_numeric(pd.Series(np.atleast_1d(values)), errors="coerce").to_numpy(dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            odd = len(items) % 2
+            promoted = items[odd:][self._rng.integers(2)::2]  # an odd one out stays behind
+            self.levels[level] = items[:odd]
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level = 0  # a new top level shrinks every capacity below it
+
+    def merge(self, other):
+        """Fold another sketch in (in place); the result answers for both inputs."""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Values at the given fractions (scalar in → scalar out), like $percentile / Series.quantile."""
+        scalar = np.ndim(qs) == 0
+        qs = np.atleast_1d(np.asarray(qs, dtype=float))
+        if self.n == 0:
+            out = np.full(len(qs), np.nan)
+        else:
+            items, cumulative = self._weighted()
+            ranks = np.maximum(np.ceil(qs * cumulative[-1]), 1)
+            out = items[np.minimum(np.searchsorted(cumulative, ranks), len(items) - 1)]
+            out = np.where(qs <= 0, self.min, np.where(qs >= 1, self.max, out))
+        return float(out[0]) if scalar else out
+
+    def median(self):
+        return self.quantiles(0.5)
+
+    def rank(self, value):
+        """Estimated fraction of inputs <= value."""
+        if self.n == 0:
+            return math.nan
+        items, cumulative = self._weighted()
+        i = np.searchsorted(items, value, side="right")
+        return float(cumulative[i - 1] / cumulative[-1]) if i else 0.0
+
+    def to_bytes(self):
+        """Compact form: a JSON header, then every retained value as float64."""
+        header = json.dumps({"k": self.k, "n": self.n, "min": self.min, "max": self.max,
+                             "sizes": [len(level) for level in self.levels]}).encode()
+        return struct.pack("<I", len(header)) + header + np.concatenate(self.levels).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob, seed=None):
+        (size,) = struct.unpack_from("<I", blob)
+        header = json.loads(blob[4:4 + size])
+        sketch = cls(header["k"], seed)
+        sketch.n, sketch.min, sketch.max = header["n"], header["min"], header["max"]
+        values = np.frombuffer(blob, dtype="<f8", offset=4 + size).astype(float)
+        sketch.levels = np.split(values, np.cumsum(header["sizes"])[:-1])
+        return sketch
+
+
+class GroupedSketches:
+    """One KLLSketch per group key, fed with vectorized (keys, values) chunks; mergeable like a sketch."""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.seed = seed
+        self.sketches = {}
+
+    def __getitem__(self, key):
+        return self.sketches[key]
+
+    def __len__(self):
+        return len(self.sketches)
+
+    def _sketch(self, key):
+        if key not in self.sketches:
+            self.sketches[key] = KLLSketch(self.k, self.seed)
+        return self.sketches[key]
+
+    def update(self, keys, values):
+        codes, uniques = pd.factorize(pd.Series(keys), use_na_sentinel=False)
+        values = np.asarray(values)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(uniques)))]
+        for code, key in enumerate(uniques):
+            key = None if key is None or key != key else key
+            self._sketch(key).update(values[order[bounds[code]:bounds[code + 1]]])
+        return self
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            self._sketch(key).merge(sketch)
+        return self
+
+    def quantiles(self, qs):
+        """{group: value (or array of values)} for each group."""
+        return {key: sketch.quantiles(qs) for key, sketch in self.sketches.items()}
+
+    def medians(self):
+        return self.quantiles(0.5)
+
+    def to_bytes(self):
+        keys = json.dumps([[key, len(blob)] for key, blob in
+                           ((key, sketch.to_bytes()) for key, sketch in self.sketches.items())], default=str).encode()
+        return struct.pack("<I", len(keys)) + keys + b"".join(s.to_bytes() for s in self.sketches.values())
+
+    @classmethod
+    def from_bytes(cls, blob, seed=None):
+        (size,) = struct.unpack_from("<I", blob)
+        groups = None
+        offset = 4 + size
+        for key, length in json.loads(blob[4:4 + size]):
+            sketch = KLLSketch.from_bytes(blob[offset:offset + length], seed)
+            groups = groups or cls(sketch.k, seed)
+            groups.sketches[key] = sketch
+            offset += length
+        return groups or cls(seed=seed)
+
+
+# ============================================================
+# 🧰 HELPERS: CHUNKED FRAMES, COLLECTIONS, QCUT EDGES
+# ============================================================
+
+def sketch_chunks(chunks, column, by=None, k=DEFAULT_K, seed=None):
+    """One pass over DataFrame chunks (pd.read_csv(chunksize=...), find_frames, ...) → KLLSketch or GroupedSketches."""
+    sketch = GroupedSketches(k, seed) if by else KLLSketch(k, seed)
+    for chunk in chunks:
+        if column not in chunk:
+            continue
+        if by:
+            sketch.update(chunk[by] if by in chunk else [None] * len(chunk), chunk[column])
+        else:
+            sketch.update(chunk[column])
+    return sketch
+
+
+def sketch_collection(collection, field, by=None, filter=None, k=DEFAULT_K, batch_size=50_000, seed=None):
+    """Sketch `field` (per `by` group) over collection.find(filter), streamed batch by batch."""
+    from mongo_frame_bridge import find_frames
+
+    projection = {"_id": 0, field: 1, **({by: 1} if by else {})}
+    return sketch_chunks(find_frames(collection, filter, projection, batch_size=batch_size), field, by, k, seed)
+
+
+def qcut_edges(sketch, q):
+    """pd.qcut-style bin edges (q bins or explicit fractions), duplicates dropped like duplicates="drop"."""
+    fractions = np.linspace(0, 1, q + 1) if np.ndim(q) == 0 else np.asarray(q, dtype=float)
+    return np.unique(sketch.quantiles(fractions))
+
+
+def qcut_chunks(make_chunks, column, q, labels=None, k=DEFAULT_K):
+    """
+    pd.qcut over data that doesn't fit in memory, two passes:
+    - make_chunks: callable returning a fresh iterator of DataFrame chunks
+    - yields one Categorical Series per chunk, binned on the sketched edges
+    """
+    edges = qcut_edges(sketch_chunks(make_chunks(), column, k=k), q)
+    for chunk in make_chunks():
+        yield pd.cut(chunk[column], edges, labels=labels, include_lowest=True)
+
+
+def rank_error(sketch, sorted_values, qs):
+    """Largest |true rank of the estimate − q| over qs, against the exact sorted data."""
+    estimates = sketch.quantiles(qs)
+    ranks = np.searchsorted(sorted_values, estimates, side="right") / len(sorted_values)
+    lower = np.searchsorted(sorted_values, estimates, side="left") / len(sorted_values)
+    return float(np.max(np.where(ranks < qs, qs - ranks, np.where(lower > qs, lower - qs, 0))))
+
+
+def _sketch_part(args):
+    values, k, seed = args
+    return KLLSketch(k, seed).update(values).to_bytes()
+
+
+def main(argv=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from mongo_benchmark import connect, seed_market_data
+
+    parser = argparse.ArgumentParser(description="KLL sketches vs exact quantiles on market_data")
+    parser.add_argument("--backend", default="columnar", choices=["columnar", "mongomock", "mongod"])
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--error", type=float, default=0.01, help="target normalized rank error")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    k = k_for_error(args.error)
+    collection = seed_market_data(connect(args.backend, args.uri), args.size)
+    qs = np.linspace(0.01, 0.99, 99)
+
+    start = time.perf_counter()
+    groups = sketch_collection(collection, "VaR", by="sector", k=k, seed=0)
+    sketch_s = time.perf_counter() - start
+    overall = KLLSketch(k, seed=0)
+    for sector_sketch in groups.sketches.values():
+        overall.merge(sector_sketch)
+    data = pd.DataFrame(list(collection.find({}, {"_id": 0, "VaR": 1, "sector": 1})))
+    exact = np.sort(data["VaR"].to_numpy())
+
+    print(f"🎯 k={k} (≈{error_for_k(k):.2%} rank error), {args.size:,} docs sketched per sector in {sketch_s:.2f}s, "
+          f"{overall.retained:,} values retained ({len(overall.to_bytes()) / 1024:.1f} KiB)")
+    print(f"   #42 VaR p50/p90: sketch {np.round(overall.quantiles([0.5, 0.9]), 5)} "
+          f"exact {np.round(np.quantile(exact, [0.5, 0.9], method='inverted_cdf'), 5)}; "
+          f"worst rank error over 99 percentiles {rank_error(overall, exact, qs):.3%}")
+    medians = data.groupby("sector")["VaR"].median()
+    worst = max(rank_error(groups[s], np.sort(data.loc[data["sector"] == s, "VaR"].to_numpy()), [0.5])
+                for s in medians.index)
+    print(f"   #53 median VaR per sector: worst rank error {worst:.3%} "
+          f"({', '.join(f'{s} {groups[s].median():.4f}/{m:.4f}' for s, m in medians.items())})")
+
+    labels = ["Low", "Med", "High"]
+    sketched = pd.cut(data["VaR"], qcut_edges(overall, 3), labels=labels, include_lowest=True)
+    agree = (sketched == pd.qcut(data["VaR"], 3, labels=labels)).mean()
+    print(f"   #66 qcut(VaR, 3): {agree:.2%} of rows land in the same bin as pd.qcut")
+
+    parts = np.array_split(data["VaR"].to_numpy(), args.workers)
+    with ProcessPoolExecutor(args.workers) as pool:
+        blobs = list(pool.map(_sketch_part, [(part, k, i) for i, part in enumerate(parts)]))
+    merged = KLLSketch(k, seed=0)
+    for blob in blobs:
+        merged.merge(KLLSketch.from_bytes(blob))
+    print(f"🔀 {args.workers} process sketches merged from {sum(map(len, blobs)) / 1024:.1f} KiB of bytes: "
+          f"n={merged.n:,}, worst rank error {rank_error(merged, exact, qs):.3%}")
+
+
+if __name__ == "__main__":
+    main()